@@ -5,20 +5,28 @@ from .models import Token, TokenResponse, LoginRequest, SignupRequest
 from .utils import (
     get_password_hash,
     verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     create_refresh_token,
     decode_refresh_token,
+    decode_access_token,
     get_current_user,
+    get_optional_current_user,
     REFRESH_TOKEN_EXPIRE_DAYS
 )
 
 __all__ = [
     "get_password_hash",
     "verify_password",
+    "get_password_hash_async",
+    "verify_password_async",
     "create_access_token",
     "create_refresh_token",
     "decode_refresh_token",
+    "decode_access_token",
     "get_current_user",
+    "get_optional_current_user",
     "Token",
     "TokenResponse",
     "ACCESS_TOKEN_EXPIRE_MINUTES",
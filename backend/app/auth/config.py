@@ -13,4 +13,6 @@ pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 # OAuth2 scheme
 from fastapi.security import OAuth2PasswordBearer
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
\ No newline at end of file
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same scheme for endpoints where signing in is optional
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
@@ -20,9 +20,11 @@ class TokenResponse(BaseModel):
     token_type: str
     expires_in: int  # seconds until access token expires
 
-# Token data model
+# Token data model; user_id and name are claims carried by access tokens
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
+    user_id: Optional[int] = None
+    name: Optional[str] = None
 
 # Custom login request model
 class LoginRequest(BaseModel):
@@ -1,10 +1,15 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 
-from .config import SECRET_KEY, ALGORITHM, pwd_context, oauth2_scheme
+from .config import SECRET_KEY, ALGORITHM, pwd_context, oauth2_scheme, optional_oauth2_scheme
 from .models import TokenData
+from settings import settings
+from services.local_cache import LocalLRUCache
 
 # Refresh token expiration (7 days)
 REFRESH_TOKEN_EXPIRE_DAYS = 7
@@ -17,6 +22,24 @@ def get_password_hash(password: str):
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+# Argon2 is deliberately slow and memory hungry. Async handlers run it on this
+# small dedicated pool, so a burst of logins queues here instead of occupying
+# the threadpool that serves every other sync endpoint.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash"
+)
+
+# Password hashing without blocking the event loop
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+# Password verification without blocking the event loop
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
 # Create access token
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,23 +51,51 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Get current user
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+# Verified access tokens -> claims. A token string that already passed
+# signature verification gives the same claims until it expires, so repeat
+# requests skip the decode. Entries never outlive the token's own `exp`.
+_claims_cache = LocalLRUCache(settings.jwt_claims_cache_size)
+
+# Decode and verify an access token, returning its claims and expiry timestamp
+def decode_access_token(token: str) -> Tuple[TokenData, Optional[float]]:
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email: str = payload.get("sub")
+    if email is None:
+        raise JWTError("Token has no subject")
+    token_data = TokenData(
+        email=email,
+        user_id=payload.get("uid"),
+        name=payload.get("name"),
     )
+    return token_data, payload.get("exp")
+
+# Get current user
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
+    token_data = _claims_cache.get(token)
+    if token_data is not None:
+        return token_data
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data, expires_at = decode_access_token(token)
     except JWTError:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    cache_until = time.time() + settings.jwt_claims_cache_ttl
+    if expires_at is not None:
+        cache_until = min(cache_until, expires_at)
+    _claims_cache.set(token, token_data, cache_until)
     return token_data
 
+# Get current user if a token was sent (invalid tokens are still rejected)
+async def get_optional_current_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[TokenData]:
+    if token is None:
+        return None
+    return await get_current_user(token)
+
 # Decode token without verification (for refresh)
 def decode_token_for_refresh(token: str):
     """
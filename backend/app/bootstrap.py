@@ -0,0 +1,21 @@
+"""
+Deploy-time bootstrap, run once before the API and workers start:
+
+    python bootstrap.py
+
+Creates missing database tables. This used to happen on every import of
+main.py; keeping it here means API pods and Celery workers start without a
+database round-trip.
+"""
+import logging
+
+from database import create_schema
+from settings import settings
+
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    create_schema()
+    logger.info("Database schema is up to date")
@@ -1,16 +1,86 @@
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from settings import settings
+from models import Base
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _pool_options(url: str) -> dict:
+    # SQLite uses a file-level lock; pool sizing only applies to server databases
+    if _is_sqlite(url):
+        return {}
+    return {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        "pool_recycle": settings.database_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
+def get_async_database_url() -> str:
+    """Async driver URL: ASYNC_DATABASE_URL, or DATABASE_URL with aiosqlite/asyncpg."""
+    if settings.async_database_url:
+        return settings.async_database_url
+    url = settings.database_url
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgresql+psycopg2:"):
+        return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    return url
+
 
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if _is_sqlite(settings.database_url) else {},
+    **_pool_options(settings.database_url)
 )
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for handlers that should not hold a threadpool thread during DB I/O.
+# Built on first use so Celery workers, which only use the sync engine, never load
+# the async driver stack.
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(get_async_database_url(), **_pool_options(settings.database_url))
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """Close pooled async connections, if the async engine was ever created."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_sessionmaker = None
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker()
+
+def create_schema():
+    """Create any missing tables. Run by bootstrap.py in deployments, at API startup in development."""
+    Base.metadata.create_all(bind=engine)
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -18,3 +88,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -5,4 +5,11 @@ class TaskStatus(str, Enum):
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
-    STARTED = "STARTED"
\ No newline at end of file
+    STARTED = "STARTED"
+
+
+class ReportStage(str, Enum):
+    """Progress of a report task, pushed to clients as `status` events."""
+    QUEUED = "queued"
+    AGGREGATING = "aggregating"
+    GENERATING = "generating"
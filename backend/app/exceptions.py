@@ -2,4 +2,32 @@
 
 class CeleryTaskNotFound(Exception):
     """Exception raised when a Celery task is not found."""
-    pass
\ No newline at end of file
+    pass
+
+
+class BatchNotFound(Exception):
+    """Exception raised when a report batch is not found or has expired."""
+    pass
+
+
+class ProviderSkipped(Exception):
+    """Exception raised when a provider is not called because its circuit breaker is open."""
+    pass
+
+
+class RateLimitExceeded(Exception):
+    """Exception raised when a user's enqueue rate limit is exhausted."""
+
+    def __init__(self, message: str, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, or None if retrying cannot help
+
+
+class PipelinePayloadMissing(Exception):
+    """Exception raised when an intermediate report pipeline payload has expired or was never stored."""
+    pass
+
+
+class LLMCapacityTimeout(Exception):
+    """Exception raised when no LLM rate limit capacity frees up within the allowed wait."""
+    pass
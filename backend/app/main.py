@@ -1,20 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from routers.report_router import router as report_router
 from routers.user_router import router as user_router
+from routers.maintenance_router import router as maintenance_router
 from settings import settings
-from database import engine
-from models import Base
+from database import create_schema, dispose_async_engine
 import logging
+import sys
 
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title=settings.app_title, version=settings.app_version)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Development creates missing tables here; deployments run bootstrap.py once
+    # beforehand and set DATABASE_CREATE_SCHEMA=false
+    if settings.database_create_schema:
+        create_schema()
+    yield
+    # Close pooled async connections (aiosqlite runs one thread per connection)
+    await dispose_async_engine()
+    # The provider pool only exists here when tasks ran in-process (eager Celery);
+    # importing it otherwise would load httpx for nothing
+    http_client = sys.modules.get("providers.http_client")
+    if http_client is not None:
+        http_client.shutdown_provider_loop()
+
+app = FastAPI(title=settings.app_title, version=settings.app_version, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,10 +40,7 @@ app.add_middleware(
 
 app.include_router(report_router, prefix="/api/v1/reports", tags=["report"])
 app.include_router(user_router, prefix="/api/v1/users", tags=["user"])
-
-@app.get("/health", tags=["maintenance"])
-def health_check():
-    return {"status": "healthy"}
+app.include_router(maintenance_router, tags=["maintenance"])
 
 
 if __name__ == "__main__":
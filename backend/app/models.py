@@ -1,9 +1,9 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+from typing import Annotated, List, Literal, Optional, Dict, Any, Union
 from datetime import datetime
 
 from enums import TaskStatus
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -18,14 +18,53 @@ class User(Base):
     phone = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class Report(Base):
+    __tablename__ = "reports"
+    __table_args__ = (
+        # Latest report for a VIN, and a user's history newest first
+        Index("ix_reports_vin_created_at", "vin", "created_at"),
+        Index("ix_reports_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(String, unique=True, nullable=True)
+    vin = Column(String(17), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    fingerprint = Column(String(64), nullable=True)
+    report = Column(Text, nullable=False)  # ReportResponse as JSON, served as stored
+    confidence_score = Column(Float, nullable=False)
+    generated_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class ReportRequest(BaseModel):
     vin: str
+    force_refresh: bool = False  # bypass the report cache and regenerate
+
+class VinCheck(BaseModel):
+    vin: str
+    valid: bool
+    errors: List[str] = []
+    wmi: Optional[str] = None
+    manufacturer: Optional[str] = None  # from the WMI table, None if unknown
+    country: Optional[str] = None
+    region: Optional[str] = None
+    model_year: Optional[int] = None
+    check_digit_valid: Optional[bool] = None  # None if the VIN is malformed
+
+class VinValidationRequest(BaseModel):
+    vins: List[str]
+
+class VinValidationResult(BaseModel):
+    total: int
+    valid: int
+    invalid: int
+    results: List[VinCheck]
 
 class ProviderData(BaseModel):
     provider_name: str
     data: Dict[str, Any]
     retrieved_at: datetime
-    status: str  # "success", "error", "partial"
+    status: str  # "success", "error", "partial", "skipped" (breaker open or aggregation deadline)
 
 class AggregatedData(BaseModel):
     vin: str
@@ -37,7 +76,150 @@ class ReportResponse(BaseModel):
     report_data: Dict[str, Any]
     generated_at: datetime
     providers_used: List[str]
+    providers_skipped: List[str] = []  # not asked or too slow to answer (breaker open, deadline)
     confidence_score: float  # 0-1, how complete the data is
+    fingerprint: Optional[str] = None  # hash of the provider data the report was built from
+
+class ReportPrompt(BaseModel):
+    system: str = ""  # static instructions and schema, sent as the system message
+    prompt: str  # the per-report user message
+    tier: str = ""  # preferred model tier (services/llm_router), empty for any
+    max_tokens: int
+    sections: Dict[str, Any] = {}  # sections already filled from provider data ("hybrid" mode)
+
+# Report schema: the sections of report_data. The LLM prompt is generated from
+# these models (services/report_schema.py) and its output validated against them.
+
+def _lowercase(value: Any) -> Any:
+    return value.strip().lower() if isinstance(value, str) else value
+
+Severity = Annotated[Literal["none", "minor", "moderate", "severe"], BeforeValidator(_lowercase)]
+# "branded": a title brand not covered by the others; "unknown": no title data
+TitleStatusValue = Annotated[
+    Literal["clean", "salvage", "rebuilt", "flood", "lemon", "branded", "unknown"], BeforeValidator(_lowercase)
+]
+Level = Annotated[Literal["low", "medium", "high"], BeforeValidator(_lowercase)]
+Condition = Annotated[Literal["excellent", "good", "fair", "poor"], BeforeValidator(_lowercase)]
+RecommendedAction = Annotated[Literal["buy", "negotiate", "inspect", "avoid"], BeforeValidator(_lowercase)]
+Number = Union[int, float]
+
+class ReportSection(BaseModel):
+    # Models often write recall numbers and the like as JSON numbers
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+class VehicleIdentification(ReportSection):
+    vin: str
+    make: str
+    model: str
+    year: Optional[int] = None
+    engine: Optional[str] = None
+    transmission: Optional[str] = None
+
+class Accident(ReportSection):
+    date: Optional[str] = None
+    severity: Severity
+    description: str = ""
+
+class AccidentHistory(ReportSection):
+    total_accidents: int
+    severity: Severity
+    structural_damage: bool
+    flood_damage: bool
+    accidents: List[Accident] = []
+
+class Owner(ReportSection):
+    duration: Optional[int] = None  # months
+    location: Optional[str] = None
+
+class OwnershipHistory(ReportSection):
+    total_owners: int
+    average_ownership_duration_months: Number
+    commercial_use: bool
+    rental_history: bool
+    owners: List[Owner] = []
+
+class TitleStatus(ReportSection):
+    status: TitleStatusValue
+    issues: List[str] = []
+    state_issued: Optional[str] = None
+
+class Recall(ReportSection):
+    number: Optional[str] = None
+    date: Optional[str] = None
+    component: str
+    description: str = ""
+    status: str
+
+class Recalls(ReportSection):
+    total_recalls: int
+    open_recalls: int
+    safety_recalls: int
+    recall_list: List[Recall] = []
+
+class ServiceRecord(ReportSection):
+    date: Optional[str] = None
+    mileage: Optional[int] = None
+    type: str
+
+class Maintenance(ReportSection):
+    regular_maintenance: bool
+    total_services: int
+    overdue_services: List[str] = []
+    last_service: Optional[ServiceRecord] = None
+
+class InsuranceClaim(ReportSection):
+    date: Optional[str] = None
+    type: str
+    amount: Optional[Number] = None
+    description: str = ""
+
+class InsuranceClaims(ReportSection):
+    total_claims: int
+    claims_severity: Level
+    claims: List[InsuranceClaim] = []
+
+class EstimatedValue(ReportSection):
+    min: Number
+    max: Number
+    currency: str = "USD"
+
+class OverallAssessment(ReportSection):
+    condition: Condition
+    risk_level: Level
+    recommended_action: RecommendedAction
+    key_findings: List[str]
+    estimated_value: EstimatedValue
+    confidence: float
+
+class VehicleReport(BaseModel):
+    vehicle_identification: VehicleIdentification
+    accident_history: AccidentHistory
+    ownership_history: OwnershipHistory
+    title_status: TitleStatus
+    recalls: Recalls
+    maintenance: Maintenance
+    insurance_claims: InsuranceClaims
+    overall_assessment: OverallAssessment
+
+class LLMBackend(BaseModel):
+    """One OpenAI-compatible model endpoint (AI_BACKENDS entry)."""
+    name: str
+    base_url: str
+    model: str
+    api_key: Optional[str] = None  # DEEPSEEK_API_KEY when not set
+    tier: Literal["fast", "strong"] = "strong"
+    # USD per million tokens
+    input_cost_per_mtok: float = 0.0
+    cached_input_cost_per_mtok: Optional[float] = None  # input price when not set
+    output_cost_per_mtok: float = 0.0
+
+class ProviderConfig(BaseModel):
+    """A data provider's effective settings (see providers.registry)."""
+    name: str
+    timeout: float  # seconds; ceiling for the adaptive timeout
+    concurrency: int  # calls in flight at once in this process
+    cache_ttl: int  # seconds, 0 disables caching
+    cost_weight: float = 1.0  # relative cost of one upstream call
 
 class ReportTaskResult(BaseModel):
     message: str
@@ -46,4 +228,54 @@ class ReportTaskResult(BaseModel):
 
 
 class CeleryTask(BaseModel):
-    id: str
\ No newline at end of file
+    id: str
+
+
+class BatchReportRequest(BaseModel):
+    vins: List[str]
+    force_refresh: bool = False
+
+
+class BatchCreated(BaseModel):
+    id: str
+    total: int  # number of distinct valid VINs queued
+    invalid_vins: List[str]
+
+
+class BatchItemResult(BaseModel):
+    vin: str
+    status: TaskStatus
+    message: Optional[str] = None
+    report_id: Optional[int] = None  # row in the reports table (and the submitter's history)
+    result: Optional[ReportResponse] = None
+
+
+class BatchStatusResult(BaseModel):
+    id: str
+    status: TaskStatus
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    in_progress: int
+    invalid_vins: List[str]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    offset: int
+    limit: int
+    items: List[BatchItemResult]
+
+
+class ReportSummary(BaseModel):
+    id: int
+    vin: str
+    confidence_score: float
+    generated_at: datetime
+    created_at: datetime
+
+
+class ReportHistory(BaseModel):
+    total: int
+    offset: int
+    limit: int
+    items: List[ReportSummary]
@@ -0,0 +1,35 @@
+from typing import Dict, Any
+from settings import settings
+from providers.http_client import bearer_headers, request_json
+from providers.registry import register_provider
+
+@register_provider("AutoCheck", cache_ttl=6 * 3600)
+async def fetch_autocheck_data(vin: str) -> Dict[str, Any]:
+    """
+    Fetch vehicle data from AutoCheck API.
+    Calls the API through the shared connection pool when an API key is configured,
+    otherwise returns mock data.
+    """
+    if settings.autocheck_api_key:
+        return await request_json(
+            "GET",
+            f"{settings.autocheck_api_url}/vehicle/history",
+            headers=bearer_headers(settings.autocheck_api_key),
+            params={"vin": vin}
+        )
+
+    # Mock data for demonstration
+    return {
+        "vin": vin,
+        "autocheck_score": 82,
+        "score_range": {"low": 79, "high": 88},
+        "owner_count": 2,
+        "accident_count": 1,
+        "title_brands": [],
+        "auction_history": [
+            {"date": "2022-06-20", "auction": "Manheim", "mileage": 38000, "condition_grade": 3.5}
+        ],
+        "use_history": [
+            {"type": "Personal", "from": "2018-01-01", "to": "present"}
+        ]
+    }
@@ -1,53 +1,36 @@
-import requests
-from datetime import datetime
 from typing import Dict, Any
-import logging
 from settings import settings
+from providers.http_client import bearer_headers, request_json
+from providers.registry import register_provider
 
-logger = logging.getLogger(__name__)
-
-def fetch_carfax_data(vin: str) -> Dict[str, Any]:
+@register_provider("Carfax", cache_ttl=6 * 3600)
+async def fetch_carfax_data(vin: str) -> Dict[str, Any]:
     """
     Fetch vehicle data from Carfax API.
-    This is a mock implementation. Replace with actual API calls.
+    Calls the API through the shared connection pool when an API key is configured,
+    otherwise returns mock data.
     """
-    try:
-        # Mock API endpoint and key
-        api_url = "https://api.carfax.com/v1/vehicle/history"
-        api_key = settings.carfax_api_key or "your_carfax_api_key_here"  # Fallback for mock
-
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        params = {"vin": vin}
-
-        # Simulate API call
-        # response = requests.get(api_url, headers=headers, params=params)
-        # response.raise_for_status()
-        # data = response.json()
-
-        # Mock data for demonstration
-        data = {
-            "vin": vin,
-            "accident_history": [
-                {"date": "2020-05-15", "description": "Minor rear-end collision", "severity": "minor"}
-            ],
-            "ownership_history": [
-                {"owner": "John Doe", "from": "2018-01-01", "to": "2022-06-30"},
-                {"owner": "Jane Smith", "from": "2022-07-01", "to": "present"}
-            ],
-            "title_status": "Clean",
-            "odometer_readings": [
-                {"date": "2020-01-01", "mileage": 15000},
-                {"date": "2023-01-01", "mileage": 45000}
-            ]
-        }
-
-        logger.info(f"Successfully fetched data from Carfax for VIN {vin}")
-        return data
-
-    except Exception as e:
-        logger.error(f"Failed to fetch data from Carfax for VIN {vin}: {e}")
-        raise e
\ No newline at end of file
+    if settings.carfax_api_key:
+        return await request_json(
+            "GET",
+            f"{settings.carfax_api_url}/vehicle/history",
+            headers=bearer_headers(settings.carfax_api_key),
+            params={"vin": vin}
+        )
+
+    # Mock data for demonstration
+    return {
+        "vin": vin,
+        "accident_history": [
+            {"date": "2020-05-15", "description": "Minor rear-end collision", "severity": "minor"}
+        ],
+        "ownership_history": [
+            {"owner": "John Doe", "from": "2018-01-01", "to": "2022-06-30"},
+            {"owner": "Jane Smith", "from": "2022-07-01", "to": "present"}
+        ],
+        "title_status": "Clean",
+        "odometer_readings": [
+            {"date": "2020-01-01", "mileage": 15000},
+            {"date": "2023-01-01", "mileage": 45000}
+        ]
+    }
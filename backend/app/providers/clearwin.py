@@ -1,55 +1,38 @@
-import requests
-from datetime import datetime
 from typing import Dict, Any
-import logging
 from settings import settings
+from providers.http_client import bearer_headers, request_json
+from providers.registry import register_provider
 
-logger = logging.getLogger(__name__)
-
-def fetch_clearwin_data(vin: str) -> Dict[str, Any]:
+@register_provider("ClearWin", cache_ttl=6 * 3600)
+async def fetch_clearwin_data(vin: str) -> Dict[str, Any]:
     """
     Fetch vehicle data from ClearWin API.
-    This is a mock implementation. Replace with actual API calls.
+    Calls the API through the shared connection pool when an API key is configured,
+    otherwise returns mock data.
     """
-    try:
-        # Mock API endpoint and key
-        api_url = "https://api.clearwin.com/v1/vehicle/report"
-        api_key = settings.clearwin_api_key or "your_clearwin_api_key_here"  # Fallback for mock
-
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        params = {"vin": vin}
-
-        # Simulate API call
-        # response = requests.get(api_url, headers=headers, params=params)
-        # response.raise_for_status()
-        # data = response.json()
-
-        # Mock data for demonstration
-        data = {
-            "vin": vin,
-            "damage_reports": [
-                {"date": "2019-08-20", "description": "Windshield replacement", "cost": 350}
-            ],
-            "service_history": [
-                {"date": "2019-03-10", "service": "Oil change", "mileage": 12000},
-                {"date": "2021-09-15", "service": "Tire replacement", "mileage": 30000}
-            ],
-            "recall_information": [
-                {"recall_date": "2020-02-01", "description": "Airbag sensor recall", "status": "completed"}
-            ],
-            "market_value": {
-                "current_value": 25000,
-                "depreciation_rate": 0.12
-            }
+    if settings.clearwin_api_key:
+        return await request_json(
+            "GET",
+            f"{settings.clearwin_api_url}/vehicle/report",
+            headers=bearer_headers(settings.clearwin_api_key),
+            params={"vin": vin}
+        )
+
+    # Mock data for demonstration
+    return {
+        "vin": vin,
+        "damage_reports": [
+            {"date": "2019-08-20", "description": "Windshield replacement", "cost": 350}
+        ],
+        "service_history": [
+            {"date": "2019-03-10", "service": "Oil change", "mileage": 12000},
+            {"date": "2021-09-15", "service": "Tire replacement", "mileage": 30000}
+        ],
+        "recall_information": [
+            {"recall_date": "2020-02-01", "description": "Airbag sensor recall", "status": "completed"}
+        ],
+        "market_value": {
+            "current_value": 25000,
+            "depreciation_rate": 0.12
         }
-
-        logger.info(f"Successfully fetched data from ClearWin for VIN {vin}")
-        return data
-
-    except Exception as e:
-        logger.error(f"Failed to fetch data from ClearWin for VIN {vin}: {e}")
-        raise e
\ No newline at end of file
+    }
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import httpx
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Process-wide state. Every provider coroutine runs on one long-lived event loop
+# so the keep-alive pools in the AsyncClients survive across reports instead of
+# being torn down with a per-call asyncio.run().
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_owner_pid: Optional[int] = None
+_clients: Dict[str, httpx.AsyncClient] = {}
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """Drop state inherited from a parent process (e.g. Celery prefork children)."""
+    global _loop, _loop_thread, _clients, _host_semaphores, _owner_pid
+    _loop = None
+    _loop_thread = None
+    _clients = {}
+    _host_semaphores = {}
+    _owner_pid = os.getpid()
+
+
+def get_provider_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop that owns the shared HTTP pool, starting it on first use.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        if _owner_pid != os.getpid():
+            _reset_after_fork()
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="provider-loop", daemon=True
+            )
+            _loop_thread.start()
+        return _loop
+
+
+def run_in_provider_loop(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    Run a provider coroutine from synchronous code (Celery tasks) and wait for it.
+
+    Args:
+        coro: The coroutine to run
+        timeout: Optional number of seconds to wait for the result
+
+    Returns:
+        The coroutine result
+    """
+    loop = get_provider_loop()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
+
+
+def get_http_client(host: str) -> httpx.AsyncClient:
+    """
+    Return the shared keep-alive client for an upstream host. Must be called from
+    the provider loop.
+
+    Each host gets its own small pool: httpcore scans the whole pool for every
+    queued request, so one large pool shared by all providers degrades badly
+    under concurrency.
+    """
+    client = _clients.get(host)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.provider_read_timeout,
+                connect=settings.provider_connect_timeout,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.provider_max_per_host,
+                max_keepalive_connections=settings.provider_max_per_host,
+                keepalive_expiry=settings.provider_keepalive_expiry,
+            ),
+        )
+        _clients[host] = client
+    return client
+
+
+def bearer_headers(api_key: str) -> Dict[str, str]:
+    """Headers for provider APIs that take a bearer token."""
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.provider_max_per_host)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+
+async def request_json(method: str, url: str, **kwargs) -> Any:
+    """
+    Send a request through the shared pool and return the decoded JSON body.
+
+    Concurrent requests to the same host are capped at `provider_max_per_host`.
+
+    Raises:
+        httpx.HTTPError: On timeouts, connection errors and non-2xx responses
+    """
+    host = urlsplit(url).netloc
+    async with _host_semaphore(host):
+        response = await get_http_client(host).request(method, url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+async def close_http_clients():
+    """Close the shared clients. Must run on the provider loop, see shutdown_provider_loop."""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
+
+
+async def _stop_pending_work():
+    """Cancel what is still running on the provider loop (cache counters, NHTSA batches), then close the clients."""
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    await close_http_clients()
+
+
+def shutdown_provider_loop(timeout: float = 5.0):
+    """
+    Close the shared clients and stop the provider loop, if this process
+    started one. Called on API and worker shutdown and by benchmarks.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        loop, thread = _loop, _loop_thread
+        if loop is None or _owner_pid != os.getpid():
+            return
+        _loop = None
+        _loop_thread = None
+
+    try:
+        asyncio.run_coroutine_threadsafe(_stop_pending_work(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"Failed to close provider HTTP clients: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    if not thread.is_alive():
+        loop.close()
@@ -1,26 +1,123 @@
-import requests
-from typing import Dict, Any
+import asyncio
+from typing import Dict, Any, List, Optional
 import logging
+from settings import settings
+from providers.http_client import request_json
+from providers.registry import register_provider
 
 logger = logging.getLogger(__name__)
 
-def fetch_nhtsa_data(vin: str) -> Dict[str, Any]:
+# VPIC accepts at most 50 VINs per DecodeVINValuesBatch request
+VPIC_MAX_BATCH_SIZE = 50
+
+
+async def decode_vins_batch(vins: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Decode up to 50 VINs in one POST to VPIC's DecodeVINValuesBatch endpoint.
+
+    Returns:
+        Decoded records keyed by upper-cased VIN; VINs VPIC did not return are absent
+    """
+    data = await request_json(
+        "POST",
+        f"{settings.nhtsa_api_url}/DecodeVINValuesBatch/",
+        data={"format": "json", "data": ";".join(vins)}
+    )
+    return {
+        str(record.get("VIN", "")).upper(): record
+        for record in data.get("Results", [])
+    }
+
+
+class NHTSABatcher:
+    """
+    Collects VIN decodes requested within `nhtsa_batch_window` seconds (or until
+    `nhtsa_batch_max_size` are pending) and sends them as one batch request,
+    then hands each caller its own record.
+
+    Lives on the provider loop; all methods must be called from it.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = min(max_size, VPIC_MAX_BATCH_SIZE)
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight = set()
+
+    async def decode(self, vin: str) -> Dict[str, Any]:
+        vin = vin.upper()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(vin, []).append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: Dict[str, List[asyncio.Future]]):
+        try:
+            records = await decode_vins_batch(list(batch))
+            logger.info(f"Decoded {len(batch)} VINs in one NHTSA batch request")
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for vin, futures in batch.items():
+            record = records.get(vin)
+            for future in futures:
+                if future.done():
+                    continue
+                if record is None:
+                    future.set_exception(ValueError("No vehicle data found in NHTSA response"))
+                else:
+                    future.set_result(record)
+
+
+_batcher: Optional[NHTSABatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_nhtsa_batcher() -> NHTSABatcher:
+    """Return the batcher for the running loop (recreated after a fork)."""
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher = NHTSABatcher(settings.nhtsa_batch_window, settings.nhtsa_batch_max_size)
+        _batcher_loop = loop
+    return _batcher
+
+
+# VPIC is free; lookups waiting on the batcher hold a slot, so the pool has to
+# fit several batches or it would cap their size
+@register_provider("NHTSA", concurrency=4 * VPIC_MAX_BATCH_SIZE, cache_ttl=30 * 24 * 3600, cost_weight=0.0)
+async def fetch_nhtsa_data(vin: str) -> Dict[str, Any]:
     """
     Fetch vehicle data from NHTSA VPIC API.
+    With `nhtsa_batch_enabled`, concurrent lookups are combined into batch requests.
     """
-    try:
-        url = f"https://vpic.nhtsa.dot.gov/api/vehicles/decodevinvaluesextended/{vin}?format=json"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if 'Results' in data and data['Results']:
-            vehicle_data = data['Results'][0]
-            logger.info(f"Successfully fetched data from NHTSA for VIN {vin}")
-            return vehicle_data
-        else:
-            raise ValueError("No vehicle data found in NHTSA response")
-
-    except Exception as e:
-        logger.error(f"Failed to fetch data from NHTSA for VIN {vin}: {e}")
-        raise e
\ No newline at end of file
+    if settings.nhtsa_batch_enabled:
+        return await get_nhtsa_batcher().decode(vin)
+
+    url = f"{settings.nhtsa_api_url}/decodevinvaluesextended/{vin}"
+    data = await request_json("GET", url, params={"format": "json"})
+
+    if 'Results' in data and data['Results']:
+        return data['Results'][0]
+    raise ValueError("No vehicle data found in NHTSA response")
@@ -0,0 +1,115 @@
+"""
+Provider registry.
+
+Each provider module declares itself with @register_provider: its name, the
+fetch coroutine and defaults for its timeout, concurrency limit, cache TTL
+and cost weight. Which providers run for a report comes from
+`providers_enabled`; a provider named there is loaded from
+providers/<name in lower case>.py, so adding one means adding its module and
+enabling it. `provider_overrides` changes any declared value per provider.
+
+Every provider gets its own concurrency pool (a semaphore on the provider
+loop), so a backlog at one provider does not hold up calls to the others.
+"""
+import asyncio
+import importlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from models import ProviderConfig
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+FetchFunc = Callable[[str], Awaitable[Dict[str, Any]]]
+
+_fetchers: Dict[str, FetchFunc] = {}
+_declared: Dict[str, Dict[str, Any]] = {}
+_unavailable: set = set()
+
+_slots: Dict[str, asyncio.Semaphore] = {}
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def register_provider(
+    name: str,
+    timeout: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    cache_ttl: Optional[int] = None,
+    cost_weight: Optional[float] = None,
+) -> Callable[[FetchFunc], FetchFunc]:
+    """
+    Register a provider's fetch coroutine. Values left as None fall back to
+    the global provider settings (provider_read_timeout, provider_max_per_host,
+    provider_cache_default_ttl) and a cost weight of 1.
+    """
+    def decorator(fetch: FetchFunc) -> FetchFunc:
+        _fetchers[name] = fetch
+        _declared[name] = {
+            "timeout": timeout,
+            "concurrency": concurrency,
+            "cache_ttl": cache_ttl,
+            "cost_weight": cost_weight,
+        }
+        return fetch
+    return decorator
+
+
+def _load(name: str) -> Optional[FetchFunc]:
+    if name not in _fetchers and name not in _unavailable:
+        try:
+            importlib.import_module(f"providers.{name.lower()}")
+        except ImportError as e:
+            logger.error(f"Provider {name} is enabled but could not be loaded: {e}")
+        if name not in _fetchers:
+            _unavailable.add(name)
+    return _fetchers.get(name)
+
+
+def get_enabled_providers() -> List[Tuple[str, FetchFunc]]:
+    """
+    (name, fetch coroutine) of every enabled provider that could be loaded, in
+    configured order. Empty if none could; reports then carry no provider data.
+    """
+    providers = []
+    for name in settings.providers_enabled:
+        fetch = _load(name)
+        if fetch is not None:
+            providers.append((name, fetch))
+    if not providers:
+        logger.error(f"No data provider is available (PROVIDERS_ENABLED={settings.providers_enabled})")
+    return providers
+
+
+def get_provider_config(name: str) -> ProviderConfig:
+    """
+    A provider's effective settings: global defaults, then its declaration,
+    then provider_cache_ttls, then provider_overrides.
+    """
+    values: Dict[str, Any] = {
+        "timeout": settings.provider_read_timeout,
+        "concurrency": settings.provider_max_per_host,
+        "cache_ttl": settings.provider_cache_default_ttl,
+        "cost_weight": 1.0,
+    }
+    values.update({key: value for key, value in _declared.get(name, {}).items() if value is not None})
+    if name in settings.provider_cache_ttls:
+        values["cache_ttl"] = settings.provider_cache_ttls[name]
+    values.update(settings.provider_overrides.get(name, {}))
+    return ProviderConfig(name=name, **values)
+
+
+def provider_slot(name: str) -> asyncio.Semaphore:
+    """
+    The provider's concurrency pool. Must be called from the provider loop;
+    pools are recreated when the loop changes (e.g. after a fork).
+    """
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots_loop is not loop:
+        _slots = {}
+        _slots_loop = loop
+    slot = _slots.get(name)
+    if slot is None:
+        slot = _slots[name] = asyncio.Semaphore(get_provider_config(name).concurrency)
+    return slot
@@ -0,0 +1,119 @@
+"""
+World Manufacturer Identifier (VIN positions 1-3) lookup tables.
+
+WMI_MANUFACTURERS covers common passenger-vehicle WMIs; COUNTRY_RANGES maps
+the first two VIN characters to the country of manufacture (ISO 3780 / SAE
+J272 allocations). Anything not listed decodes as unknown.
+"""
+
+# Order of characters used by the country code ranges
+RANGE_ALPHABET = "ABCDEFGHJKLMNPRSTUVWXYZ1234567890"
+
+REGIONS = {
+    **{c: "Africa" for c in "ABCDEFGH"},
+    **{c: "Asia" for c in "JKLMNPR"},
+    **{c: "Europe" for c in "STUVWXYZ"},
+    **{c: "North America" for c in "12345"},
+    **{c: "Oceania" for c in "67"},
+    **{c: "South America" for c in "89"},
+}
+
+# (first character, second character from, second character to, country)
+COUNTRY_RANGES = [
+    ("A", "A", "H", "South Africa"),
+    ("J", "A", "0", "Japan"),
+    ("K", "L", "R", "South Korea"),
+    ("L", "A", "0", "China"),
+    ("M", "A", "E", "India"),
+    ("M", "F", "K", "Indonesia"),
+    ("M", "L", "R", "Thailand"),
+    ("N", "L", "R", "Turkey"),
+    ("P", "L", "R", "Malaysia"),
+    ("R", "F", "K", "Taiwan"),
+    ("S", "A", "M", "United Kingdom"),
+    ("S", "N", "T", "Germany"),
+    ("S", "U", "Z", "Poland"),
+    ("T", "A", "H", "Switzerland"),
+    ("T", "J", "P", "Czech Republic"),
+    ("T", "R", "V", "Hungary"),
+    ("T", "W", "1", "Portugal"),
+    ("U", "U", "1", "Romania"),
+    ("U", "5", "7", "Slovakia"),
+    ("V", "A", "E", "Austria"),
+    ("V", "F", "R", "France"),
+    ("V", "S", "W", "Spain"),
+    ("V", "X", "2", "Serbia"),
+    ("W", "A", "0", "Germany"),
+    ("X", "L", "R", "Netherlands"),
+    ("X", "S", "W", "Russia"),
+    ("Y", "A", "E", "Belgium"),
+    ("Y", "F", "K", "Finland"),
+    ("Y", "S", "W", "Sweden"),
+    ("Z", "A", "R", "Italy"),
+    ("1", "A", "0", "United States"),
+    ("4", "A", "0", "United States"),
+    ("5", "A", "0", "United States"),
+    ("7", "F", "0", "United States"),
+    ("2", "A", "0", "Canada"),
+    ("3", "A", "W", "Mexico"),
+    ("6", "A", "W", "Australia"),
+    ("7", "A", "E", "New Zealand"),
+    ("8", "A", "E", "Argentina"),
+    ("9", "A", "E", "Brazil"),
+    ("9", "3", "9", "Brazil"),
+]
+
+WMI_MANUFACTURERS = {
+    # United States
+    "1FA": "Ford", "1FB": "Ford", "1FC": "Ford", "1FD": "Ford", "1FM": "Ford", "1FT": "Ford",
+    "1LN": "Lincoln", "1ME": "Mercury",
+    "1G1": "Chevrolet", "1GC": "Chevrolet", "1GN": "Chevrolet", "1GB": "Chevrolet",
+    "1G4": "Buick", "1G6": "Cadillac", "1GY": "Cadillac", "1GT": "GMC", "1GK": "GMC",
+    "1C3": "Chrysler", "1C4": "Chrysler", "1C6": "Ram", "1B3": "Dodge", "1D7": "Dodge",
+    "1J4": "Jeep", "1J8": "Jeep",
+    "1HG": "Honda", "1HD": "Harley-Davidson", "1N4": "Nissan", "1N6": "Nissan",
+    "1VW": "Volkswagen", "1YV": "Mazda",
+    "4T1": "Toyota", "4T3": "Toyota", "4T4": "Toyota", "4S3": "Subaru", "4S4": "Subaru",
+    "4JG": "Mercedes-Benz", "4US": "BMW", "4V4": "Volvo Trucks",
+    "5FN": "Honda", "5J6": "Honda", "5J8": "Acura", "5N1": "Nissan", "5NP": "Hyundai",
+    "5NM": "Hyundai", "5XY": "Kia", "5TD": "Toyota", "5TF": "Toyota", "5UX": "BMW",
+    "5YJ": "Tesla", "7SA": "Tesla", "7FA": "Honda",
+    # Canada
+    "2HG": "Honda", "2HK": "Honda", "2HN": "Acura", "2T1": "Toyota", "2T2": "Lexus",
+    "2T3": "Toyota", "2G1": "Chevrolet", "2GN": "Chevrolet", "2FA": "Ford", "2FM": "Ford",
+    "2C3": "Chrysler", "2C4": "Chrysler", "2LM": "Lincoln",
+    # Mexico
+    "3FA": "Ford", "3G1": "Chevrolet", "3GN": "Chevrolet", "3GC": "Chevrolet",
+    "3VW": "Volkswagen", "3N1": "Nissan", "3HG": "Honda", "3C4": "Chrysler", "3C6": "Ram",
+    "3KP": "Kia", "3MZ": "Mazda", "3MW": "BMW",
+    # Japan
+    "JH4": "Acura", "JHM": "Honda", "JHL": "Honda", "JN1": "Nissan", "JN8": "Nissan",
+    "JT2": "Toyota", "JTD": "Toyota", "JTE": "Toyota", "JTM": "Toyota", "JTN": "Toyota",
+    "JTH": "Lexus", "JTJ": "Lexus", "JM1": "Mazda", "JM3": "Mazda", "JF1": "Subaru",
+    "JF2": "Subaru", "JA3": "Mitsubishi", "JA4": "Mitsubishi", "JS2": "Suzuki",
+    "JS1": "Suzuki", "JYA": "Yamaha", "JKA": "Kawasaki",
+    # South Korea
+    "KMH": "Hyundai", "KM8": "Hyundai", "KNA": "Kia", "KND": "Kia", "KNM": "Renault Samsung",
+    "KL1": "Chevrolet", "KPT": "SsangYong",
+    # China
+    "LRW": "Tesla", "LSV": "Volkswagen", "LFV": "Volkswagen", "LBV": "BMW",
+    "LSG": "Chevrolet", "LHG": "Honda", "LVS": "Ford",
+    # India
+    "MA1": "Mahindra", "MAL": "Hyundai", "MAT": "Tata",
+    # Thailand, Turkey
+    "MRH": "Honda", "NMT": "Toyota",
+    # Europe
+    "WVW": "Volkswagen", "WV1": "Volkswagen", "WV2": "Volkswagen", "WAU": "Audi",
+    "WA1": "Audi", "TRU": "Audi", "WBA": "BMW", "WBS": "BMW M", "WMW": "MINI",
+    "WDB": "Mercedes-Benz", "WDC": "Mercedes-Benz", "WDD": "Mercedes-Benz",
+    "W1K": "Mercedes-Benz", "W1N": "Mercedes-Benz", "WME": "smart",
+    "WP0": "Porsche", "WP1": "Porsche", "W0L": "Opel", "WF0": "Ford",
+    "ZFA": "Fiat", "ZFF": "Ferrari", "ZAR": "Alfa Romeo", "ZHW": "Lamborghini",
+    "ZAM": "Maserati", "VF1": "Renault", "VF3": "Peugeot", "VF7": "Citroen",
+    "VSS": "SEAT", "TMB": "Skoda", "TMA": "Hyundai", "U5Y": "Kia", "VNK": "Toyota",
+    "YV1": "Volvo", "YS3": "Saab", "XTA": "Lada",
+    "SAJ": "Jaguar", "SAL": "Land Rover", "SCA": "Rolls-Royce", "SCB": "Bentley",
+    "SCC": "Lotus", "SCF": "Aston Martin", "SHH": "Honda", "SJN": "Nissan",
+    # Oceania, South America
+    "6G1": "Holden", "6T1": "Toyota", "9BW": "Volkswagen", "9BG": "Chevrolet",
+}
@@ -0,0 +1,45 @@
+"""
+Health, stats and metrics endpoints for operators.
+
+The services behind them (provider cache and breakers, queue stats,
+Prometheus) are imported when an endpoint is first called, so the API process
+does not load httpx or prometheus_client just to serve reports.
+"""
+from fastapi import APIRouter, Response
+
+from settings import settings
+
+router = APIRouter()
+
+
+@router.get("/health")
+def health_check():
+    return {"status": "healthy"}
+
+@router.get("/cache/stats")
+def cache_stats():
+    from services.provider_cache import get_cache_stats
+    return {"providers": get_cache_stats()}
+
+@router.get("/providers/health")
+def provider_health():
+    from services.provider_health import get_provider_health
+    return {"providers": get_provider_health()}
+
+@router.get("/queues/stats")
+def queue_stats():
+    from services.queue_metrics import get_queue_stats
+    from workers.celeryapp import celeryapp
+    return {"queues": get_queue_stats(celeryapp)}
+
+@router.get("/llm/stats")
+def llm_stats():
+    from services.llm_rate_limiter import get_llm_rate_stats
+    return {"rate_limit": get_llm_rate_stats()}
+
+if settings.metrics_enabled:
+    @router.get("/metrics", include_in_schema=False)
+    def metrics():
+        from services.metrics import render_metrics
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
@@ -1,11 +1,37 @@
+import hashlib
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
 
 
-from services.vin_validator import validate_vin
-from models import ReportRequest, CeleryTask, ReportTaskResult
-from workers.tasks import generate_car_report_task, get_celery_task_result
-from exceptions import CeleryTaskNotFound
+from services.vin_validator import check_vin, check_vins
+from models import (
+    ReportRequest,
+    CeleryTask,
+    ReportTaskResult,
+    BatchReportRequest,
+    BatchCreated,
+    BatchStatusResult,
+    ReportResponse,
+    VinCheck,
+    VinValidationRequest,
+    VinValidationResult,
+    ReportHistory,
+)
+from auth import get_current_user, get_optional_current_user
+from database import get_db
+from workers.dispatch import dispatch_batch, enqueue_report, get_celery_task_result, start_report_pipeline
+from exceptions import CeleryTaskNotFound, BatchNotFound, RateLimitExceeded
+from settings import settings
+from services.batch_service import normalize_vins, create_batch, get_batch_status
+from services.task_coalescer import enqueue_coalesced
+from services import rate_limiter
+from services.report_store import get_latest_report_for_vin, get_report, get_user_reports
+from services.user_service import get_user_by_email
+from services.task_events import stream_task_events, iter_task_events, publish_status
+from enums import ReportStage, TaskStatus
 
 
 
@@ -13,22 +39,80 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/generate", response_model=CeleryTask, tags=["report"])
-def generate_car_report(request: ReportRequest):
+def _checked_vin(vin: str) -> str:
+    """Normalize a VIN, or raise a 400 saying why it is invalid."""
+    check = check_vin(vin)
+    if not check.valid:
+        raise HTTPException(status_code=400, detail=f"Invalid VIN: {'; '.join(check.errors)}")
+    return check.vin
+
+def _current_user_id(db: Session, current_user) -> Optional[int]:
+    if current_user is None:
+        return None
+    if current_user.user_id is not None:
+        return current_user.user_id
+    # Tokens issued before the uid claim existed
+    user = get_user_by_email(db, current_user.email)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user.id
+
+def _enforce_rate_limit(bucket: str, http_request: Request, user_id: Optional[int], cost: int = 1):
+    """Charge the caller's token bucket (per user, or per client IP when anonymous), or raise a 429."""
+    if user_id is not None:
+        identity = f"user:{user_id}"
+    else:
+        identity = f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+    try:
+        rate_limiter.acquire(bucket, identity, cost)
+    except RateLimitExceeded as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else None
+        raise HTTPException(status_code=429, detail=str(e), headers=headers)
 
+
+
+@router.post("/generate", response_model=CeleryTask, tags=["report"])
+def generate_car_report(
+    request: ReportRequest,
+    http_request: Request,
+    current_user=Depends(get_optional_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue a report for a VIN. Signed-in users get the report in their history.
+    """
     # --- 1. Validate VIN ---
-    if not validate_vin(request.vin):
-        raise HTTPException(status_code=400, detail="Invalid VIN format")
+    vin = _checked_vin(request.vin)
+
+    user_id = _current_user_id(db, current_user)
+    _enforce_rate_limit(rate_limiter.INTERACTIVE, http_request, user_id)
 
-    task = generate_car_report_task.delay(request.vin)
+    # --- 2. Enqueue, or attach to a task already running for this VIN ---
+    def enqueue(new_task_id: str):
+        # Published first so it cannot land after the worker's own status events
+        publish_status(new_task_id, ReportStage.QUEUED)
+        if settings.report_pipeline_enabled:
+            start_report_pipeline(new_task_id, vin, request.force_refresh, user_id)
+        else:
+            enqueue_report(new_task_id, vin, request.force_refresh, user_id)
 
-    return CeleryTask(id = task.id)
+    task_id, _ = enqueue_coalesced(vin, enqueue, user_id, request.force_refresh)
+
+    return CeleryTask(id = task_id)
 
 
 @router.get("/result/{task_id}", response_model=ReportTaskResult, tags=["report"])
-def get_task_result(task_id: str):
+def get_task_result(
+    task_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
     Get the result of a Celery task by ID.
+
+    Prefer /stream/{task_id} or /ws/{task_id}, which push updates. Pollers get
+    an ETag (send it back in If-None-Match for a bodiless 304 while nothing
+    changed) and, until the task finishes, a Retry-After hint.
     
     Args:
         task_id: The ID of the Celery task
@@ -40,6 +124,168 @@ def get_task_result(task_id: str):
         HTTPException: If task is not found
     """
     try:
-        return get_celery_task_result(task_id)
+        result = get_celery_task_result(task_id)
     except CeleryTaskNotFound:
         raise HTTPException(status_code=404, detail="Task ID not found")
+
+    etag = f'"{hashlib.sha1(result.model_dump_json().encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if result.status not in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+        headers["Retry-After"] = str(settings.report_poll_interval)
+
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return result
+
+
+@router.get("/stream/{task_id}", tags=["report"])
+async def stream_task_result(task_id: str):
+    """
+    Stream task progress as Server-Sent Events.
+
+    Emits `status` events ({"stage": "queued" | "aggregating" | "generating"}),
+    a `section` event ({"name", "content"}) per finished report section, then a
+    final `done` or `failed` event. Late subscribers get earlier events replayed.
+    """
+    return StreamingResponse(
+        stream_task_events(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws/{task_id}")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """
+    Same events as /stream/{task_id}, sent as JSON messages ({"id", "event", "data"}).
+    The server closes the socket after the final event.
+    """
+    await websocket.accept()
+    try:
+        async for item in iter_task_events(task_id):
+            if item is None:
+                continue
+            seq, event, data = item
+            await websocket.send_json({"id": seq, "event": event, "data": data})
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+@router.post("/batch", response_model=BatchCreated, tags=["report"])
+def generate_batch_reports(
+    request: BatchReportRequest,
+    http_request: Request,
+    current_user=Depends(get_optional_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue reports for many VINs at once.
+
+    VINs are validated and deduplicated; invalid ones are returned in
+    `invalid_vins` and skipped. Follow progress at /batch/{batch_id}.
+    Batches run on the bulk queue and each valid VIN costs one token of the
+    caller's bulk rate limit.
+    """
+    if len(request.vins) > settings.report_batch_max_vins:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.report_batch_max_vins} VINs"
+        )
+
+    vins, invalid_vins = normalize_vins(request.vins)
+    if not vins:
+        raise HTTPException(status_code=400, detail="No valid VINs in batch")
+
+    user_id = _current_user_id(db, current_user)
+    _enforce_rate_limit(rate_limiter.BULK, http_request, user_id, cost=len(vins))
+
+    batch_id = create_batch(vins, invalid_vins)
+    dispatch_batch(batch_id, vins, request.force_refresh, user_id)
+
+    return BatchCreated(id=batch_id, total=len(vins), invalid_vins=invalid_vins)
+
+
+@router.post("/validate", response_model=VinValidationResult, tags=["vin"])
+def validate_vins_endpoint(request: VinValidationRequest):
+    """
+    Validate and decode many VINs without queueing anything (bulk upload pre-check).
+    """
+    if len(request.vins) > settings.vin_validate_max_vins:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.vin_validate_max_vins} VINs can be validated at once"
+        )
+    results = check_vins(request.vins)
+    valid = sum(1 for result in results if result.valid)
+    return VinValidationResult(
+        total=len(results), valid=valid, invalid=len(results) - valid, results=results
+    )
+
+
+@router.get("/decode/{vin}", response_model=VinCheck, tags=["vin"])
+def decode_vin(vin: str):
+    """
+    Decode what the VIN itself tells (manufacturer, country, model year) without calling any provider.
+    """
+    return check_vin(vin)
+
+
+@router.get("/batch/{batch_id}", response_model=BatchStatusResult, tags=["report"])
+def get_batch_result(
+    batch_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Get overall progress of a batch and one page of per-VIN statuses and results.
+    """
+    try:
+        return get_batch_status(db, batch_id, offset=offset, limit=limit)
+    except BatchNotFound:
+        raise HTTPException(status_code=404, detail="Batch ID not found")
+
+
+@router.get("/by-vin/{vin}", response_model=ReportResponse, tags=["report"])
+def get_report_by_vin(vin: str, db: Session = Depends(get_db)):
+    """
+    Get the most recent stored report for a VIN without running the task pipeline.
+    """
+    row = get_latest_report_for_vin(db, _checked_vin(vin))
+    if row is None:
+        raise HTTPException(status_code=404, detail="No report found for this VIN")
+    # Stored as serialized ReportResponse JSON; no need to validate it again
+    return Response(content=row.report, media_type="application/json")
+
+
+@router.get("/history", response_model=ReportHistory, tags=["report"])
+def get_report_history(
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the signed-in user's reports, newest first.
+    """
+    user_id = _current_user_id(db, current_user)
+    total, items = get_user_reports(db, user_id, offset=offset, limit=limit)
+    return ReportHistory(total=total, offset=offset, limit=limit, items=items)
+
+
+@router.get("/history/{report_id}", response_model=ReportResponse, tags=["report"])
+def get_history_report(
+    report_id: int,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get one report from the signed-in user's history.
+    """
+    user_id = _current_user_id(db, current_user)
+    row = get_report(db, report_id)
+    if row is None or row.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return Response(content=row.report, media_type="application/json")
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, Cookie
 from datetime import timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
     create_refresh_token,
     decode_refresh_token,
@@ -18,28 +18,34 @@ from auth import (
     SignupRequest,
 )
 from settings import settings
-from services.user_service import create_user, get_user_by_email
-from database import get_db
+from services.user_service import create_user_async, get_user_by_email_async, get_user_profile, user_profile
+from database import get_async_db
 
 router = APIRouter()
 
+def _access_token_claims(profile: dict) -> dict:
+    claims = {"sub": profile["email"], "uid": profile["id"]}
+    if settings.jwt_profile_claims:
+        claims["name"] = profile["name"]
+    return claims
+
 @router.post("/signup", response_model=TokenResponse, tags=["user"])
-def signup(signup_request: SignupRequest, response: Response, db: Session = Depends(get_db)):
+async def signup(signup_request: SignupRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    existing_user = get_user_by_email(db, signup_request.email)
+    existing_user = await get_user_by_email_async(db, signup_request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Hash the password
-    hashed_password = get_password_hash(signup_request.password)
+    hashed_password = await get_password_hash_async(signup_request.password)
 
     # Create the user
-    user = create_user(db, email=signup_request.email, password=hashed_password, name=signup_request.name, phone=signup_request.phone)
+    user = await create_user_async(db, email=signup_request.email, password=hashed_password, name=signup_request.name, phone=signup_request.phone)
 
     # Generate access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": signup_request.email}, expires_delta=access_token_expires
+        data=_access_token_claims(user_profile(user)), expires_delta=access_token_expires
     )
 
     # Generate refresh token
@@ -63,18 +69,18 @@ def signup(signup_request: SignupRequest, response: Response, db: Session = Depe
     }
 
 @router.post("/login", response_model=TokenResponse, tags=["user"])
-def login(login_request: LoginRequest, response: Response, db: Session = Depends(get_db)):
+async def login(login_request: LoginRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
     # Get user by email
-    user = get_user_by_email(db, login_request.email)
+    user = await get_user_by_email_async(db, login_request.email)
 
     # Verify password (always runs even if user doesn't exist)
-    if not user or not verify_password(login_request.password, user.password):
+    if not user or not await verify_password_async(login_request.password, user.password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
     # Generate access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_access_token_claims(user_profile(user)), expires_delta=access_token_expires
     )
 
     # Generate refresh token
@@ -98,17 +104,18 @@ def login(login_request: LoginRequest, response: Response, db: Session = Depends
     }
 
 @router.get("/me", tags=["user"])
-def get_current_user_info(current_user: str = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = get_user_by_email(db, current_user.email)
-    if not user:
+async def get_current_user_info(current_user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # The phone number never travels in tokens; the profile cache spares the database
+    profile = await get_user_profile(db, current_user.email)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"email": user.email, "name": user.name, "phone": user.phone}
+    return {"email": profile["email"], "name": profile["name"], "phone": profile["phone"]}
 
 @router.post("/refresh", response_model=TokenResponse, tags=["user"])
-def refresh_token(
+async def refresh_token(
     response: Response,
     refresh_token: Optional[str] = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Token refresh endpoint using httpOnly cookie.
@@ -127,18 +134,18 @@ def refresh_token(
     token_data = decode_refresh_token(refresh_token)
 
     # Verify the user still exists
-    user = get_user_by_email(db, token_data.email)
-    if not user:
+    profile = await get_user_profile(db, token_data.email)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Generate new access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=_access_token_claims(profile), expires_delta=access_token_expires
     )
 
     # Generate new refresh token
-    new_refresh_token = create_refresh_token(data={"sub": user.email})
+    new_refresh_token = create_refresh_token(data={"sub": profile["email"]})
 
     # Update cookie with new refresh token
     response.set_cookie(
@@ -158,7 +165,7 @@ def refresh_token(
     }
 
 @router.post("/logout", tags=["user"])
-def logout(response: Response):
+async def logout(response: Response):
     """
     Logout endpoint that clears the refresh token cookie.
     """
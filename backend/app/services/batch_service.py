@@ -0,0 +1,160 @@
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from enums import TaskStatus
+from exceptions import BatchNotFound
+from models import BatchItemResult, BatchStatusResult, ReportResponse
+from settings import settings
+from services.redis_client import get_redis
+from services.report_store import get_report_bodies
+from services.vin_validator import normalize_vin, validate_vins
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "report-batch"
+
+
+def _meta_key(batch_id: str) -> str:
+    return f"{KEY_PREFIX}:{batch_id}"
+
+
+def _vins_key(batch_id: str) -> str:
+    return f"{KEY_PREFIX}:{batch_id}:vins"
+
+
+def _items_key(batch_id: str) -> str:
+    return f"{KEY_PREFIX}:{batch_id}:items"
+
+
+def _results_key(batch_id: str) -> str:
+    return f"{KEY_PREFIX}:{batch_id}:results"
+
+
+def normalize_vins(vins: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Upper-case, validate and dedupe VINs, keeping the submitted order.
+
+    Returns:
+        (valid_vins, invalid_vins)
+    """
+    unique = {}
+    for raw_vin in vins:
+        vin = normalize_vin(raw_vin)
+        if vin not in unique:
+            unique[vin] = raw_vin
+
+    valid, invalid = [], []
+    for (vin, raw_vin), is_valid in zip(unique.items(), validate_vins(list(unique))):
+        if is_valid:
+            valid.append(vin)
+        else:
+            invalid.append(raw_vin)
+    return valid, invalid
+
+
+def create_batch(vins: List[str], invalid_vins: List[str]) -> str:
+    """
+    Record a new batch with every VIN pending. Returns the batch id.
+    """
+    batch_id = str(uuid.uuid4())
+    ttl = settings.report_batch_ttl
+    pending = json.dumps({"status": TaskStatus.PENDING.value})
+
+    pipe = get_redis().pipeline()
+    pipe.hset(_meta_key(batch_id), mapping={
+        "created_at": datetime.utcnow().isoformat(),
+        "total": len(vins),
+        "invalid_vins": json.dumps(invalid_vins),
+    })
+    pipe.rpush(_vins_key(batch_id), *vins)
+    pipe.hset(_items_key(batch_id), mapping={vin: pending for vin in vins})
+    for key in (_meta_key(batch_id), _vins_key(batch_id), _items_key(batch_id)):
+        pipe.expire(key, ttl)
+    pipe.execute()
+    return batch_id
+
+
+def update_batch_item(
+    batch_id: str,
+    vin: str,
+    status: TaskStatus,
+    message: Optional[str] = None,
+    report_id: Optional[int] = None,
+    result: Optional[Dict[str, Any]] = None,
+):
+    """
+    Store the progress or outcome of one VIN in a batch. A finished report is
+    referenced by its id in the reports table; only a report that could not be
+    stored there is kept in Redis (`result`), apart from the small status
+    entries so counting statuses stays cheap.
+    """
+    pipe = get_redis().pipeline()
+    item = {"status": status.value, "message": message, "report_id": report_id}
+    pipe.hset(_items_key(batch_id), vin, json.dumps(item))
+    if result is not None:
+        pipe.hset(_results_key(batch_id), vin, json.dumps(result))
+        pipe.expire(_results_key(batch_id), settings.report_batch_ttl)
+    pipe.execute()
+
+
+def mark_batch_finished(batch_id: str):
+    get_redis().hset(_meta_key(batch_id), "finished_at", datetime.utcnow().isoformat())
+
+
+def get_batch_status(db: Session, batch_id: str, offset: int = 0, limit: int = 50) -> BatchStatusResult:
+    """
+    Return per-status counts for the whole batch and one page of per-VIN items,
+    with their reports loaded from the reports table.
+
+    Raises:
+        BatchNotFound: If the batch does not exist or has expired
+    """
+    redis = get_redis()
+    meta = redis.hgetall(_meta_key(batch_id))
+    if not meta:
+        raise BatchNotFound(f"Batch '{batch_id}' not found")
+
+    page_vins = [v.decode() for v in redis.lrange(_vins_key(batch_id), offset, offset + limit - 1)]
+    statuses = {status: 0 for status in TaskStatus}
+    items_by_vin = {}
+    for vin, raw_item in redis.hgetall(_items_key(batch_id)).items():
+        item = json.loads(raw_item)
+        statuses[TaskStatus(item["status"])] += 1
+        items_by_vin[vin.decode()] = item
+
+    page_items = [items_by_vin.get(vin, {"status": TaskStatus.PENDING.value}) for vin in page_vins]
+    bodies = get_report_bodies(db, (item["report_id"] for item in page_items if item.get("report_id")))
+    page_results = redis.hmget(_results_key(batch_id), page_vins) if page_vins else []
+    items = []
+    for vin, item, raw_result in zip(page_vins, page_items, page_results):
+        body = bodies.get(item.get("report_id")) or raw_result
+        items.append(BatchItemResult(
+            vin=vin,
+            status=item["status"],
+            message=item.get("message"),
+            report_id=item.get("report_id"),
+            result=ReportResponse.model_validate_json(body) if body else None,
+        ))
+
+    total = int(meta[b"total"])
+    finished = statuses[TaskStatus.COMPLETED] + statuses[TaskStatus.FAILED]
+    return BatchStatusResult(
+        id=batch_id,
+        status=TaskStatus.COMPLETED if finished == total else TaskStatus.IN_PROGRESS,
+        total=total,
+        completed=statuses[TaskStatus.COMPLETED],
+        failed=statuses[TaskStatus.FAILED],
+        pending=statuses[TaskStatus.PENDING],
+        in_progress=statuses[TaskStatus.IN_PROGRESS],
+        invalid_vins=json.loads(meta[b"invalid_vins"]),
+        created_at=meta[b"created_at"].decode(),
+        finished_at=meta[b"finished_at"].decode() if b"finished_at" in meta else None,
+        offset=offset,
+        limit=limit,
+        items=items,
+    )
@@ -1,49 +1,122 @@
 from datetime import datetime
+import asyncio
+import functools
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from typing import List
 from models import AggregatedData, ProviderData
-from providers.carfax import fetch_carfax_data
-from providers.clearwin import fetch_clearwin_data
-from providers.nhtsa import fetch_nhtsa_data
+from providers.nhtsa import decode_vins_batch, VPIC_MAX_BATCH_SIZE
+from providers.http_client import run_in_provider_loop
+from providers.registry import get_enabled_providers, get_provider_config, provider_slot
+from services.provider_cache import cached_fetch, prime_cache
+from services.provider_health import guarded_fetch
+from exceptions import ProviderSkipped
+from settings import settings
+from services import metrics
 
 logger = logging.getLogger(__name__)
 
-def aggregate_car_data(vin: str) -> AggregatedData:
+def _provider_result(provider_name: str, status: str, data=None) -> ProviderData:
+    return ProviderData(
+        provider_name=provider_name,
+        data=data or {},
+        retrieved_at=datetime.utcnow(),
+        status=status
+    )
+
+async def _call_provider(provider_name: str, fetch_func, vin: str):
     """
-    Aggregate vehicle data from multiple providers (Carfax, ClearWin, and NHTSA) in parallel.
+    Call the provider upstream once a slot in its concurrency pool is free.
+    Cache hits never get here, so they do not wait for a slot.
+    """
+    queued = time.monotonic()
+    async with provider_slot(provider_name):
+        metrics.PROVIDER_QUEUE_SECONDS.labels(provider=provider_name).observe(time.monotonic() - queued)
+        data = await guarded_fetch(provider_name, fetch_func, vin)
+    metrics.PROVIDER_CALL_COST.labels(provider=provider_name).inc(get_provider_config(provider_name).cost_weight)
+    logger.info(f"Fetched data from {provider_name} for VIN {vin}")
+    return data
+
+async def _fetch_provider(vin: str, provider_name: str, fetch_func) -> ProviderData:
+    try:
+        data = await cached_fetch(
+            provider_name, vin, functools.partial(_call_provider, provider_name, fetch_func)
+        )
+        return _provider_result(provider_name, "success", data)
+    except ProviderSkipped as e:
+        logger.warning(f"Skipped {provider_name}: {e}")
+        return _provider_result(provider_name, "skipped")
+    except Exception as e:
+        logger.warning(f"Failed to fetch from {provider_name}: {e}")
+        return _provider_result(provider_name, "error")
+
+async def aggregate_car_data_async(vin: str) -> AggregatedData:
+    """
+    Aggregate vehicle data from the enabled providers (see providers.registry) concurrently.
+    Providers that have not answered within `aggregation_deadline` seconds are
+    cancelled and marked "skipped". Must run on the provider loop, see providers.http_client.
     """
-    providers_data = []
     aggregated_at = datetime.utcnow()
+    started = time.monotonic()
+    tasks = {
+        asyncio.ensure_future(_fetch_provider(vin, name, fetch_func)): name
+        for name, fetch_func in get_enabled_providers()
+    }
+    # asyncio.wait rejects an empty set (every provider disabled)
+    done, pending = await asyncio.wait(tasks, timeout=settings.aggregation_deadline) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
 
-    def fetch_provider(provider_name: str, fetch_func):
-        try:
-            data = fetch_func(vin)
-            return ProviderData(
-                provider_name=provider_name,
-                data=data,
-                retrieved_at=datetime.utcnow(),
-                status="success"
-            )
-        except Exception as e:
-            logger.warning(f"Failed to fetch from {provider_name}: {e}")
-            return ProviderData(
-                provider_name=provider_name,
-                data={},
-                retrieved_at=datetime.utcnow(),
-                status="error"
+    providers_data = []
+    for task, provider_name in tasks.items():
+        if task in done:
+            providers_data.append(task.result())
+        else:
+            logger.warning(
+                f"Skipped {provider_name} for VIN {vin}: no answer within the "
+                f"{settings.aggregation_deadline}s aggregation deadline"
             )
+            providers_data.append(_provider_result(provider_name, "skipped"))
 
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(fetch_provider, "Carfax", fetch_carfax_data),
-            executor.submit(fetch_provider, "ClearWin", fetch_clearwin_data),
-            executor.submit(fetch_provider, "NHTSA", fetch_nhtsa_data)
-        ]
-        for future in as_completed(futures):
-            providers_data.append(future.result())
-
+    metrics.AGGREGATION_SECONDS.observe(time.monotonic() - started)
     return AggregatedData(
         vin=vin,
         providers=providers_data,
         aggregated_at=aggregated_at
     )
+
+def aggregate_car_data(vin: str) -> AggregatedData:
+    """
+    Synchronous entry point used by the Celery worker.
+    """
+    return run_in_provider_loop(aggregate_car_data_async(vin))
+
+async def prefetch_nhtsa_async(vins: List[str]) -> int:
+    """
+    Decode VINs through the VPIC batch endpoint and seed the provider cache,
+    so the per-VIN reports that follow do not each call NHTSA.
+
+    Returns:
+        Number of VINs decoded
+    """
+    if "NHTSA" not in settings.providers_enabled:
+        return 0
+    decoded = 0
+    for start in range(0, len(vins), VPIC_MAX_BATCH_SIZE):
+        chunk = vins[start:start + VPIC_MAX_BATCH_SIZE]
+        try:
+            records = await decode_vins_batch(chunk)
+        except Exception as e:
+            logger.warning(f"NHTSA batch prefetch failed for {len(chunk)} VINs: {e}")
+            continue
+        for vin, record in records.items():
+            await prime_cache("NHTSA", vin, record)
+            decoded += 1
+    return decoded
+
+def prefetch_nhtsa(vins: List[str]) -> int:
+    """
+    Synchronous entry point used by the Celery worker.
+    """
+    return run_in_provider_loop(prefetch_nhtsa_async(vins))
@@ -0,0 +1,23 @@
+import json
+import logging
+import random
+from typing import Any, Optional
+
+from settings import settings
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, sample_rate: Optional[float] = None, **fields: Any):
+    """
+    Log one JSON line: {"event": event, **fields}.
+
+    Routine (below WARNING) events are sampled at `log_sample_rate`, so busy
+    paths cost a fraction of the log volume; warnings and errors always go out.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = settings.log_sample_rate if sample_rate is None else sample_rate
+    if level < logging.WARNING and random.random() >= rate:
+        return
+    if level < logging.WARNING and rate < 1:
+        fields["sample_rate"] = rate
+    logger.log(level, json.dumps({"event": event, **fields}, default=str, separators=(",", ":")))
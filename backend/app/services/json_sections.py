@@ -0,0 +1,181 @@
+import logging
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalSectionParser:
+    """
+    Incrementally parse a streamed JSON object and yield each top-level
+    key/value pair as soon as its value is complete.
+
+    Anything before the first "{" (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of the completion and return the sections it completed.
+        """
+        self.buffer += text
+        sections = []
+
+        while self._pos < len(self.buffer) and not self._finished:
+            i = self._pos
+            char = self.buffer[i]
+            self._pos += 1
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        self._key = orjson.loads(self.buffer[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif char == ":" and self._depth == 1 and self._value_start is None:
+                self._value_start = i + 1
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(i, sections)
+                    self._finished = True
+            elif char == "," and self._depth == 1:
+                self._emit(i, sections)
+
+        return sections
+
+    def _emit(self, end: int, sections: List[Tuple[str, Any]]):
+        if self._key is not None and self._value_start is not None:
+            raw_value = self.buffer[self._value_start:end]
+            try:
+                sections.append((self._key, orjson.loads(raw_value)))
+            except orjson.JSONDecodeError as e:
+                logger.warning(f"Could not parse streamed section '{self._key}': {e}")
+        self._key = None
+        self._value_start = None
+
+
+_CLOSERS = {"{": "}", "[": "]"}
+_WHITESPACE = " \t\r\n"
+
+
+def repair_json(text: str) -> Tuple[str, bool]:
+    """
+    Best-effort fix-up of a completion that should hold one JSON object: drops
+    whatever surrounds it (markdown fences, prose) and trailing commas, and if
+    the output was cut off (max_tokens) trims it back to the last complete
+    value and closes the open strings, arrays and objects.
+
+    Returns:
+        (repaired text, whether a top-level value was cut off)
+    """
+    start = text.find("{")
+    if start == -1:
+        return text, False
+
+    out: List[str] = []
+    stack: List[List[str]] = []  # [opening bracket, what comes next: key/colon/value/after]
+    in_string = is_key = escape = in_scalar = pending_comma = False
+    safe: Optional[Tuple[int, str]] = None  # (length of out, closers) after the last complete value
+
+    def mark_safe():
+        nonlocal safe
+        safe = (len(out), "".join(_CLOSERS[opening] for opening, _ in reversed(stack)))
+
+    def value_done():
+        stack[-1][1] = "after"
+        mark_safe()
+
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                if is_key:
+                    stack[-1][1] = "colon"
+                else:
+                    value_done()
+            continue
+
+        if in_scalar and (char in _WHITESPACE or char in ",:]}"):
+            in_scalar = False
+            value_done()
+        if char in _WHITESPACE:
+            continue
+        if char == ",":
+            pending_comma = stack[-1][1] == "after"
+            continue
+        if char in "}]":
+            if _CLOSERS[stack[-1][0]] != char:
+                break
+            # A comma right before a closing bracket is dropped
+            pending_comma = False
+            stack.pop()
+            out.append(char)
+            if not stack:
+                return "".join(out), False
+            value_done()
+            continue
+
+        if pending_comma:
+            pending_comma = False
+            out.append(",")
+            stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+        if char == ":":
+            stack[-1][1] = "value"
+            out.append(char)
+        elif char in "{[":
+            out.append(char)
+            stack.append([char, "key" if char == "{" else "value"])
+            # An empty object or array is already a complete value
+            mark_safe()
+        elif char == '"':
+            is_key = stack[-1] == ["{", "key"]
+            in_string = True
+            out.append(char)
+        else:
+            in_scalar = True
+            out.append(char)
+
+    if safe is None:
+        return text[start:], True
+    length, closers = safe
+    return "".join(out[:length]) + closers, len(stack) > 1
@@ -0,0 +1,174 @@
+import logging
+import random
+import time
+from typing import Any, Dict
+
+from exceptions import LLMCapacityTimeout
+from settings import settings
+from services.redis_client import get_redis
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "llm-rate:bucket"
+STATS_KEY = "llm-rate:stats"
+
+# Two buckets in one hash, both refilled per second and capped at one minute
+# of capacity: requests and (estimated) tokens. A call proceeds only if both
+# hold enough; otherwise nothing is taken and the wait until they will is
+# returned.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rpm = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local cost = math.min(tonumber(ARGV[4]), tpm)
+local bucket = redis.call('hmget', KEYS[1], 'requests', 'tokens', 'updated_at')
+local requests = tonumber(bucket[1]) or rpm
+local tokens = tonumber(bucket[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(bucket[3]) or now))
+requests = math.min(rpm, requests + elapsed * rpm / 60)
+tokens = math.min(tpm, tokens + elapsed * tpm / 60)
+local wait = 0
+if requests < 1 then
+    wait = (1 - requests) * 60 / rpm
+end
+if tokens < cost then
+    wait = math.max(wait, (cost - tokens) * 60 / tpm)
+end
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+redis.call('hset', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], 120)
+return tostring(wait)
+"""
+
+# Give back (or take) the difference between estimated and actual tokens
+_ADJUST_SCRIPT = """
+local tokens = tonumber(redis.call('hget', KEYS[1], 'tokens'))
+if not tokens then
+    return 0
+end
+tokens = math.min(tonumber(ARGV[2]), tokens + tonumber(ARGV[1]))
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens))
+return 1
+"""
+
+
+def _record_stats(**increments: float):
+    try:
+        pipe = get_redis().pipeline()
+        for field, amount in increments.items():
+            pipe.hincrbyfloat(STATS_KEY, field, amount)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Could not record LLM rate stats: {e}")
+
+
+def _take(estimated_tokens: int) -> float:
+    """One attempt at the buckets: 0 if the call was charged, else seconds until it could be."""
+    script = get_redis().register_script(_ACQUIRE_SCRIPT)
+    return float(script(
+        keys=[BUCKET_KEY],
+        args=[time.time(), settings.ai_requests_per_minute, settings.ai_tokens_per_minute, estimated_tokens],
+    ))
+
+
+def try_acquire(estimated_tokens: int) -> bool:
+    """
+    Charge one call costing `estimated_tokens` if the buckets allow it right
+    now, without waiting. Fails open if Redis is unavailable.
+    """
+    if not settings.ai_rate_limit_enabled:
+        return True
+    try:
+        return _take(estimated_tokens) == 0
+    except Exception as e:
+        logger.warning(f"LLM rate limiter unavailable, calling without it: {e}")
+        return True
+
+
+def acquire(estimated_tokens: int) -> float:
+    """
+    Wait until the shared request and token buckets allow one more call
+    costing `estimated_tokens`. Fails open if Redis is unavailable.
+
+    Returns:
+        Seconds spent waiting
+
+    Raises:
+        LLMCapacityTimeout: If capacity did not free up within `ai_rate_limit_max_wait`
+    """
+    if not settings.ai_rate_limit_enabled:
+        return 0.0
+
+    started = time.monotonic()
+    deadline = started + settings.ai_rate_limit_max_wait
+    queued = False
+    while True:
+        try:
+            wait = _take(estimated_tokens)
+        except Exception as e:
+            logger.warning(f"LLM rate limiter unavailable, calling without it: {e}")
+            return time.monotonic() - started
+
+        if wait == 0:
+            waited = time.monotonic() - started
+            if queued:
+                metrics.LLM_RATE_LIMIT_WAIT_SECONDS.observe(waited)
+                _record_stats(waits=1, wait_seconds=waited)
+            return waited
+
+        if time.monotonic() + wait > deadline:
+            _record_stats(capacity_timeouts=1)
+            raise LLMCapacityTimeout(
+                f"No LLM capacity for a {estimated_tokens}-token call within {settings.ai_rate_limit_max_wait}s"
+            )
+        # Jitter so waiting workers do not all retry at the same instant
+        queued = True
+        time.sleep(wait + random.uniform(0, 0.25))
+
+
+def record_usage(estimated_tokens: int, actual_tokens: int):
+    """Correct the token bucket once the real usage of a call is known."""
+    if not settings.ai_rate_limit_enabled or actual_tokens is None:
+        return
+    try:
+        script = get_redis().register_script(_ADJUST_SCRIPT)
+        # acquire() never charges more than one minute of tokens
+        charged = min(estimated_tokens, settings.ai_tokens_per_minute)
+        script(keys=[BUCKET_KEY], args=[charged - actual_tokens, settings.ai_tokens_per_minute])
+    except Exception as e:
+        logger.debug(f"Could not adjust LLM token bucket: {e}")
+
+
+def record_throttle(status_code: int):
+    """Count an upstream 429/5xx answer."""
+    metrics.LLM_THROTTLES.labels(status=str(status_code)).inc()
+    _record_stats(**{"throttles" if status_code == 429 else "server_errors": 1})
+
+
+def record_retry():
+    _record_stats(retries=1)
+
+
+def get_llm_rate_stats() -> Dict[str, Any]:
+    """
+    Current bucket levels and counters of waits (calls that had to queue for
+    capacity), throttles (429s), server errors and retries.
+    """
+    try:
+        redis = get_redis()
+        bucket = redis.hgetall(BUCKET_KEY)
+        stats = redis.hgetall(STATS_KEY)
+    except Exception as e:
+        logger.warning(f"LLM rate stats unavailable: {e}")
+        return {}
+    return {
+        "requests_per_minute": settings.ai_requests_per_minute,
+        "tokens_per_minute": settings.ai_tokens_per_minute,
+        "requests_available": float(bucket[b"requests"]) if b"requests" in bucket else settings.ai_requests_per_minute,
+        "tokens_available": float(bucket[b"tokens"]) if b"tokens" in bucket else settings.ai_tokens_per_minute,
+        **{field.decode(): float(value) for field, value in stats.items()},
+    }
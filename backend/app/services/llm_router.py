@@ -0,0 +1,290 @@
+"""
+Routing LLM requests across OpenAI-compatible backends.
+
+Backends come from AI_BACKENDS (a JSON list of models.LLMBackend), or the
+single AI_BASE_URL/AI_MODEL backend when that is empty. Each has a tier:
+reports with a clean history go to "fast" (cheap) backends first, reports
+with accidents, title brands or damage to "strong" ones. Within a tier,
+backends are ranked by their recent latency and cost in this process;
+backends that just failed are tried last.
+
+`race` runs a request on the best backend, hedges it on the next one if it
+has not started answering after the hedge delay, and fails over to the next
+one on errors. Capacity in the shared LLM rate limiter is taken before each
+request is sent, so waiting for it never counts as backend latency.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from exceptions import LLMCapacityTimeout
+from models import LLMBackend
+from settings import settings
+from services import metrics
+from services.event_log import log_event
+
+logger = logging.getLogger(__name__)
+
+TIER_FAST = "fast"
+TIER_STRONG = "strong"
+
+# deepseek-chat list prices (USD per million tokens) for the default backend;
+# configure AI_BACKENDS to set prices per backend
+DEFAULT_INPUT_COST_PER_MTOK = 0.27
+DEFAULT_CACHED_INPUT_COST_PER_MTOK = 0.07
+DEFAULT_OUTPUT_COST_PER_MTOK = 1.10
+
+# Recent requests per backend that latency figures are taken from
+STATS_WINDOW = 50
+# Samples needed before a backend's own latency sets its hedge delay
+MIN_SAMPLES = 5
+
+T = TypeVar("T")
+
+# Requests run here so a slow backend can be hedged from the calling thread;
+# at most two per report are in flight at once
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-request")
+
+
+class BackendStats:
+    """
+    Time to first token, request duration and cost of recent requests per
+    backend, plus when it last failed. Kept in this process only.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._first_token: Dict[str, Deque[float]] = {}
+        self._duration: Dict[str, Deque[float]] = {}
+        self._cost: Dict[str, Deque[float]] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _append(self, series: Dict[str, Deque[float]], name: str, value: float):
+        with self._lock:
+            samples = series.get(name)
+            if samples is None:
+                samples = series[name] = deque(maxlen=self.window)
+            samples.append(value)
+
+    def record_first_token(self, name: str, seconds: float):
+        self._append(self._first_token, name, seconds)
+
+    def record_duration(self, name: str, seconds: float):
+        self._append(self._duration, name, seconds)
+        with self._lock:
+            self._failed_at.pop(name, None)
+
+    def record_cost(self, name: str, dollars: float):
+        self._append(self._cost, name, dollars)
+
+    def record_failure(self, name: str):
+        with self._lock:
+            self._failed_at[name] = time.monotonic()
+
+    def cooling_down(self, name: str) -> bool:
+        with self._lock:
+            failed_at = self._failed_at.get(name)
+        return failed_at is not None and time.monotonic() - failed_at < settings.ai_backend_cooldown
+
+    def percentile(self, name: str, quantile: float, first_token: bool = False) -> Optional[float]:
+        """None until MIN_SAMPLES requests were seen."""
+        with self._lock:
+            samples = sorted((self._first_token if first_token else self._duration).get(name, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[math.ceil(quantile * len(samples)) - 1]
+
+    def mean_cost(self, name: str) -> Optional[float]:
+        with self._lock:
+            samples = list(self._cost.get(name, ()))
+        return sum(samples) / len(samples) if samples else None
+
+
+_stats = BackendStats(STATS_WINDOW)
+_backends: Optional[List[LLMBackend]] = None
+
+
+def get_backends() -> List[LLMBackend]:
+    """The configured backends, parsed once per process."""
+    global _backends
+    if _backends is None:
+        if settings.ai_backends:
+            _backends = [LLMBackend.model_validate(backend) for backend in settings.ai_backends]
+        else:
+            _backends = [LLMBackend(
+                name="default",
+                base_url=settings.ai_base_url,
+                model=settings.ai_model,
+                tier=TIER_STRONG,
+                input_cost_per_mtok=DEFAULT_INPUT_COST_PER_MTOK,
+                cached_input_cost_per_mtok=DEFAULT_CACHED_INPUT_COST_PER_MTOK,
+                output_cost_per_mtok=DEFAULT_OUTPUT_COST_PER_MTOK,
+            )]
+    return _backends
+
+
+def models_fingerprint() -> str:
+    """The configured models, for report cache fingerprints."""
+    return ",".join(sorted({backend.model for backend in get_backends()}))
+
+
+def _score(backend: LLMBackend) -> float:
+    """
+    Lower is better: median request seconds plus ai_router_cost_weight
+    seconds per cent of average request cost. Backends without data score 0,
+    so each gets tried and measured.
+    """
+    latency = _stats.percentile(backend.name, 0.5) or 0.0
+    cost = _stats.mean_cost(backend.name) or 0.0
+    return latency + settings.ai_router_cost_weight * cost * 100
+
+
+def choose_backends(tier: str = "") -> List[LLMBackend]:
+    """
+    Backends in the order to try them: the requested tier first, then the
+    others, each ranked by score; backends that failed recently go last.
+    """
+    def order(backend: LLMBackend) -> Tuple[bool, bool, float]:
+        return (_stats.cooling_down(backend.name), bool(tier) and backend.tier != tier, _score(backend))
+    return sorted(get_backends(), key=order)
+
+
+def hedge_delay(backend: LLMBackend) -> float:
+    """
+    How long to wait for `backend` to start answering before hedging: its
+    recent p95 time to first token, never less than ai_hedge_min_delay.
+    AI_HEDGE_DELAY fixes it instead.
+    """
+    if settings.ai_hedge_delay:
+        return settings.ai_hedge_delay
+    p95 = _stats.percentile(backend.name, 0.95, first_token=True)
+    if p95 is None:
+        return settings.ai_hedge_max_delay
+    return min(settings.ai_hedge_max_delay, max(settings.ai_hedge_min_delay, p95))
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    """Client errors (bad request, auth) and our own rate limit are not held against the backend."""
+    if isinstance(error, LLMCapacityTimeout):
+        return False
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def _start(backend: LLMBackend, start: Callable[[LLMBackend], T]) -> T:
+    started = time.monotonic()
+    result = start(backend)
+    _stats.record_first_token(backend.name, time.monotonic() - started)
+    return result
+
+
+def _discard_result(future: Future, discard: Callable[[Any], None]):
+    if future.exception() is None:
+        discard(future.result())
+
+
+def race(
+    backends: List[LLMBackend],
+    start: Callable[[LLMBackend], T],
+    discard: Callable[[T], None],
+    admit: Callable[[bool], bool] = lambda wait: True,
+) -> Tuple[LLMBackend, T]:
+    """
+    Call `start(backend)` (which sends the request and returns once the
+    backend starts answering) on the first backend. If it has not returned
+    after the backend's hedge delay, call it on the next backend too; the
+    first to return wins and the other's result is passed to `discard`. A
+    backend that raises is replaced by the next one.
+
+    The caller has taken rate limiter capacity for the first request. Every
+    later one is charged through `admit(wait)` just before it is sent: hedges
+    with wait=False, and are skipped if there is no capacity right now;
+    failovers with wait=True.
+
+    Raises:
+        LLMCapacityTimeout: If there was no capacity for a failover
+        The last backend's error if every backend failed
+    """
+    remaining = list(backends)
+    pending: Dict[Future, LLMBackend] = {}
+    launched_at = 0.0
+    last_error: Optional[Exception] = None
+    hedging = settings.ai_hedge_enabled
+
+    def launch():
+        nonlocal launched_at
+        backend = remaining.pop(0)
+        pending[_executor.submit(_start, backend, start)] = backend
+        launched_at = time.monotonic()
+        return backend
+
+    current = launch()
+    while pending:
+        can_hedge = hedging and remaining and len(pending) == 1
+        timeout = max(0.0, launched_at + hedge_delay(current) - time.monotonic()) if can_hedge else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if not admit(False):
+                # A hedge would only queue behind the limiter and add load; wait it out
+                hedging = False
+                log_event(logger, "llm_hedge_skipped", slow_backend=current.name)
+                continue
+            hedge = launch()
+            metrics.LLM_HEDGED_REQUESTS.labels(backend=hedge.name).inc()
+            log_event(logger, "llm_hedge", slow_backend=current.name, hedge_backend=hedge.name)
+            current = hedge
+            continue
+
+        for future in done:
+            backend = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                record_failure(backend, e)
+                continue
+            # The slower request still costs tokens; close it as soon as it answers
+            for loser in pending:
+                loser.add_done_callback(lambda f: _discard_result(f, discard))
+            return backend, result
+
+        if not pending and remaining:
+            admit(True)
+            current = launch()
+            metrics.LLM_FAILOVERS.labels(backend=current.name).inc()
+            log_event(logger, "llm_failover", backend=current.name, error=str(last_error))
+
+    raise last_error
+
+
+def record_failure(backend: LLMBackend, error: Exception):
+    metrics.LLM_BACKEND_ERRORS.labels(backend=backend.name, reason=error.__class__.__name__).inc()
+    if _is_backend_failure(error):
+        _stats.record_failure(backend.name)
+    logger.warning(f"LLM backend {backend.name} failed: {error}")
+
+
+def record_success(backend: LLMBackend, seconds: float):
+    _stats.record_duration(backend.name, seconds)
+    metrics.LLM_BACKEND_SECONDS.labels(backend=backend.name).observe(seconds)
+
+
+def record_usage(backend: LLMBackend, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """Price a request's token usage at the backend's rates. Returns the cost in USD."""
+    cached_rate = backend.cached_input_cost_per_mtok
+    if cached_rate is None:
+        cached_rate = backend.input_cost_per_mtok
+    cost = (
+        (prompt_tokens - cached_tokens) * backend.input_cost_per_mtok
+        + cached_tokens * cached_rate
+        + completion_tokens * backend.output_cost_per_mtok
+    ) / 1_000_000
+    _stats.record_cost(backend.name, cost)
+    metrics.LLM_COST_DOLLARS.labels(backend=backend.name).inc(cost)
+    return cost
+
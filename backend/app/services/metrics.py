@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for the report pipeline.
+
+The API serves them at /metrics; Celery workers serve them from their own
+exporter (start_worker_exporter). With several processes per host (uvicorn
+workers, prefork Celery pools) set PROMETHEUS_MULTIPROC_DIR so every process
+writes to a shared directory and the exporter aggregates them.
+"""
+import logging
+import os
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Seconds; provider calls and queue waits are short, reports and LLM calls long
+FAST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+SLOW_BUCKETS = (0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 5000, 8000)
+
+PROVIDER_FETCH_SECONDS = Histogram(
+    "provider_fetch_seconds", "Upstream provider call latency", ["provider"], buckets=FAST_BUCKETS
+)
+PROVIDER_ERRORS = Counter(
+    "provider_errors_total", "Failed upstream provider calls", ["provider", "reason"]
+)
+PROVIDER_QUEUE_SECONDS = Histogram(
+    "provider_queue_seconds", "Time waiting for a slot in the provider's concurrency pool", ["provider"],
+    buckets=FAST_BUCKETS
+)
+PROVIDER_CALL_COST = Counter(
+    "provider_call_cost_total", "Upstream provider calls weighted by the provider's cost_weight", ["provider"]
+)
+AGGREGATION_SECONDS = Histogram(
+    "aggregation_seconds", "Time to aggregate all providers for one VIN", buckets=FAST_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Estimated prompt tokens per LLM request", ["mode"], buckets=TOKEN_BUCKETS
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds", "LLM request latency, including reading the whole stream", buckets=SLOW_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM API", ["kind"]
+)
+LLM_ERRORS = Counter(
+    "llm_errors_total", "Failed LLM requests", ["reason"]
+)
+LLM_JSON_PARSE_FAILURES = Counter(
+    "llm_json_parse_failures_total", "LLM responses that were not valid JSON"
+)
+LLM_JSON_REPAIRS = Counter(
+    "llm_json_repairs_total", "LLM responses that parsed only after repair", ["kind"]
+)
+LLM_INVALID_SECTIONS = Counter(
+    "llm_invalid_sections_total", "Report sections from the LLM that failed schema validation", ["section"]
+)
+LLM_SECTION_RETRIES = Counter(
+    "llm_section_retries_total", "Follow-up LLM requests for missing or invalid report sections"
+)
+LLM_BACKEND_SECONDS = Histogram(
+    "llm_backend_request_seconds", "LLM request latency per backend, including reading the whole stream",
+    ["backend"], buckets=SLOW_BUCKETS
+)
+LLM_BACKEND_ERRORS = Counter(
+    "llm_backend_errors_total", "Failed LLM requests per backend", ["backend", "reason"]
+)
+LLM_COST_DOLLARS = Counter(
+    "llm_cost_dollars_total", "LLM spend in USD, priced from reported token usage", ["backend"]
+)
+LLM_HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total", "Second requests sent because the first backend was slow to answer", ["backend"]
+)
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total", "Requests moved to another backend after an error", ["backend"]
+)
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "llm_rate_limit_wait_seconds", "Time calls waited for shared LLM rate limit capacity", buckets=FAST_BUCKETS
+)
+LLM_THROTTLES = Counter(
+    "llm_throttles_total", "429 and 5xx answers from the LLM API", ["status"]
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "celery_queue_wait_seconds", "Time tasks waited in a queue before a worker started them",
+    ["queue"], buckets=FAST_BUCKETS
+)
+REPORT_SECONDS = Histogram(
+    "report_seconds", "End-to-end report time from enqueue to finished", ["path", "outcome"], buckets=SLOW_BUCKETS
+)
+
+
+def _multiprocess_dir() -> str:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir") or ""
+
+
+def _collecting_registry() -> CollectorRegistry:
+    if not _multiprocess_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Returns: (exposition body, content type)"""
+    return generate_latest(_collecting_registry()), CONTENT_TYPE_LATEST
+
+
+def start_worker_exporter(port: int):
+    """Serve this worker's metrics (all pool processes in multiprocess mode) on `port`."""
+    try:
+        start_http_server(port, registry=_collecting_registry())
+        logger.info(f"Worker metrics exporter listening on :{port}")
+    except OSError as e:
+        logger.warning(f"Worker metrics exporter not started on :{port}: {e}")
+
+
+def mark_process_dead(pid: int):
+    if _multiprocess_dir():
+        multiprocess.mark_process_dead(pid)
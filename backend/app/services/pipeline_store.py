@@ -0,0 +1,52 @@
+import logging
+from typing import Dict, Optional
+
+from exceptions import PipelinePayloadMissing
+from settings import settings
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "report-pipeline"
+
+# A handle is what travels through the broker between pipeline stages:
+# {"ref": redis_key} normally, or {"value": payload} if Redis was unavailable
+PayloadHandle = Dict[str, str]
+
+
+def stash(task_id: str, name: str, payload: str) -> PayloadHandle:
+    """
+    Store an intermediate payload for the next stage and return a small handle
+    to it, so large payloads do not go through the broker.
+    """
+    key = f"{KEY_PREFIX}:{task_id}:{name}"
+    try:
+        get_redis().set(key, payload, ex=settings.report_pipeline_ttl)
+        return {"ref": key}
+    except Exception as e:
+        logger.warning(f"Could not store pipeline payload {key}, passing it inline: {e}")
+        return {"value": payload}
+
+
+def load(handle: PayloadHandle) -> str:
+    """
+    Raises:
+        PipelinePayloadMissing: If the payload expired before the stage ran
+    """
+    if "value" in handle:
+        return handle["value"]
+    raw = get_redis().get(handle["ref"])
+    if raw is None:
+        raise PipelinePayloadMissing(f"Pipeline payload '{handle['ref']}' not found")
+    return raw.decode()
+
+
+def discard(*handles: Optional[PayloadHandle]):
+    """Delete stored payloads once the pipeline is done with them."""
+    keys = [handle["ref"] for handle in handles if handle and "ref" in handle]
+    if not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except Exception as e:
+        logger.warning(f"Could not delete pipeline payloads: {e}")
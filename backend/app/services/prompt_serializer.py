@@ -0,0 +1,167 @@
+import json
+import logging
+from typing import Any, Dict, List, Tuple
+
+from models import AggregatedData
+from services.vin_validator import decode_identification
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for JSON-heavy prompts; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+EMPTY_VALUES = (None, "", "Not Applicable", [], {})
+
+# NHTSA keys that never help the report (internal ids, decoder diagnostics)
+NHTSA_NOISE_KEYS = {
+    "MakeID", "ModelID", "ManufacturerId", "ErrorCode", "ErrorText",
+    "AdditionalErrorText", "PossibleValues", "SuggestedVIN", "VehicleDescriptor", "VIN",
+}
+
+# Truncation priority per provider field: lower numbers are dropped first when the
+# prompt is over budget. Fields not listed get DEFAULT_PRIORITY.
+DEFAULT_PRIORITY = 10
+FIELD_PRIORITIES = {
+    "Carfax": {
+        "accident_history": 100, "title_status": 100, "ownership_history": 90,
+        "odometer_readings": 80,
+    },
+    "ClearWin": {
+        "damage_reports": 90, "recall_information": 80, "market_value": 70,
+        "service_history": 60,
+    },
+    "NHTSA": {
+        "Make": 100, "Model": 100, "ModelYear": 100, "Trim": 60, "Series": 60,
+        "DisplacementL": 50, "EngineCylinders": 50, "EngineConfiguration": 50,
+        "FuelTypePrimary": 50, "TransmissionStyle": 50, "TransmissionSpeeds": 50,
+        "BodyClass": 40, "DriveType": 40, "EngineHP": 30, "Turbo": 30,
+        "PlantCountry": 20, "Manufacturer": 20,
+    },
+    "AutoCheck": {
+        "autocheck_score": 90, "score_range": 80, "title_brands": 100, "accident_count": 90,
+        "owner_count": 70, "auction_history": 50, "use_history": 40,
+    },
+    "VINDecode": {"make": 100, "model_year": 100, "country": 20},
+}
+# Fields at or above this priority are shortened (oldest list entries first)
+# before any of them is dropped entirely
+KEEP_PRIORITY = 70
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _drop_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        cleaned = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in EMPTY_VALUES}
+    if isinstance(value, list):
+        return [v for v in (_drop_empty(item) for item in value) if v not in EMPTY_VALUES]
+    return value
+
+
+def compact_provider_payload(provider_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop empty and "Not Applicable" values (most of an NHTSA decode) and NHTSA
+    decoder noise.
+    """
+    compact = _drop_empty(data)
+    if provider_name == "NHTSA":
+        compact = {k: v for k, v in compact.items() if k not in NHTSA_NOISE_KEYS}
+    return compact
+
+
+def _dumps(payloads: Dict[str, Any]) -> str:
+    return json.dumps(payloads, separators=(",", ":"), ensure_ascii=False)
+
+
+def _fields_by_priority(payloads: Dict[str, Any]) -> List[Tuple[int, str, str]]:
+    fields = []
+    for provider_name, payload in payloads.items():
+        if not isinstance(payload, dict):
+            continue
+        priorities = FIELD_PRIORITIES.get(provider_name, {})
+        for key in payload:
+            fields.append((priorities.get(key, DEFAULT_PRIORITY), provider_name, key))
+    return sorted(fields)
+
+
+def _shorten_longest_list(payloads: Dict[str, Any]) -> bool:
+    """Halve the longest list in the payloads, keeping the newest (last) entries."""
+    longest = None
+    for provider_name, payload in payloads.items():
+        if not isinstance(payload, dict):
+            continue
+        for key, value in payload.items():
+            if isinstance(value, list) and len(value) > 1:
+                if longest is None or len(value) > len(payloads[longest[0]][longest[1]]):
+                    longest = (provider_name, key)
+    if longest is None:
+        return False
+    provider_name, key = longest
+    items = payloads[provider_name][key]
+    payloads[provider_name][key] = items[len(items) // 2:]
+    return True
+
+
+def serialize_provider_data(aggregated_data: AggregatedData, token_budget: int) -> Tuple[str, int]:
+    """
+    Serialize provider payloads as compact JSON that fits `token_budget`.
+
+    Over budget, the lowest-priority fields are dropped first. Then the longest
+    lists among the important fields are halved, oldest entries first. Only after
+    that are important fields dropped.
+
+    Returns:
+        (serialized_json, estimated_tokens)
+    """
+    payloads: Dict[str, Any] = {}
+    for provider in sorted(aggregated_data.providers, key=lambda p: p.provider_name):
+        if provider.status == "success":
+            payloads[provider.provider_name] = compact_provider_payload(provider.provider_name, provider.data)
+        else:
+            payloads[provider.provider_name] = "Data unavailable"
+    if not isinstance(payloads.get("NHTSA"), dict):
+        # Without a decode, give the model what the VIN itself tells
+        decoded = decode_identification(aggregated_data.vin)
+        if decoded:
+            payloads["VINDecode"] = decoded
+
+    text = _dumps(payloads)
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return text, tokens
+
+    fields = _fields_by_priority(payloads)
+    dropped = 0
+
+    # 1. Drop low-priority fields
+    for priority, provider_name, key in list(fields):
+        if tokens <= token_budget or priority >= KEEP_PRIORITY:
+            break
+        del payloads[provider_name][key]
+        fields.remove((priority, provider_name, key))
+        dropped += 1
+        text = _dumps(payloads)
+        tokens = estimate_tokens(text)
+
+    # 2. Shorten long histories
+    while tokens > token_budget and _shorten_longest_list(payloads):
+        text = _dumps(payloads)
+        tokens = estimate_tokens(text)
+
+    # 3. Drop whatever else it takes
+    for priority, provider_name, key in fields:
+        if tokens <= token_budget:
+            break
+        del payloads[provider_name][key]
+        dropped += 1
+        text = _dumps(payloads)
+        tokens = estimate_tokens(text)
+
+    logger.warning(
+        f"Provider data for VIN {aggregated_data.vin} exceeded the prompt budget of "
+        f"{token_budget} tokens; dropped {dropped} fields"
+    )
+    return text, tokens
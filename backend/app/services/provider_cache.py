@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from exceptions import ProviderSkipped
+from providers.registry import get_provider_config
+from settings import settings
+from services.local_cache import LocalLRUCache
+from services.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "provider-cache"
+STATS_KEY = f"{KEY_PREFIX}:stats"
+
+# Counter names, kept per provider: "<provider>:<counter>"
+HIT_LOCAL = "hit_local"
+HIT_REDIS = "hit_redis"
+HIT_NEGATIVE = "hit_negative"
+MISS = "miss"
+COUNTERS = (HIT_LOCAL, HIT_REDIS, HIT_NEGATIVE, MISS)
+
+
+class CachedProviderFailure(Exception):
+    """Raised when a recent failure for this provider/VIN is still negatively cached."""
+    pass
+
+
+_local_cache = LocalLRUCache(settings.provider_cache_local_size)
+_local_counters: Dict[str, int] = {}
+_counters_lock = threading.Lock()
+_background_tasks = set()
+
+
+def _cache_key(provider_name: str, vin: str) -> str:
+    return f"{KEY_PREFIX}:{provider_name}:{vin.upper()}"
+
+
+def get_provider_ttl(provider_name: str) -> int:
+    return get_provider_config(provider_name).cache_ttl
+
+
+def _count(provider_name: str, counter: str):
+    field = f"{provider_name}:{counter}"
+    with _counters_lock:
+        _local_counters[field] = _local_counters.get(field, 0) + 1
+
+    async def _publish():
+        try:
+            await get_async_redis().hincrby(STATS_KEY, field, 1)
+        except Exception as e:
+            logger.debug(f"Failed to publish provider cache counter {field}: {e}")
+
+    # Shared counters are best effort and must not add latency to the fetch
+    task = asyncio.get_running_loop().create_task(_publish())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _unwrap(provider_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    if payload["status"] == "error":
+        raise CachedProviderFailure(f"{provider_name} failed recently: {payload.get('error')}")
+    return payload["data"]
+
+
+async def _read_redis(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = await get_async_redis().get(key)
+    except Exception as e:
+        logger.warning(f"Provider cache read failed for {key}: {e}")
+        return None
+    return json.loads(raw) if raw else None
+
+
+async def _write_redis(key: str, payload: Dict[str, Any], ttl: int):
+    try:
+        await get_async_redis().set(key, json.dumps(payload), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Provider cache write failed for {key}: {e}")
+
+
+async def cached_fetch(
+    provider_name: str,
+    vin: str,
+    fetch_func: Callable[[str], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Fetch provider data through the in-process LRU and the shared Redis tier.
+
+    Successful responses are kept for the provider's TTL; failures are cached
+    for `provider_cache_negative_ttl` seconds so a broken upstream is not
+    hammered by every report for the same VIN.
+
+    Raises:
+        CachedProviderFailure: If a recent failure is still cached
+        ProviderSkipped: If the provider's circuit breaker is open (not cached)
+        Exception: Whatever the provider raises on a miss
+    """
+    if not settings.provider_cache_enabled:
+        return await fetch_func(vin)
+
+    key = _cache_key(provider_name, vin)
+
+    payload = _local_cache.get(key)
+    if payload is not None:
+        _count(provider_name, HIT_NEGATIVE if payload["status"] == "error" else HIT_LOCAL)
+        return _unwrap(provider_name, payload)
+
+    payload = await _read_redis(key)
+    if payload is not None and payload.get("expires_at", 0) > time.time():
+        _local_cache.set(key, payload, payload["expires_at"])
+        _count(provider_name, HIT_NEGATIVE if payload["status"] == "error" else HIT_REDIS)
+        return _unwrap(provider_name, payload)
+
+    _count(provider_name, MISS)
+    try:
+        data = await fetch_func(vin)
+    except ProviderSkipped:
+        # The provider was never asked; nothing to remember for this VIN
+        raise
+    except Exception as e:
+        ttl = settings.provider_cache_negative_ttl
+        if ttl > 0:
+            payload = {"status": "error", "error": str(e), "expires_at": time.time() + ttl}
+            _local_cache.set(key, payload, payload["expires_at"])
+            await _write_redis(key, payload, ttl)
+        raise
+
+    ttl = get_provider_ttl(provider_name)
+    if ttl > 0:
+        payload = {"status": "success", "data": data, "expires_at": time.time() + ttl}
+        _local_cache.set(key, payload, payload["expires_at"])
+        await _write_redis(key, payload, ttl)
+    return data
+
+
+async def prime_cache(provider_name: str, vin: str, data: Dict[str, Any]):
+    """Store data fetched outside cached_fetch (e.g. by a bulk request)."""
+    if not settings.provider_cache_enabled:
+        return
+    ttl = get_provider_ttl(provider_name)
+    if ttl > 0:
+        key = _cache_key(provider_name, vin)
+        payload = {"status": "success", "data": data, "expires_at": time.time() + ttl}
+        _local_cache.set(key, payload, payload["expires_at"])
+        await _write_redis(key, payload, ttl)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """
+    Return hit/miss counters for this process and, if Redis is reachable, across all workers.
+
+    `saved_calls` counts lookups that did not reach the provider.
+    """
+    with _counters_lock:
+        local = dict(_local_counters)
+
+    try:
+        shared = {
+            field.decode(): int(value)
+            for field, value in get_redis().hgetall(STATS_KEY).items()
+        }
+    except Exception as e:
+        logger.warning(f"Failed to read shared provider cache stats: {e}")
+        shared = None
+
+    def summarize(counters: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        summary: Dict[str, Dict[str, int]] = {}
+        for field, value in counters.items():
+            provider_name, counter = field.rsplit(":", 1)
+            summary.setdefault(provider_name, {name: 0 for name in COUNTERS})[counter] = value
+        for counts in summary.values():
+            counts["saved_calls"] = counts[HIT_LOCAL] + counts[HIT_REDIS] + counts[HIT_NEGATIVE]
+        return summary
+
+    return {
+        "process": summarize(local),
+        "shared": summarize(shared) if shared is not None else None,
+    }
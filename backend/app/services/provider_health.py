@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from exceptions import ProviderSkipped
+from providers.registry import get_provider_config
+from settings import settings
+from services.redis_client import get_async_redis, get_redis
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "provider-breaker"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# How long an open breaker is remembered if the provider is never called again
+OPEN_STATE_TTL = 24 * 3600
+
+# Count one more consecutive failure. The breaker opens once the threshold is
+# reached, or straight away if the failing call was the half-open probe.
+_RECORD_FAILURE_SCRIPT = """
+local failures = redis.call('hincrby', KEYS[1], 'failures', 1)
+local state = redis.call('hget', KEYS[1], 'state')
+if state == 'half_open' or state == 'open' or failures >= tonumber(ARGV[1]) then
+    redis.call('hset', KEYS[1], 'state', 'open', 'opened_at', ARGV[2])
+    redis.call('del', KEYS[2])
+    redis.call('expire', KEYS[1], ARGV[4])
+    return 1
+end
+redis.call('expire', KEYS[1], ARGV[3])
+return 0
+"""
+
+# Give up the half-open probe slot without a verdict, if this caller still holds
+# it, so the next call can probe instead of waiting for the slot to expire.
+_RELEASE_PROBE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _breaker_key(provider_name: str) -> str:
+    return f"{KEY_PREFIX}:{provider_name}"
+
+
+def _probe_key(provider_name: str) -> str:
+    return f"{KEY_PREFIX}:{provider_name}:probe"
+
+
+class LatencyTracker:
+    """
+    Recent call latencies per provider, kept in this process only.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider_name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(provider_name)
+            if samples is None:
+                samples = self._samples[provider_name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def p95(self, provider_name: str) -> Optional[float]:
+        """Return the 95th percentile, or None until enough samples are collected."""
+        with self._lock:
+            samples = sorted(self._samples.get(provider_name, ()))
+        if len(samples) < settings.provider_latency_min_samples:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+
+    def providers(self):
+        with self._lock:
+            return list(self._samples)
+
+
+_latencies = LatencyTracker(settings.provider_latency_window)
+
+
+def get_provider_timeout(provider_name: str) -> float:
+    """
+    Timeout for the next call: the provider's recent p95 latency times
+    `provider_timeout_p95_multiplier`, between `provider_timeout_min` and the
+    provider's configured timeout. Until enough samples exist the ceiling is used.
+    """
+    ceiling = get_provider_config(provider_name).timeout
+    p95 = _latencies.p95(provider_name)
+    if p95 is None:
+        return ceiling
+    adaptive = p95 * settings.provider_timeout_p95_multiplier
+    return min(ceiling, max(settings.provider_timeout_min, adaptive))
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Only timeouts, connection errors, 429s and 5xx count against a provider's breaker."""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code == 429 or status_code >= 500
+    return False
+
+
+def _error_reason(error: Exception) -> str:
+    """Low-cardinality label for a failed provider call."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"http_{error.response.status_code // 100}xx"
+    if isinstance(error, httpx.TransportError):
+        return "transport"
+    return "other"
+
+
+async def _read_breaker(provider_name: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = await get_async_redis().hgetall(_breaker_key(provider_name))
+    except Exception as e:
+        logger.warning(f"Circuit breaker state unavailable for {provider_name}: {e}")
+        return None
+    return {k.decode(): v.decode() for k, v in raw.items()}
+
+
+async def _allow_call(provider_name: str, breaker: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    """
+    Closed breakers let every call through. Open breakers reject calls until
+    `provider_breaker_cooldown` has passed, then go half-open: one probe call
+    across all workers decides whether the breaker closes or opens again.
+
+    Returns whether the call may go ahead and, for the probe call, the token
+    holding the probe slot.
+    """
+    state = breaker.get("state", CLOSED)
+    if state == CLOSED:
+        return True, None
+    if state == OPEN and time.time() - float(breaker.get("opened_at", 0)) < settings.provider_breaker_cooldown:
+        return False, None
+
+    probe_token = uuid.uuid4().hex
+    try:
+        redis = get_async_redis()
+        # The probe slot expires in case the probing worker dies mid-call
+        if not await redis.set(_probe_key(provider_name), probe_token, nx=True, ex=settings.provider_breaker_cooldown):
+            return False, None
+        await redis.hset(_breaker_key(provider_name), "state", HALF_OPEN)
+    except Exception as e:
+        logger.warning(f"Circuit breaker probe failed for {provider_name}, allowing call: {e}")
+        return True, None
+    logger.info(f"Circuit breaker for {provider_name} is half-open, sending a probe call")
+    return True, probe_token
+
+
+async def _record_success(provider_name: str, breaker: Dict[str, Any]):
+    if breaker.get("state", CLOSED) == CLOSED and not int(breaker.get("failures", 0)):
+        return
+    try:
+        await get_async_redis().delete(_breaker_key(provider_name), _probe_key(provider_name))
+    except Exception as e:
+        logger.warning(f"Failed to close circuit breaker for {provider_name}: {e}")
+        return
+    if breaker.get("state", CLOSED) != CLOSED:
+        logger.info(f"Circuit breaker for {provider_name} closed")
+
+
+async def _record_failure(provider_name: str):
+    try:
+        script = get_async_redis().register_script(_RECORD_FAILURE_SCRIPT)
+        opened = await script(
+            keys=[_breaker_key(provider_name), _probe_key(provider_name)],
+            args=[
+                settings.provider_breaker_failure_threshold,
+                time.time(),
+                settings.provider_breaker_failure_window,
+                OPEN_STATE_TTL,
+            ],
+        )
+    except Exception as e:
+        logger.warning(f"Failed to record failure for {provider_name} circuit breaker: {e}")
+        return
+    if opened:
+        logger.warning(f"Circuit breaker for {provider_name} is open")
+
+
+async def _release_probe(provider_name: str, probe_token: str):
+    try:
+        script = get_async_redis().register_script(_RELEASE_PROBE_SCRIPT)
+        await script(keys=[_probe_key(provider_name)], args=[probe_token])
+    except Exception as e:
+        logger.warning(f"Failed to release circuit breaker probe for {provider_name}: {e}")
+        return
+    logger.info(f"Circuit breaker probe for {provider_name} ended without a verdict, released")
+
+
+async def guarded_fetch(
+    provider_name: str,
+    fetch_func: Callable[[str], Awaitable[Dict[str, Any]]],
+    vin: str,
+) -> Dict[str, Any]:
+    """
+    Call a provider through its circuit breaker with an adaptive timeout.
+
+    Breaker state is shared by all workers through Redis; if Redis is
+    unavailable calls go through unguarded.
+
+    Raises:
+        ProviderSkipped: If the breaker is open
+        asyncio.TimeoutError: If the provider did not answer in time
+        Exception: Whatever the provider raises
+    """
+    breaker: Dict[str, Any] = {}
+    probe_token: Optional[str] = None
+    if settings.provider_breaker_enabled:
+        breaker = await _read_breaker(provider_name) or {}
+        allowed, probe_token = await _allow_call(provider_name, breaker)
+        if not allowed:
+            raise ProviderSkipped(f"Circuit breaker for {provider_name} is open")
+
+    timeout = get_provider_timeout(provider_name)
+    started = time.monotonic()
+    settled = False
+    try:
+        try:
+            data = await asyncio.wait_for(fetch_func(vin), timeout)
+        except asyncio.TimeoutError:
+            # Counting the timeout as a sample lets the timeout grow if the provider slows down
+            _latencies.record(provider_name, timeout)
+            metrics.PROVIDER_FETCH_SECONDS.labels(provider=provider_name).observe(timeout)
+            metrics.PROVIDER_ERRORS.labels(provider=provider_name, reason="timeout").inc()
+            if settings.provider_breaker_enabled:
+                await _record_failure(provider_name)
+                settled = True
+            raise asyncio.TimeoutError(f"{provider_name} did not answer within {timeout:.2f}s")
+        except Exception as e:
+            metrics.PROVIDER_FETCH_SECONDS.labels(provider=provider_name).observe(time.monotonic() - started)
+            metrics.PROVIDER_ERRORS.labels(provider=provider_name, reason=_error_reason(e)).inc()
+            if settings.provider_breaker_enabled and is_upstream_failure(e):
+                await _record_failure(provider_name)
+                settled = True
+            raise
+
+        elapsed = time.monotonic() - started
+        _latencies.record(provider_name, elapsed)
+        metrics.PROVIDER_FETCH_SECONDS.labels(provider=provider_name).observe(elapsed)
+        if settings.provider_breaker_enabled:
+            await _record_success(provider_name, breaker)
+            settled = True
+        return data
+    finally:
+        # A probe cut short by cancellation, a deadline or a non-upstream error
+        # says nothing about the provider; free the slot so the next call probes
+        if probe_token is not None and not settled:
+            await _release_probe(provider_name, probe_token)
+
+
+def get_provider_health() -> Dict[str, Any]:
+    """
+    Return breaker state (shared) and latency/timeout figures (this process) per provider.
+    """
+    health: Dict[str, Dict[str, Any]] = {}
+    for provider_name in _latencies.providers():
+        p95 = _latencies.p95(provider_name)
+        health[provider_name] = {
+            "p95_latency": round(p95, 3) if p95 is not None else None,
+            "timeout": round(get_provider_timeout(provider_name), 3),
+        }
+
+    try:
+        redis = get_redis()
+        for key in redis.scan_iter(f"{KEY_PREFIX}:*"):
+            key = key.decode()
+            if key.endswith(":probe"):
+                continue
+            provider_name = key[len(KEY_PREFIX) + 1:]
+            breaker = {k.decode(): v.decode() for k, v in redis.hgetall(key).items()}
+            health.setdefault(provider_name, {}).update(
+                breaker=breaker.get("state", CLOSED),
+                consecutive_failures=int(breaker.get("failures", 0)),
+            )
+    except Exception as e:
+        logger.warning(f"Failed to read circuit breaker states: {e}")
+
+    for provider_health in health.values():
+        provider_health.setdefault("breaker", CLOSED)
+        provider_health.setdefault("consecutive_failures", 0)
+    return health
@@ -0,0 +1,82 @@
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+from kombu.exceptions import ChannelError
+
+from settings import settings
+from services.redis_client import get_redis
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "queue-wait"
+
+# Wait samples are dropped if a queue sees no task for this long
+SAMPLES_TTL = 24 * 3600
+
+
+def report_queues() -> List[str]:
+    return [
+        settings.celery_interactive_queue,
+        settings.celery_io_queue,
+        settings.celery_llm_queue,
+        settings.celery_bulk_queue,
+    ]
+
+
+def record_queue_wait(queue: str, enqueued_at: float):
+    """Record how long a task waited in `queue` before a worker started it."""
+    wait = max(0.0, time.time() - enqueued_at)
+    metrics.QUEUE_WAIT_SECONDS.labels(queue=queue).observe(wait)
+    key = f"{KEY_PREFIX}:{queue}"
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lpush(key, f"{wait:.3f}")
+        pipe.ltrim(key, 0, settings.queue_wait_samples - 1)
+        pipe.expire(key, SAMPLES_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record queue wait for {queue}: {e}")
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _queue_depth(celeryapp, queue: str) -> Optional[int]:
+    try:
+        with celeryapp.connection_for_read() as connection:
+            connection.ensure_connection(max_retries=1)
+            return connection.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except ChannelError:
+        # Not declared yet: no worker has consumed it and nothing was published
+        return 0
+    except Exception as e:
+        logger.warning(f"Could not read depth of queue {queue}: {e}")
+        return None
+
+
+def get_queue_stats(celeryapp) -> Dict[str, Any]:
+    """
+    Depth (messages waiting) and recent wait times before a worker picks a
+    task up, per report queue. Values are None when the broker or Redis is
+    unavailable.
+    """
+    stats = {}
+    for queue in report_queues():
+        waits = None
+        try:
+            waits = sorted(float(w) for w in get_redis().lrange(f"{KEY_PREFIX}:{queue}", 0, -1))
+        except Exception as e:
+            logger.warning(f"Could not read queue waits for {queue}: {e}")
+
+        stats[queue] = {
+            "depth": _queue_depth(celeryapp, queue),
+            "wait_samples": len(waits) if waits is not None else None,
+            "wait_p50": _percentile(waits, 50) if waits else None,
+            "wait_p95": _percentile(waits, 95) if waits else None,
+            "wait_max": waits[-1] if waits else None,
+        }
+    return stats
@@ -0,0 +1,80 @@
+import logging
+import math
+import time
+
+from exceptions import RateLimitExceeded
+from settings import settings
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rate-limit"
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Token bucket: refill for the time since the last call, then take `cost`
+# tokens if there are enough. Returns {allowed, seconds until enough tokens}.
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(capacity / rate) + 1)
+if allowed == 1 then
+    return {1, '0'}
+end
+return {0, tostring((cost - tokens) / rate)}
+"""
+
+
+def _bucket_limits(bucket: str):
+    if bucket == BULK:
+        return settings.rate_limit_bulk_rate, settings.rate_limit_bulk_burst
+    return settings.rate_limit_interactive_rate, settings.rate_limit_interactive_burst
+
+
+def acquire(bucket: str, identity: str, cost: int = 1):
+    """
+    Take `cost` tokens from `identity`'s bucket ("interactive" or "bulk").
+
+    Fails open: if Redis is unavailable the request is let through.
+
+    Raises:
+        RateLimitExceeded: If the bucket does not hold enough tokens; the
+            exception carries how many seconds until it will
+    """
+    if not settings.rate_limit_enabled:
+        return
+
+    rate, capacity = _bucket_limits(bucket)
+    if cost > capacity:
+        raise RateLimitExceeded(
+            f"Request costs {cost} tokens but the {bucket} limit allows at most {capacity} at once",
+            retry_after=None
+        )
+
+    try:
+        script = get_redis().register_script(_TOKEN_BUCKET_SCRIPT)
+        allowed, wait = script(
+            keys=[f"{KEY_PREFIX}:{bucket}:{identity}"],
+            args=[rate, capacity, cost, time.time()],
+        )
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable, letting {identity} through: {e}")
+        return
+
+    if not allowed:
+        retry_after = math.ceil(float(wait))
+        logger.info(f"Rate limited {identity} on the {bucket} bucket for {retry_after}s")
+        raise RateLimitExceeded(f"Rate limit exceeded, retry in {retry_after}s", retry_after=retry_after)
@@ -0,0 +1,47 @@
+import asyncio
+import weakref
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from settings import settings
+
+_sync_client: Optional[redis.Redis] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis_url() -> str:
+    """Redis used for caches and coordination; defaults to the Celery broker."""
+    return settings.redis_url or settings.celery_broker_url
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the process-wide synchronous Redis client.
+    redis-py resets its connection pool after a fork, so this is safe in Celery children.
+    """
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(
+            get_redis_url(),
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+        )
+    return _sync_client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Return an asyncio Redis client bound to the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(
+            get_redis_url(),
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+        )
+        _async_clients[loop] = client
+    return client
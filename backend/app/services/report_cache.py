@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+from models import AggregatedData, ReportResponse
+from settings import settings
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "report-cache"
+# Sorted set of cache keys scored by last access time, used for LRU eviction
+INDEX_KEY = f"{KEY_PREFIX}:index"
+
+
+def compute_fingerprint(aggregated_data: AggregatedData, model: str, prompt_version: str) -> str:
+    """
+    Stable hash of everything that determines the LLM output for a report.
+
+    Only provider name, status and payload take part; retrieval timestamps and
+    provider completion order do not.
+    """
+    providers = sorted(
+        (
+            {"provider": p.provider_name, "status": p.status, "data": p.data}
+            for p in aggregated_data.providers
+        ),
+        key=lambda p: p["provider"],
+    )
+    canonical = json.dumps(
+        {"providers": providers, "model": model, "prompt_version": prompt_version},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _cache_key(vin: str, fingerprint: str) -> str:
+    return f"{KEY_PREFIX}:{vin.upper()}:{fingerprint}"
+
+
+def get_cached_report(vin: str, fingerprint: str) -> Optional[ReportResponse]:
+    """
+    Return the stored report for this VIN/fingerprint, or None on a miss or Redis error.
+    """
+    if not settings.report_cache_enabled:
+        return None
+
+    key = _cache_key(vin, fingerprint)
+    try:
+        redis = get_redis()
+        raw = redis.get(key)
+        if raw is None:
+            return None
+        redis.zadd(INDEX_KEY, {key: time.time()})
+    except Exception as e:
+        logger.warning(f"Report cache read failed for VIN {vin}: {e}")
+        return None
+
+    logger.info(f"Report cache hit for VIN {vin}")
+    return ReportResponse.model_validate_json(raw)
+
+
+def store_report(vin: str, fingerprint: str, report: ReportResponse):
+    """
+    Store a report for `report_cache_max_age` seconds and evict the least
+    recently used entries beyond `report_cache_max_entries`.
+    """
+    if not settings.report_cache_enabled:
+        return
+
+    key = _cache_key(vin, fingerprint)
+    now = time.time()
+    try:
+        redis = get_redis()
+        pipe = redis.pipeline()
+        pipe.set(key, report.model_dump_json(), ex=settings.report_cache_max_age)
+        pipe.zadd(INDEX_KEY, {key: now})
+        # Entries that outlived max age have already expired; drop them from the index
+        pipe.zremrangebyscore(INDEX_KEY, "-inf", now - settings.report_cache_max_age)
+        pipe.zcard(INDEX_KEY)
+        size = pipe.execute()[-1]
+
+        excess = size - settings.report_cache_max_entries
+        if excess > 0:
+            evicted = redis.zrange(INDEX_KEY, 0, excess - 1)
+            if evicted:
+                pipe = redis.pipeline()
+                pipe.delete(*evicted)
+                pipe.zrem(INDEX_KEY, *evicted)
+                pipe.execute()
+                logger.info(f"Evicted {len(evicted)} reports from the report cache")
+    except Exception as e:
+        logger.warning(f"Report cache write failed for VIN {vin}: {e}")
@@ -1,136 +1,479 @@
-from openai import OpenAI
-from models import ReportResponse
+from openai import APIConnectionError, BadRequestError, InternalServerError, OpenAI, RateLimitError, Stream
+from models import AggregatedData, LLMBackend, ReportPrompt, ReportResponse
+from enums import ReportStage
 from services.data_aggregator import aggregate_car_data
+from services.report_cache import compute_fingerprint, get_cached_report, store_report
+from services.json_sections import IncrementalSectionParser
+from services.report_schema import REPORT_SECTIONS, parse_report_json, schema_outline, validate_section, validate_sections
+from services.section_builder import build_structured_sections, is_clean_history, narrative_context
+from services.prompt_serializer import estimate_tokens, serialize_provider_data
+from services import llm_rate_limiter, llm_router, metrics
+from services.event_log import log_event
 from settings import settings
 from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+import itertools
 import logging
 import json
+import random
+import time
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=settings.deepseek_api_key, base_url=settings.ai_base_url)
+_clients: Dict[str, OpenAI] = {}
 
-def generate_report(vin: str) -> ReportResponse:
-    # Aggregate data from providers
-    aggregated_data = aggregate_car_data(vin)
+# Bump whenever the prompt changes so cached reports from the old prompt are not reused
+PROMPT_VERSION = "5"
 
-    # Calculate confidence score
-    successful_providers = sum(1 for p in aggregated_data.providers if p.status == "success")
-    confidence_score = successful_providers / len(aggregated_data.providers)
-
-    # Prepare data for AI
-    provider_summaries = []
-    for provider in aggregated_data.providers:
-        if provider.status == "success":
-            provider_summaries.append(f"{provider.provider_name}: {provider.data}")
-        else:
-            provider_summaries.append(f"{provider.provider_name}: Data unavailable")
-
-    data_summary = "\n".join(provider_summaries)
-
-    # AI prompt
-    prompt = f"""
-    Generate a detailed JSON report for vehicle VIN: {vin}
-
-    Data from providers:
-    {data_summary}
-
-    Create a JSON object with the following structure:
-    {{
-        "vehicle_identification": {{
-            "vin": "{vin}",
-            "make": "string",
-            "model": "string",
-            "year": number,
-            "engine": "string",
-            "transmission": "string"
-        }},
-        "accident_history": {{
-            "total_accidents": number,
-            "severity": "none|minor|moderate|severe",
-            "structural_damage": boolean,
-            "flood_damage": boolean,
-            "accidents": [array of accident objects with date, severity, description]
-        }},
-        "ownership_history": {{
-            "total_owners": number,
-            "average_ownership_duration_months": number,
-            "commercial_use": boolean,
-            "rental_history": boolean,
-            "owners": [array of owner objects with duration, location]
-        }},
-        "title_status": {{
-            "status": "clean|salvage|rebuilt|flood|lemon",
-            "issues": [array of strings],
-            "state_issued": "string"
-        }},
-        "recalls": {{
-            "total_recalls": number,
-            "open_recalls": number,
-            "safety_recalls": number,
-            "recall_list": [array of recall objects with number, date, component, description, status]
-        }},
-        "maintenance": {{
-            "regular_maintenance": boolean,
-            "total_services": number,
-            "overdue_services": [array of strings],
-            "last_service": {{
-                "date": "string",
-                "mileage": number,
-                "type": "string"
-            }}
-        }},
-        "insurance_claims": {{
-            "total_claims": number,
-            "claims_severity": "low|medium|high",
-            "claims": [array of claim objects with date, type, amount, description]
-        }},
-        "overall_assessment": {{
-            "condition": "excellent|good|fair|poor",
-            "risk_level": "low|medium|high",
-            "recommended_action": "buy|negotiate|inspect|avoid",
-            "key_findings": [array of strings],
-            "estimated_value": {{
-                "min": number,
-                "max": number,
-                "currency": "USD"
-            }},
-            "confidence": number
-        }}
-    }}
-
-    Fill in the actual data based on the provider information. Use reasonable defaults where data is unavailable.
-    Return only valid JSON, no additional text.
+# System messages: instructions and schema only, nothing per report, so they
+# stay byte-identical across requests and the API can serve them from its
+# prompt prefix cache. The VIN and provider data go in the user message.
+REPORT_SYSTEM_PROMPT = f"""You write used-vehicle history reports from the data of vehicle history providers.
+
+Return only valid JSON, no additional text, with this structure:
+{schema_outline(REPORT_SECTIONS)}
+
+Fill in the actual data based on the provider information. Use reasonable defaults where data is unavailable.
+"""
+NARRATIVE_SYSTEM_PROMPT = f"""You write the overall assessment of used-vehicle history reports whose other sections were already filled from provider data.
+
+Return only valid JSON, no additional text, with this structure:
+{schema_outline(["overall_assessment"])}
+"""
+
+# REPORT_MODE "hybrid" fills the structured sections from provider data and only
+# asks the model for the narrative; any other mode ("llm") asks for the whole report
+REPORT_MODE_HYBRID = "hybrid"
+
+# Chat messages as sent to the API
+Messages = List[Dict[str, str]]
+
+# Backends that rejected response_format; they get plain requests from then on
+_json_mode_unsupported: Set[str] = set()
+
+# Called with (section_name, section_content) as each top-level report section completes
+SectionCallback = Callable[[str, Any], None]
+# Called when generation moves to a new stage
+StageCallback = Callable[[ReportStage], None]
+
+
+class StartedCompletion(NamedTuple):
+    response: Any  # the ChatCompletion, or the Stream when streaming
+    chunks: Iterator  # stream chunks, starting with those read while waiting for the first token
+    estimated_tokens: int  # charged to the rate limiter
+    sent_at: float  # time.monotonic() when the request went out
+
+
+def get_ai_client(backend: LLMBackend) -> OpenAI:
+    """
+    Return the process-wide OpenAI client for `backend`. Clients are created
+    on first use, so processes that never call the LLM do not build one and
+    each forked worker process gets its own connection pools.
+    """
+    client = _clients.get(backend.name)
+    if client is None:
+        # Retries happen in _create_completion (backoff, Retry-After, throttle counts)
+        client = _clients[backend.name] = OpenAI(
+            api_key=backend.api_key or settings.deepseek_api_key, base_url=backend.base_url, max_retries=0
+        )
+    return client
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    backoff = min(settings.ai_retry_max_delay, settings.ai_retry_base_delay * 2 ** attempt)
+    delay = random.uniform(0, backoff)
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+def _rejects_json_mode(error: BadRequestError) -> bool:
+    """Whether a 400 is about response_format, rather than e.g. the context length."""
+    if getattr(error, "param", None) == "response_format":
+        return True
+    message = str(error).lower()
+    return any(hint in message for hint in ("response_format", "json_object", "json mode"))
+
+def _send(backend: LLMBackend, messages: Messages, max_tokens: int, stream: bool):
+    """
+    One chat completion request, in JSON mode when enabled. If the backend
+    rejects response_format the request is repeated without it and JSON mode
+    stays off for that backend; other bad requests are raised as they are.
     """
+    options = {"stream_options": {"include_usage": True}} if stream else {}
+    create = get_ai_client(backend).chat.completions.create
+    if settings.ai_json_mode and backend.name not in _json_mode_unsupported:
+        try:
+            return create(
+                model=backend.model, messages=messages, max_tokens=max_tokens, stream=stream,
+                response_format={"type": "json_object"}, **options
+            )
+        except BadRequestError as e:
+            if not _rejects_json_mode(e):
+                raise
+            logger.warning(f"AI backend {backend.name} does not accept JSON mode, sending plain requests: {e}")
+            _json_mode_unsupported.add(backend.name)
+    return create(model=backend.model, messages=messages, max_tokens=max_tokens, stream=stream, **options)
 
+def _start_completion(
+    backend: LLMBackend, messages: Messages, max_tokens: int, stream: bool, estimated_tokens: int
+) -> StartedCompletion:
+    """
+    Send the request to `backend` (rate limiter capacity already taken) and
+    wait until it starts answering: the first streamed content, or the whole
+    response when not streaming.
+    """
+    sent_at = time.monotonic()
     try:
-        response = client.chat.completions.create(
-            model=settings.ai_model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=settings.ai_max_tokens,
-            stream=False
+        response = _send(backend, messages, max_tokens, stream)
+    except (RateLimitError, InternalServerError) as e:
+        llm_rate_limiter.record_throttle(e.status_code)
+        raise
+    if not stream:
+        return StartedCompletion(response, iter(()), estimated_tokens, sent_at)
+
+    read = []
+    for chunk in response:
+        read.append(chunk)
+        if chunk.choices and chunk.choices[0].delta.content:
+            break
+    return StartedCompletion(response, itertools.chain(read, response), estimated_tokens, sent_at)
+
+def _discard_completion(started: StartedCompletion):
+    """Stop reading a hedged request that lost the race."""
+    if isinstance(started.response, Stream):
+        started.response.close()
+
+def _create_completion(messages: Messages, max_tokens: int, stream: bool, tier: str = "") -> Tuple[LLMBackend, StartedCompletion]:
+    """
+    Start a chat completion on the backends the router picks for `tier`
+    (hedged and with failover), retrying with backoff when all of them
+    answered 429, 5xx or could not be reached. Each request sent is charged
+    to the shared rate limiter before it goes out.
+    """
+    estimated_tokens = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+
+    def admit(wait: bool) -> bool:
+        if wait:
+            llm_rate_limiter.acquire(estimated_tokens)
+            return True
+        return llm_rate_limiter.try_acquire(estimated_tokens)
+
+    for attempt in range(settings.ai_max_retries + 1):
+        llm_rate_limiter.acquire(estimated_tokens)
+        try:
+            return llm_router.race(
+                llm_router.choose_backends(tier),
+                lambda backend: _start_completion(backend, messages, max_tokens, stream, estimated_tokens),
+                _discard_completion,
+                admit,
+            )
+        except (RateLimitError, InternalServerError, APIConnectionError) as e:
+            if attempt == settings.ai_max_retries:
+                raise
+            delay = _retry_delay(attempt, e)
+            logger.warning(f"AI request failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+            llm_rate_limiter.record_retry()
+            time.sleep(delay)
+
+def _read_stream(backend: LLMBackend, started: StartedCompletion, on_section: Optional[SectionCallback]) -> str:
+    """
+    Consume the completion as a stream, handing each finished section to `on_section`.
+    Returns the full completion text.
+    """
+    parser = IncrementalSectionParser()
+    for chunk in started.chunks:
+        if getattr(chunk, "usage", None):
+            _record_usage(backend, started.estimated_tokens, chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        for name, content in parser.feed(delta):
+            if on_section:
+                on_section(name, content)
+    return parser.buffer.strip()
+
+def _cached_prompt_tokens(usage) -> int:
+    """Prompt tokens served from the provider's prefix cache (OpenAI and DeepSeek report them differently)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    return cached or 0
+
+def _record_usage(backend: LLMBackend, estimated_tokens: int, usage):
+    cached_tokens = _cached_prompt_tokens(usage)
+    llm_rate_limiter.record_usage(estimated_tokens, usage.total_tokens)
+    llm_router.record_usage(backend, usage.prompt_tokens or 0, cached_tokens, usage.completion_tokens or 0)
+    metrics.LLM_TOKENS.labels(kind="prompt").inc(usage.prompt_tokens or 0)
+    metrics.LLM_TOKENS.labels(kind="prompt_cached").inc(cached_tokens)
+    metrics.LLM_TOKENS.labels(kind="completion").inc(usage.completion_tokens or 0)
+
+def _complete(messages: Messages, max_tokens: int, on_section: Optional[SectionCallback], tier: str = "") -> str:
+    with metrics.LLM_REQUEST_SECONDS.time():
+        backend, started = _create_completion(messages, max_tokens, settings.ai_stream, tier)
+        try:
+            if settings.ai_stream:
+                completion = _read_stream(backend, started, on_section)
+            else:
+                if started.response.usage:
+                    _record_usage(backend, started.estimated_tokens, started.response.usage)
+                completion = started.response.choices[0].message.content.strip()
+        except Exception as e:
+            llm_router.record_failure(backend, e)
+            raise
+    seconds = time.monotonic() - started.sent_at
+    llm_router.record_success(backend, seconds)
+    log_event(logger, "llm_request", backend=backend.name, model=backend.model, tier=tier, seconds=round(seconds, 3))
+    return completion
+
+def _publish_valid(on_section: Optional[SectionCallback], expected: Iterable[str]) -> Optional[SectionCallback]:
+    """Wrap `on_section` so only expected sections that pass validation are streamed."""
+    if on_section is None:
+        return None
+    expected = set(expected)
+
+    def publish(name: str, content: Any):
+        section = validate_section(name, content) if name in expected else None
+        if section is not None:
+            on_section(name, section)
+    return publish
+
+def _request_sections(
+    messages: Messages,
+    max_tokens: int,
+    expected: List[str],
+    on_section: Optional[SectionCallback],
+    tier: str = "",
+) -> Dict[str, Any]:
+    """
+    Run the completion and validate each expected section against the report
+    schema. Sections that are missing, cut off or invalid are asked for again
+    (up to ai_section_retries follow-up requests) rather than regenerating the
+    whole report. A follow-up repeats the original messages, so it reuses their
+    cached prefix, and adds one naming the sections to redo.
+
+    Returns:
+        The valid sections, with "incomplete_sections" listing any still missing.
+        An error report if no section could be used.
+    """
+    sections: Dict[str, Any] = {}
+    salvaged: Dict[str, Any] = {}  # repaired after being cut off; used if a retry does not do better
+    problems: Dict[str, str] = {name: "missing" for name in expected}
+    error = "Failed to parse AI response as JSON"
+    for attempt in range(settings.ai_section_retries + 1):
+        request_messages = messages
+        if attempt:
+            metrics.LLM_SECTION_RETRIES.inc()
+            log_event(logger, "llm_section_retry", attempt=attempt, sections=list(problems))
+            request_messages = messages + [{"role": "user", "content": build_section_retry_prompt(problems)}]
+
+        completion = ""
+        try:
+            completion = _complete(request_messages, max_tokens, _publish_valid(on_section, problems), tier)
+        except Exception as e:
+            metrics.LLM_ERRORS.labels(reason=e.__class__.__name__).inc()
+            logger.error(f"AI generation failed: {e}")
+            error = f"Unable to generate AI report due to error: {str(e)}"
+            break
+
+        data, cut_section = parse_report_json(completion)
+        if data is None:
+            metrics.LLM_JSON_PARSE_FAILURES.inc()
+            log_event(logger, "llm_json_parse_failed", logging.ERROR, chars=len(completion))
+            logger.debug(f"Raw response: {completion}")
+            continue
+
+        valid, invalid = validate_sections(data, problems)
+        if cut_section in valid:
+            salvaged[cut_section] = valid.pop(cut_section)
+            invalid[cut_section] = "cut off before it was complete, keep it shorter"
+        sections.update(valid)
+        problems = invalid
+        log_event(logger, "llm_response", chars=len(completion), sections=list(valid), problems=list(problems))
+        if not problems:
+            break
+
+    for name in list(problems):
+        if name in salvaged:
+            sections[name] = salvaged[name]
+            del problems[name]
+    if not sections:
+        return {"error": error}
+    if problems:
+        logger.warning(f"AI report is missing sections after retries: {', '.join(problems)}")
+        sections["incomplete_sections"] = list(problems)
+    return sections
+
+def build_full_prompt(vin: str, aggregated_data: AggregatedData) -> str:
+    """
+    User message for the "llm" mode: the model writes every section of the
+    report (REPORT_SYSTEM_PROMPT holds the instructions and schema).
+    """
+    # Prepare data for AI: compact JSON, trimmed to the token budget
+    data_summary, data_tokens = serialize_provider_data(aggregated_data, settings.ai_prompt_token_budget)
+    log_event(logger, "prompt_data", vin=vin, tokens=data_tokens, budget=settings.ai_prompt_token_budget)
+
+    return f"""Generate a detailed JSON report for vehicle VIN: {vin}
+
+Data from providers:
+{data_summary}
+"""
+
+def build_narrative_prompt(
+    vin: str, sections: Dict[str, Any], context: Dict[str, Any], missing: Iterable[str] = ()
+) -> str:
+    """
+    User message for the "hybrid" mode: the structured sections are already
+    filled, the model only writes the overall assessment, plus any `missing`
+    sections that could not be built from provider data.
+    """
+    prompt = f"""Write the overall assessment for the used-vehicle history report of VIN {vin}.
+
+Report sections (built from provider data):
+{json.dumps(sections, separators=(",", ":"))}
+
+Additional provider data:
+{json.dumps(context, separators=(",", ":"))}
+"""
+    missing = list(missing)
+    if missing:
+        prompt += f"""
+These sections could not be built from the provider data; return them as well, in the same JSON object:
+{schema_outline(missing)}
+"""
+    return prompt
+
+def build_section_retry_prompt(problems: Dict[str, str]) -> str:
+    """
+    Follow-up request for the sections the previous answer left out or got
+    wrong; the sections that were fine are not generated again.
+    """
+    issues = "\n".join(f"- {name}: {problem}" for name, problem in problems.items())
+    return f"""These report sections were missing or invalid:
+{issues}
+
+Return only valid JSON, no additional text, with just these sections:
+{schema_outline(problems)}
+"""
+
+def report_messages(report_prompt: ReportPrompt) -> Messages:
+    """The static system message first, so the provider can cache it as a prompt prefix."""
+    messages = [{"role": "system", "content": report_prompt.system}] if report_prompt.system else []
+    return messages + [{"role": "user", "content": report_prompt.prompt}]
+
+def find_cached_report(vin: str, aggregated_data: AggregatedData, force_refresh: bool = False) -> Tuple[str, Optional[ReportResponse]]:
+    """
+    Fingerprint the provider data and look for a stored report built from the same data.
+
+    Returns:
+        (fingerprint, cached_report or None)
+    """
+    prompt_version = f"{PROMPT_VERSION}-{settings.report_mode}"
+    fingerprint = compute_fingerprint(aggregated_data, llm_router.models_fingerprint(), prompt_version)
+    if force_refresh:
+        return fingerprint, None
+    cached_report = get_cached_report(vin, fingerprint)
+    if cached_report is None:
+        return fingerprint, None
+    # Reports cached before fingerprints were recorded lack the field
+    return fingerprint, cached_report.model_copy(update={"fingerprint": fingerprint})
+
+def build_report_prompt(vin: str, aggregated_data: AggregatedData) -> ReportPrompt:
+    """
+    The LLM request for a report. In "hybrid" mode the structured sections are
+    filled here and only the narrative is left to the model.
+    """
+    sections = build_structured_sections(aggregated_data)
+    # Clean histories go to the fast models, anything with findings to the strong ones
+    tier = ""
+    if settings.ai_routing_enabled:
+        tier = llm_router.TIER_FAST if is_clean_history(sections) else llm_router.TIER_STRONG
+
+    if settings.report_mode == REPORT_MODE_HYBRID:
+        # Prefilled sections meet the same schema as generated ones; any that
+        # do not are left to the model
+        prefilled = {}
+        for name, content in sections.items():
+            valid = validate_section(name, content)
+            if valid is None:
+                logger.warning(f"Structured section {name} for VIN {vin} does not fit the report schema, asking the model")
+            else:
+                prefilled[name] = valid
+        missing = [name for name in sections if name not in prefilled]
+        prompt = build_narrative_prompt(vin, prefilled, narrative_context(aggregated_data), missing)
+        report_prompt = ReportPrompt(
+            system=NARRATIVE_SYSTEM_PROMPT, prompt=prompt, max_tokens=settings.ai_narrative_max_tokens,
+            sections=prefilled, tier=tier
+        )
+    else:
+        report_prompt = ReportPrompt(
+            system=REPORT_SYSTEM_PROMPT, prompt=build_full_prompt(vin, aggregated_data), max_tokens=settings.ai_max_tokens,
+            tier=tier
         )
-        report_json_str = response.choices[0].message.content.strip()
-        logger.info(f"AI response: {report_json_str[:500]}...")  # Log first 500 chars
-        report_data = json.loads(report_json_str)
-        logger.info("JSON parsing successful")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing failed: {e}")
-        logger.error(f"Raw response: {report_json_str}")
-        report_data = {
-            "error": "Failed to parse AI response as JSON",
-            "raw_response": report_json_str
-        }
-    except Exception as e:
-        logger.error(f"AI generation failed: {e}")
-        report_data = {
-            "error": f"Unable to generate AI report due to error: {str(e)}"
-        }
-
-    return ReportResponse(
+    prompt_tokens = estimate_tokens(report_prompt.system) + estimate_tokens(report_prompt.prompt)
+    metrics.PROMPT_TOKENS.labels(mode=settings.report_mode).observe(prompt_tokens)
+    return report_prompt
+
+def complete_report_data(report_prompt: ReportPrompt, on_section: Optional[SectionCallback] = None) -> Dict[str, Any]:
+    """Run the LLM request and merge its output with any prefilled sections."""
+    expected = [name for name in REPORT_SECTIONS if name not in report_prompt.sections]
+    report_data = _request_sections(
+        report_messages(report_prompt), report_prompt.max_tokens, expected, on_section, report_prompt.tier
+    )
+    # Prefilled sections are kept even if the narrative failed
+    return {**report_prompt.sections, **report_data}
+
+def assemble_report(vin: str, aggregated_data: AggregatedData, fingerprint: str, report_data: Dict[str, Any]) -> ReportResponse:
+    """Build the final report and store it in the report cache."""
+    # Calculate confidence score; skipped providers count as missing data
+    successful_providers = sum(1 for p in aggregated_data.providers if p.status == "success")
+    confidence_score = successful_providers / len(aggregated_data.providers) if aggregated_data.providers else 0.0
+    skipped_providers = [p.provider_name for p in aggregated_data.providers if p.status == "skipped"]
+
+    report = ReportResponse(
         vin=vin,
         report_data=report_data,
         generated_at=datetime.utcnow(),
         providers_used=[p.provider_name for p in aggregated_data.providers if p.status == "success"],
-        confidence_score=confidence_score
-    )
\ No newline at end of file
+        providers_skipped=skipped_providers,
+        confidence_score=confidence_score,
+        fingerprint=fingerprint
+    )
+
+    # Error and incomplete reports are not cached so the next request retries the LLM
+    if "error" not in report_data and "incomplete_sections" not in report_data:
+        store_report(vin, fingerprint, report)
+
+    return report
+
+def generate_report(
+    vin: str,
+    force_refresh: bool = False,
+    on_section: Optional[SectionCallback] = None,
+    on_stage: Optional[StageCallback] = None
+) -> ReportResponse:
+    # Aggregate data from providers
+    if on_stage:
+        on_stage(ReportStage.AGGREGATING)
+    aggregated_data = aggregate_car_data(vin)
+
+    # Reuse a stored report if the provider data has not changed
+    fingerprint, cached_report = find_cached_report(vin, aggregated_data, force_refresh)
+    if cached_report is not None:
+        return cached_report
+
+    if on_stage:
+        on_stage(ReportStage.GENERATING)
+    report_prompt = build_report_prompt(vin, aggregated_data)
+    if on_section:
+        for name, content in report_prompt.sections.items():
+            on_section(name, content)
+    report_data = complete_report_data(report_prompt, on_section)
+
+    return assemble_report(vin, aggregated_data, fingerprint, report_data)
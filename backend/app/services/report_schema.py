@@ -0,0 +1,110 @@
+"""
+The report schema (models.VehicleReport) as the LLM sees it and as its output
+is checked: the JSON outline put in prompts, parsing with a repair pass for
+fenced or truncated completions, and per-section validation so only the
+sections that came back missing or wrong need to be asked for again.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+from models import VehicleReport
+from services import metrics
+from services.json_sections import repair_json
+
+logger = logging.getLogger(__name__)
+
+SECTION_MODELS: Dict[str, Type[BaseModel]] = {
+    name: field.annotation for name, field in VehicleReport.model_fields.items()
+}
+REPORT_SECTIONS: List[str] = list(SECTION_MODELS)
+
+# Validation errors quoted back to the model per section
+MAX_ERRORS_PER_SECTION = 5
+
+
+def _outline(annotation: Any) -> str:
+    """One field type written the way the prompt describes it (e.g. "low|medium|high", number)."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        fields = ", ".join(f'"{name}": {_outline(field.annotation)}' for name, field in annotation.model_fields.items())
+        return f"{{{fields}}}"
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is list:
+        return f"[{_outline(args[0])}]"
+    if origin is Union:
+        types = [a for a in args if a is not type(None)]
+        return "number" if set(types) <= {int, float} else _outline(types[0])
+    if origin is not None and hasattr(annotation, "__metadata__"):
+        return _outline(args[0])  # Annotated
+    if args and all(isinstance(a, str) for a in args):
+        return f'"{"|".join(args)}"'  # Literal
+    if annotation is bool:
+        return "boolean"
+    if annotation in (int, float):
+        return "number"
+    return '"string"'
+
+
+def schema_outline(sections: Iterable[str]) -> str:
+    """The JSON structure to ask the model for, covering `sections`."""
+    lines = ",\n".join(f'  "{name}": {_outline(SECTION_MODELS[name])}' for name in sections)
+    return f"{{\n{lines}\n}}"
+
+
+def parse_report_json(text: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Parse a completion as a JSON object, repairing it if needed.
+
+    Returns:
+        (parsed object or None, name of the section that was cut off or None)
+    """
+    try:
+        data = orjson.loads(text)
+        cut_section = None
+    except orjson.JSONDecodeError:
+        repaired, truncated = repair_json(text)
+        try:
+            data = orjson.loads(repaired)
+        except orjson.JSONDecodeError:
+            return None, None
+        metrics.LLM_JSON_REPAIRS.labels(kind="truncated" if truncated else "wrapped").inc()
+        # The value being written when the output stopped is the last one kept
+        cut_section = next(reversed(data), None) if truncated and isinstance(data, dict) else None
+    if not isinstance(data, dict):
+        return None, None
+    return data, cut_section
+
+
+def validate_section(name: str, content: Any) -> Optional[Dict[str, Any]]:
+    """The section normalized to the schema, or None if it does not fit."""
+    try:
+        return SECTION_MODELS[name].model_validate(content).model_dump(mode="json")
+    except ValidationError:
+        return None
+
+
+def validate_sections(data: Dict[str, Any], expected: Iterable[str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Check each expected section of a parsed completion against the schema.
+
+    Returns:
+        (valid sections normalized to the schema, {section: what is wrong with it})
+    """
+    valid: Dict[str, Any] = {}
+    problems: Dict[str, str] = {}
+    for name in expected:
+        if name not in data:
+            problems[name] = "missing"
+            continue
+        try:
+            valid[name] = SECTION_MODELS[name].model_validate(data[name]).model_dump(mode="json")
+        except ValidationError as e:
+            problems[name] = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or name}: {error['msg']}"
+                for error in e.errors()[:MAX_ERRORS_PER_SECTION]
+            )
+            metrics.LLM_INVALID_SECTIONS.labels(section=name).inc()
+    return valid, problems
@@ -0,0 +1,75 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Report, ReportResponse, ReportSummary
+
+
+# Store a finished report
+def save_report(
+    db: Session,
+    report: ReportResponse,
+    task_id: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> Report:
+    row = Report(
+        task_id=task_id,
+        vin=report.vin.upper(),
+        user_id=user_id,
+        fingerprint=report.fingerprint,
+        report=report.model_dump_json(),
+        confidence_score=report.confidence_score,
+        generated_at=report.generated_at,
+    )
+    db.add(row)
+    db.commit()
+    db.refresh(row)
+    return row
+
+
+# Get a stored report by id
+def get_report(db: Session, report_id: int) -> Optional[Report]:
+    return db.query(Report).filter(Report.id == report_id).first()
+
+
+# Get the stored report JSON of several reports, keyed by id
+def get_report_bodies(db: Session, report_ids: Iterable[int]) -> Dict[int, str]:
+    report_ids = list(report_ids)
+    if not report_ids:
+        return {}
+    rows = db.query(Report.id, Report.report).filter(Report.id.in_(report_ids)).all()
+    return {row.id: row.report for row in rows}
+
+
+# Get the newest stored report for a VIN
+def get_latest_report_for_vin(db: Session, vin: str) -> Optional[Report]:
+    return (
+        db.query(Report)
+        .filter(Report.vin == vin.upper())
+        .order_by(Report.created_at.desc())
+        .first()
+    )
+
+
+# Get one page of a user's reports, newest first, and the total count
+def get_user_reports(db: Session, user_id: int, offset: int, limit: int) -> Tuple[int, List[ReportSummary]]:
+    query = db.query(Report).filter(Report.user_id == user_id)
+    total = query.count()
+    # Only the summary columns; the report JSON is not loaded for the listing
+    rows = (
+        query.with_entities(Report.id, Report.vin, Report.confidence_score, Report.generated_at, Report.created_at)
+        .order_by(Report.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return total, [
+        ReportSummary(
+            id=row.id,
+            vin=row.vin,
+            confidence_score=row.confidence_score,
+            generated_at=row.generated_at,
+            created_at=row.created_at,
+        )
+        for row in rows
+    ]
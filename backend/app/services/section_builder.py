@@ -0,0 +1,280 @@
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from models import AggregatedData
+from services.vin_validator import decode_identification
+
+SEVERITY_ORDER = ["none", "minor", "moderate", "severe"]
+
+# Title brands as providers word them, by the report status they mean. Checked
+# in order, so e.g. "rebuilt salvage" is rebuilt; anything else is "branded".
+TITLE_BRANDS = (
+    ("rebuilt", ("rebuilt", "reconstructed", "rebuildable", "restored")),
+    ("salvage", ("salvage", "junk", "total loss", "dismantled", "destroyed", "scrap",
+                 "non-repairable", "nonrepairable", "parts only", "certificate of destruction")),
+    ("flood", ("flood", "water damage")),
+    ("lemon", ("lemon", "buyback", "buy back")),
+    ("clean", ("clean",)),
+)
+
+# Longest gap between services (in months) that still counts as regular maintenance
+MAX_SERVICE_GAP_MONTHS = 18
+
+
+def provider_payload(aggregated_data: AggregatedData, provider_name: str) -> Dict[str, Any]:
+    """Return a provider's data, or an empty dict if it failed or is missing."""
+    for provider in aggregated_data.providers:
+        if provider.provider_name == provider_name and provider.status == "success":
+            return provider.data
+    return {}
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not value or value == "present":
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _months_between(start: date, end: date) -> int:
+    return max(0, (end.year - start.year) * 12 + end.month - start.month)
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def build_vehicle_identification(vin: str, nhtsa: Dict[str, Any]) -> Dict[str, Any]:
+    engine_parts = []
+    if nhtsa.get("DisplacementL"):
+        engine_parts.append(f"{float(nhtsa['DisplacementL']):.1f}L")
+    if nhtsa.get("EngineConfiguration"):
+        engine_parts.append(nhtsa["EngineConfiguration"])
+    if nhtsa.get("EngineCylinders"):
+        engine_parts.append(f"{nhtsa['EngineCylinders']} cyl")
+    if nhtsa.get("FuelTypePrimary"):
+        engine_parts.append(nhtsa["FuelTypePrimary"])
+
+    transmission_parts = [
+        f"{nhtsa['TransmissionSpeeds']}-speed" if nhtsa.get("TransmissionSpeeds") else None,
+        nhtsa.get("TransmissionStyle") or None,
+    ]
+
+    # Make and year can still be read off the VIN when NHTSA has nothing
+    decoded = decode_identification(vin) if not (nhtsa.get("Make") and nhtsa.get("ModelYear")) else {}
+
+    return {
+        "vin": vin,
+        "make": nhtsa.get("Make") or decoded.get("make") or "Unknown",
+        "model": nhtsa.get("Model") or "Unknown",
+        "year": _to_int(nhtsa.get("ModelYear")) or decoded.get("model_year"),
+        "engine": " ".join(engine_parts) or "Unknown",
+        "transmission": " ".join(p for p in transmission_parts if p) or "Unknown",
+    }
+
+
+def build_accident_history(carfax: Dict[str, Any]) -> Dict[str, Any]:
+    accidents = [
+        {
+            "date": accident.get("date"),
+            "severity": str(accident.get("severity") or "minor").lower(),
+            "description": accident.get("description", ""),
+        }
+        for accident in carfax.get("accident_history", [])
+    ]
+    severity = "none"
+    for accident in accidents:
+        if accident["severity"] in SEVERITY_ORDER and (
+            SEVERITY_ORDER.index(accident["severity"]) > SEVERITY_ORDER.index(severity)
+        ):
+            severity = accident["severity"]
+
+    descriptions = " ".join(a["description"].lower() for a in accidents)
+    return {
+        "total_accidents": len(accidents),
+        "severity": severity,
+        "structural_damage": "structural" in descriptions or "frame" in descriptions,
+        "flood_damage": "flood" in descriptions or "flood" in str(carfax.get("title_status", "")).lower(),
+        "accidents": accidents,
+    }
+
+
+def build_ownership_history(carfax: Dict[str, Any], today: date) -> Dict[str, Any]:
+    owners = []
+    for owner in carfax.get("ownership_history", []):
+        start = _parse_date(owner.get("from"))
+        end = _parse_date(owner.get("to")) or today
+        owners.append({
+            "duration": _months_between(start, end) if start else None,
+            "location": owner.get("location") or owner.get("state") or "Unknown",
+        })
+
+    durations = [o["duration"] for o in owners if o["duration"] is not None]
+    return {
+        "total_owners": len(owners),
+        "average_ownership_duration_months": round(sum(durations) / len(durations)) if durations else 0,
+        "commercial_use": bool(carfax.get("commercial_use", False)),
+        "rental_history": bool(carfax.get("rental_history", False)),
+        "owners": owners,
+    }
+
+
+def title_status_value(raw_status: str) -> str:
+    """
+    The report status for a provider's title brand. Never "clean" unless the
+    provider said so: brands not recognised here are "branded".
+    """
+    brand = raw_status.strip().lower()
+    for status, wordings in TITLE_BRANDS:
+        if any(wording in brand for wording in wordings):
+            return status
+    return "branded"
+
+
+def build_title_status(carfax: Dict[str, Any]) -> Dict[str, Any]:
+    raw_status = str(carfax.get("title_status") or "").strip()
+    issues = list(carfax.get("title_issues", []))
+    if not raw_status:
+        status = "unknown"
+        issues.append("Title status not reported")
+    else:
+        status = title_status_value(raw_status)
+        if status == "branded":
+            issues.append(f"Unrecognised title brand: {raw_status}")
+        elif status != "clean" and not issues:
+            issues.append(f"{raw_status.capitalize()} title")
+    return {
+        "status": status,
+        "issues": issues,
+        "state_issued": carfax.get("title_state") or "Unknown",
+    }
+
+
+def build_recalls(clearwin: Dict[str, Any]) -> Dict[str, Any]:
+    recalls = [
+        {
+            "number": recall.get("number") or recall.get("campaign_number"),
+            "date": recall.get("recall_date") or recall.get("date"),
+            "component": recall.get("component", "Unknown"),
+            "description": recall.get("description", ""),
+            "status": recall.get("status", "open"),
+        }
+        for recall in clearwin.get("recall_information", [])
+    ]
+    return {
+        "total_recalls": len(recalls),
+        "open_recalls": sum(1 for r in recalls if r["status"] != "completed"),
+        # Manufacturer recalls registered with NHTSA are safety recalls by definition
+        "safety_recalls": len(recalls),
+        "recall_list": recalls,
+    }
+
+
+def build_maintenance(clearwin: Dict[str, Any]) -> Dict[str, Any]:
+    services = sorted(
+        clearwin.get("service_history", []),
+        key=lambda s: _parse_date(s.get("date")) or date.min,
+    )
+    service_dates = [d for d in (_parse_date(s.get("date")) for s in services) if d]
+    regular = len(service_dates) > 1 and all(
+        _months_between(a, b) <= MAX_SERVICE_GAP_MONTHS
+        for a, b in zip(service_dates, service_dates[1:])
+    )
+
+    last_service = None
+    if services:
+        last = services[-1]
+        last_service = {
+            "date": last.get("date"),
+            "mileage": _to_int(last.get("mileage")),
+            "type": last.get("service", "Unknown"),
+        }
+
+    return {
+        "regular_maintenance": regular,
+        "total_services": len(services),
+        "overdue_services": [],
+        "last_service": last_service,
+    }
+
+
+def build_insurance_claims(clearwin: Dict[str, Any]) -> Dict[str, Any]:
+    claims = [
+        {
+            "date": report.get("date"),
+            "type": report.get("type", "damage"),
+            "amount": report.get("cost"),
+            "description": report.get("description", ""),
+        }
+        for report in clearwin.get("damage_reports", [])
+    ]
+    total = sum(c["amount"] or 0 for c in claims)
+    if total >= 5000:
+        severity = "high"
+    elif total >= 1000:
+        severity = "medium"
+    else:
+        severity = "low"
+    return {
+        "total_claims": len(claims),
+        "claims_severity": severity,
+        "claims": claims,
+    }
+
+
+def build_structured_sections(aggregated_data: AggregatedData, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Fill every report section that comes straight from provider payloads.
+    """
+    today = today or date.today()
+    carfax = provider_payload(aggregated_data, "Carfax")
+    clearwin = provider_payload(aggregated_data, "ClearWin")
+    nhtsa = provider_payload(aggregated_data, "NHTSA")
+
+    return {
+        "vehicle_identification": build_vehicle_identification(aggregated_data.vin, nhtsa),
+        "accident_history": build_accident_history(carfax),
+        "ownership_history": build_ownership_history(carfax, today),
+        "title_status": build_title_status(carfax),
+        "recalls": build_recalls(clearwin),
+        "maintenance": build_maintenance(clearwin),
+        "insurance_claims": build_insurance_claims(clearwin),
+    }
+
+
+def is_clean_history(sections: Dict[str, Any]) -> bool:
+    """No accidents, damage, branded title or insurance claims in the structured sections."""
+    accidents = sections["accident_history"]
+    return (
+        accidents["total_accidents"] == 0
+        and not accidents["structural_damage"]
+        and not accidents["flood_damage"]
+        and sections["title_status"]["status"] == "clean"
+        and not sections["title_status"]["issues"]
+        and sections["insurance_claims"]["total_claims"] == 0
+    )
+
+
+def narrative_context(aggregated_data: AggregatedData) -> Dict[str, Any]:
+    """
+    Provider facts that are not part of a structured section but matter for
+    the assessment (mileage trend, market value, AutoCheck score).
+    """
+    carfax = provider_payload(aggregated_data, "Carfax")
+    clearwin = provider_payload(aggregated_data, "ClearWin")
+    autocheck = provider_payload(aggregated_data, "AutoCheck")
+    context: Dict[str, Any] = {}
+    if carfax.get("odometer_readings"):
+        context["odometer_readings"] = carfax["odometer_readings"]
+    if clearwin.get("market_value"):
+        context["market_value"] = clearwin["market_value"]
+    if autocheck.get("autocheck_score") is not None:
+        context["autocheck_score"] = autocheck["autocheck_score"]
+        if autocheck.get("score_range"):
+            context["autocheck_score_range"] = autocheck["score_range"]
+    return context
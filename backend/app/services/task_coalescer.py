@@ -0,0 +1,128 @@
+import logging
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from settings import settings
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "report-inflight"
+
+# Only the lease holder may extend or release it; a worker that outlived its
+# lease must not touch a newer owner's key. KEYS[2] holds the ids of users
+# whose requests attached to the task, so each gets the report in their history.
+_EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('expire', KEYS[2], ARGV[2])
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    local users = redis.call('smembers', KEYS[2])
+    redis.call('del', KEYS[1], KEYS[2])
+    return users
+end
+return {}
+"""
+# Returns the in-flight task id, recording the user (ARGV[1], may be empty)
+# in the same step so a release cannot slip in between
+_ATTACH_SCRIPT = """
+local task_id = redis.call('get', KEYS[1])
+if task_id and ARGV[1] ~= '' then
+    redis.call('sadd', KEYS[2], ARGV[1])
+    redis.call('expire', KEYS[2], redis.call('ttl', KEYS[1]))
+end
+return task_id
+"""
+
+
+def _lease_key(vin: str) -> str:
+    return f"{KEY_PREFIX}:{vin.upper()}"
+
+
+def _users_key(vin: str) -> str:
+    return f"{KEY_PREFIX}:{vin.upper()}:users"
+
+
+def enqueue_coalesced(
+    vin: str,
+    enqueue: Callable[[str], None],
+    user_id: Optional[int] = None,
+    force_refresh: bool = False,
+) -> Tuple[str, bool]:
+    """
+    Enqueue a report task for a VIN unless one is already queued or running.
+
+    A lease `report-inflight:<VIN>` holding the task id is taken with SET NX and
+    expires after `report_inflight_lease` seconds, so a crashed worker cannot
+    block the VIN forever. A signed-in user attaching to a running task is
+    recorded on the lease and handed back by `release_lease`. Forced refreshes
+    never attach, since the running task may serve a cached report.
+
+    Args:
+        vin: The VIN to generate a report for
+        enqueue: Callback that enqueues the task under the given task id
+        user_id: The requesting user, if signed in
+        force_refresh: Whether the request bypasses the report cache
+
+    Returns:
+        (task_id, created): the id clients should follow and whether a new task was enqueued
+    """
+    task_id = str(uuid.uuid4())
+    if force_refresh:
+        enqueue(task_id)
+        return task_id, True
+
+    key = _lease_key(vin)
+    try:
+        redis = get_redis()
+        attach = redis.register_script(_ATTACH_SCRIPT)
+        for _ in range(3):
+            if redis.set(key, task_id, nx=True, ex=settings.report_inflight_lease):
+                break
+            existing = attach(keys=[key, _users_key(vin)], args=["" if user_id is None else user_id])
+            if existing is not None:
+                logger.info(f"Attaching request for VIN {vin} to in-flight task {existing.decode()}")
+                return existing.decode(), False
+            # The lease expired between SET and GET; try again
+        else:
+            logger.warning(f"Could not acquire in-flight lease for VIN {vin}, enqueueing without coalescing")
+    except Exception as e:
+        logger.warning(f"In-flight lease unavailable for VIN {vin}, enqueueing without coalescing: {e}")
+        enqueue(task_id)
+        return task_id, True
+
+    try:
+        enqueue(task_id)
+    except Exception:
+        release_lease(vin, task_id)
+        raise
+    return task_id, True
+
+
+def extend_lease(vin: str, task_id: str) -> bool:
+    """Renew the lease while the task is running. Returns False if it is no longer held."""
+    try:
+        script = get_redis().register_script(_EXTEND_SCRIPT)
+        return bool(script(keys=[_lease_key(vin), _users_key(vin)], args=[task_id, settings.report_inflight_lease]))
+    except Exception as e:
+        logger.warning(f"Failed to extend in-flight lease for VIN {vin}: {e}")
+        return False
+
+
+def release_lease(vin: str, task_id: str) -> List[int]:
+    """
+    Release the lease so the next request for this VIN starts a new task.
+
+    Returns:
+        Ids of the users whose requests attached to the task while it held the lease
+    """
+    try:
+        script = get_redis().register_script(_RELEASE_SCRIPT)
+        return [int(user_id) for user_id in script(keys=[_lease_key(vin), _users_key(vin)], args=[task_id])]
+    except Exception as e:
+        logger.warning(f"Failed to release in-flight lease for VIN {vin}: {e}")
+        return []
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from enums import ReportStage
+from settings import settings
+from services.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "report-events"
+
+# Event types
+STATUS = "status"
+SECTION = "section"
+DONE = "done"
+FAILED = "failed"
+TERMINAL_EVENTS = (DONE, FAILED)
+
+# Seconds without events after which subscribers get a keep-alive and re-read
+# the event log, in case a pub/sub message was lost (e.g. Redis reconnect)
+IDLE_INTERVAL = 5.0
+
+# (seq, event, data), or None on an idle tick
+TaskEvent = Optional[Tuple[int, str, Dict[str, Any]]]
+
+
+def _events_key(task_id: str) -> str:
+    return f"{KEY_PREFIX}:{task_id}"
+
+
+def publish_event(task_id: str, event: str, data: Dict[str, Any]):
+    """
+    Append an event to the task's event log and notify live subscribers.
+
+    The log (a Redis list) lets clients that connect late replay what they
+    missed; pub/sub delivers new events without polling. Failures are logged
+    and ignored so streaming never breaks report generation.
+    """
+    key = _events_key(task_id)
+    try:
+        redis = get_redis()
+        seq = redis.rpush(key, json.dumps({"event": event, "data": data}))
+        pipe = redis.pipeline()
+        pipe.expire(key, settings.report_events_ttl)
+        pipe.publish(key, json.dumps({"seq": seq, "event": event, "data": data}))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to publish '{event}' event for task {task_id}: {e}")
+
+
+def publish_section(task_id: str, name: str, content: Any):
+    publish_event(task_id, SECTION, {"name": name, "content": content})
+
+
+def publish_status(task_id: str, stage: ReportStage):
+    publish_event(task_id, STATUS, {"stage": stage.value})
+
+
+class TaskEventHub:
+    """
+    Fans task events out to every client connected to this process over a
+    single Redis pattern subscription, instead of one pub/sub connection
+    per client.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(task_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[task_id]
+
+    def _dispatch(self, message: Dict[str, Any]):
+        channel = message["channel"].decode()
+        queues = self._subscribers.get(channel[len(KEY_PREFIX) + 1:])
+        if not queues:
+            return
+        payload = json.loads(message["data"])
+        for queue in queues:
+            queue.put_nowait(payload)
+
+    async def _run(self):
+        while self._subscribers:
+            pubsub = get_async_redis().pubsub()
+            try:
+                await pubsub.psubscribe(f"{KEY_PREFIX}:*")
+                while self._subscribers:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._dispatch(message)
+            except Exception as e:
+                # Subscribers catch up from the event log on their next idle tick
+                logger.warning(f"Task event subscription failed, reconnecting: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TaskEventHub]" = weakref.WeakKeyDictionary()
+
+
+def get_event_hub() -> TaskEventHub:
+    """Return the hub for the running event loop."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = TaskEventHub()
+    return hub
+
+
+def _format_sse(seq: int, event: str, data: Dict[str, Any]) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def iter_task_events(task_id: str) -> AsyncIterator[TaskEvent]:
+    """
+    Yield the task's events until it finishes or `report_stream_timeout` elapses.
+
+    Subscribes before replaying the log so no event falls into the gap between
+    the two; duplicates are dropped by sequence number. When pub/sub skips a
+    sequence number or stays quiet for IDLE_INTERVAL, the log is read again
+    from the last event seen.
+    """
+    key = _events_key(task_id)
+    redis = get_async_redis()
+    hub = get_event_hub()
+    queue = hub.subscribe(task_id)
+    deadline = time.monotonic() + settings.report_stream_timeout
+    last_seq = 0
+
+    try:
+        while time.monotonic() < deadline:
+            for raw in await redis.lrange(key, last_seq, -1):
+                last_seq += 1
+                message = json.loads(raw)
+                yield last_seq, message["event"], message["data"]
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+
+            while time.monotonic() < deadline:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), IDLE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield None
+                    break
+                if payload["seq"] <= last_seq:
+                    continue
+                if payload["seq"] > last_seq + 1:
+                    break
+                last_seq = payload["seq"]
+                yield last_seq, payload["event"], payload["data"]
+                if payload["event"] in TERMINAL_EVENTS:
+                    return
+    finally:
+        hub.unsubscribe(task_id, queue)
+
+
+async def stream_task_events(task_id: str) -> AsyncIterator[str]:
+    """Yield the task's events formatted as Server-Sent Events."""
+    async for item in iter_task_events(task_id):
+        if item is None:
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+        else:
+            yield _format_sse(*item)
@@ -1,5 +1,15 @@
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models import User
+from settings import settings
+from services.local_cache import LocalLRUCache
+
+# email -> id and profile fields, so /me and /refresh need not query users each time
+_profile_cache = LocalLRUCache(settings.user_profile_cache_size)
 
 # Create a new user
 def create_user(db: Session, email: str, password: str, name: str, phone: str):
@@ -7,8 +17,44 @@ def create_user(db: Session, email: str, password: str, name: str, phone: str):
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user_profile(email)
     return user
 
 # Get a user by email
 def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
\ No newline at end of file
+    return db.query(User).filter(User.email == email).first()
+
+# Create a new user (async session)
+async def create_user_async(db: AsyncSession, email: str, password: str, name: str, phone: str):
+    user = User(email=email, password=password, name=name, phone=phone)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user_profile(email)
+    return user
+
+# Get a user by email (async session)
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+# Id and public profile fields of a user, as embedded in access tokens
+def user_profile(user: User) -> Dict[str, Any]:
+    return {"id": user.id, "email": user.email, "name": user.name, "phone": user.phone}
+
+# Get a user's profile through the profile cache; None if the user does not exist
+async def get_user_profile(db: AsyncSession, email: str) -> Optional[Dict[str, Any]]:
+    profile = _profile_cache.get(email)
+    if profile is not None:
+        return profile
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return None
+    profile = user_profile(user)
+    _profile_cache.set(email, profile, time.time() + settings.user_profile_cache_ttl)
+    return profile
+
+# Drop a cached profile; call whenever a user row is created, changed or deleted.
+# Only this process's cache is cleared; others catch up within user_profile_cache_ttl.
+def invalidate_user_profile(email: str):
+    _profile_cache.delete(email)
@@ -1,8 +1,193 @@
+from operator import add
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import VinCheck
+from resources.wmi_codes import COUNTRY_RANGES, RANGE_ALPHABET, REGIONS, WMI_MANUFACTURERS
+from settings import settings
+
+VIN_LENGTH = 17
+
+# Letters I, O and Q are never used (too easily read as 1 and 0)
+ALLOWED_CHARACTERS = frozenset("ABCDEFGHJKLMNPRSTUVWXYZ0123456789")
+
+TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+POSITION_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+CHECK_DIGIT_POSITION = 8  # 0-based; the 9th character
+# Weighted sum modulo 11 -> check digit (remainder 10 is written as X)
+CHECK_DIGITS = "0123456789X"
+
+# Position 10 model-year codes, repeating every 30 years from 1980
+MODEL_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+MODEL_YEAR_CYCLE = len(MODEL_YEAR_CODES)
+
+# Check-digit policies: "strict" checks every VIN, "regional" only VINs from
+# regions where the check digit is mandatory, "off" never checks
+CHECK_DIGIT_STRICT = "strict"
+CHECK_DIGIT_REGIONAL = "regional"
+CHECK_DIGIT_OFF = "off"
+# North America and China require a valid check digit
+CHECK_DIGIT_REQUIRED_PREFIXES = ("1", "2", "3", "4", "5", "7", "L")
+
+# Per-position value tables: weight * transliteration, precomputed so the batch
+# path is one dict lookup per character
+_POSITION_VALUES: Tuple[Dict[str, int], ...] = tuple(
+    {char: value * weight for char, value in TRANSLITERATION.items()}
+    for weight in POSITION_WEIGHTS
+)
+
+
+def _build_country_table() -> Dict[str, str]:
+    table = {}
+    for first, start, end, country in COUNTRY_RANGES:
+        start_index, end_index = RANGE_ALPHABET.index(start), RANGE_ALPHABET.index(end)
+        for second in RANGE_ALPHABET[start_index:end_index + 1]:
+            table.setdefault(first + second, country)
+    return table
+
+
+_COUNTRIES = _build_country_table()
+
+
+def normalize_vin(vin: str) -> str:
+    return vin.strip().upper() if isinstance(vin, str) else vin
+
+
+def compute_check_digit(vin: str) -> str:
+    """Return the expected position-9 check digit ("0"-"9" or "X") for a VIN with valid characters."""
+    return CHECK_DIGITS[sum(values[char] for values, char in zip(_POSITION_VALUES, vin)) % 11]
+
+
+def requires_check_digit(vin: str) -> bool:
+    policy = settings.vin_check_digit_policy
+    if policy == CHECK_DIGIT_STRICT:
+        return True
+    if policy == CHECK_DIGIT_OFF:
+        return False
+    return vin.startswith(CHECK_DIGIT_REQUIRED_PREFIXES)
+
+
+def decode_model_year(vin: str) -> Optional[int]:
+    """
+    Decode the model year from position 10.
+
+    The code repeats every 30 years. For North American light vehicles a
+    letter in position 7 means 2010 or later and a digit means before 2010.
+    Elsewhere nothing in the VIN tells the cycles apart, so None is returned
+    and the year is left to the providers.
+    """
+    index = MODEL_YEAR_CODES.find(vin[9])
+    if index < 0 or vin[0] not in "12345":
+        return None
+    return 1980 + index + (MODEL_YEAR_CYCLE if vin[6].isalpha() else 0)
+
+
+def decode_wmi(vin: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    Returns:
+        (manufacturer, country, region); each None if unknown
+    """
+    return (
+        WMI_MANUFACTURERS.get(vin[:3]),
+        _COUNTRIES.get(vin[:2]),
+        REGIONS.get(vin[:1]),
+    )
+
+
+def decode_identification(vin: str) -> Dict[str, Any]:
+    """
+    Identification fields decoded from the VIN alone, used when NHTSA has no
+    data. Unknown fields are left out.
+    """
+    vin = normalize_vin(vin)
+    if not isinstance(vin, str) or len(vin) != VIN_LENGTH:
+        return {}
+    manufacturer, country, _ = decode_wmi(vin)
+    decoded = {"make": manufacturer, "country": country, "model_year": decode_model_year(vin)}
+    return {key: value for key, value in decoded.items() if value is not None}
+
+
+def _find_errors(vin: str) -> Tuple[List[str], Optional[bool]]:
+    if not isinstance(vin, str) or len(vin) != VIN_LENGTH:
+        return ["VIN must be 17 characters long"], None
+
+    invalid = sorted(set(vin) - ALLOWED_CHARACTERS)
+    if invalid:
+        return [f"VIN contains invalid characters: {', '.join(invalid)}"], None
+
+    errors = []
+    check_digit_valid = compute_check_digit(vin) == vin[CHECK_DIGIT_POSITION]
+    if requires_check_digit(vin):
+        if not check_digit_valid:
+            errors.append("VIN check digit (position 9) does not match")
+        if vin[9] not in MODEL_YEAR_CODES:
+            errors.append(f"Invalid model year code '{vin[9]}' (position 10)")
+    return errors, check_digit_valid
+
+
+def check_vin(vin: str) -> VinCheck:
+    """
+    Validate a VIN according to ISO 3779 and decode what the VIN itself tells:
+    manufacturer and country from the WMI, and the model year.
+    """
+    vin = normalize_vin(vin)
+    errors, check_digit_valid = _find_errors(vin)
+    if check_digit_valid is None:
+        return VinCheck(vin=str(vin), valid=False, errors=errors)
+
+    manufacturer, country, region = decode_wmi(vin)
+    return VinCheck(
+        vin=vin,
+        valid=not errors,
+        errors=errors,
+        wmi=vin[:3],
+        manufacturer=manufacturer,
+        country=country,
+        region=region,
+        model_year=decode_model_year(vin),
+        check_digit_valid=check_digit_valid,
+    )
+
+
 def validate_vin(vin: str) -> bool:
     """
     Validates a Vehicle Identification Number (VIN) according to ISO 3779.
     """
+    return not _find_errors(normalize_vin(vin))[0]
 
-    if not isinstance(vin, str) or len(vin) != 17:
-        return False
-    return True
+
+def _check_digits(vins: List[str]) -> List[str]:
+    """
+    Expected check digits for many well-formed VINs, computed a column at a
+    time (one C-level map per position) instead of VIN by VIN.
+    """
+    sums = [0] * len(vins)
+    for values, column in zip(_POSITION_VALUES, zip(*vins)):
+        sums = list(map(add, sums, map(values.__getitem__, column)))
+    return [CHECK_DIGITS[total % 11] for total in sums]
+
+
+def validate_vins(vins: List[str]) -> List[bool]:
+    """
+    Validate many VINs at once (bulk uploads). Same rules as validate_vin,
+    without building a VinCheck per VIN.
+    """
+    vins = [normalize_vin(vin) for vin in vins]
+    results = [
+        isinstance(vin, str) and len(vin) == VIN_LENGTH and ALLOWED_CHARACTERS.issuperset(vin)
+        for vin in vins
+    ]
+    to_check = [i for i, ok in enumerate(results) if ok and requires_check_digit(vins[i])]
+    if to_check:
+        checked = [vins[i] for i in to_check]
+        for i, vin, expected in zip(to_check, checked, _check_digits(checked)):
+            results[i] = vin[CHECK_DIGIT_POSITION] == expected and vin[9] in MODEL_YEAR_CODES
+    return results
+
+
+def check_vins(vins: List[str]) -> List[VinCheck]:
+    return [check_vin(vin) for vin in vins]
@@ -1,6 +1,6 @@
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -24,26 +24,192 @@ class Settings(BaseSettings):
     carfax_api_key: Optional[str] = Field(default=None, env="CARFAX_API_KEY")
     clearwin_api_key: Optional[str] = Field(default=None, env="CLEARWIN_API_KEY")
     nhtsa_api_key: Optional[str] = Field(default=None, env="NHTSA_API_KEY")
+    autocheck_api_key: Optional[str] = Field(default=None, env="AUTOCHECK_API_KEY")
+
+    # Provider endpoints
+    carfax_api_url: str = Field(default="https://api.carfax.com/v1", env="CARFAX_API_URL")
+    clearwin_api_url: str = Field(default="https://api.clearwin.com/v1", env="CLEARWIN_API_URL")
+    nhtsa_api_url: str = Field(default="https://vpic.nhtsa.dot.gov/api/vehicles", env="NHTSA_API_URL")
+    autocheck_api_url: str = Field(default="https://api.autocheck.com/v1", env="AUTOCHECK_API_URL")
+
+    # Providers queried for each report, loaded from providers/<name in lower case>.py.
+    # Overrides replace a provider's declared timeout, concurrency, cache_ttl or
+    # cost_weight, e.g. {"Carfax": {"concurrency": 5}}
+    providers_enabled: List[str] = Field(default=["Carfax", "ClearWin", "NHTSA"], env="PROVIDERS_ENABLED")
+    provider_overrides: Dict[str, Dict[str, Any]] = Field(default={}, env="PROVIDER_OVERRIDES")
+
+    # Provider HTTP pool settings
+    provider_connect_timeout: float = Field(default=3.0, env="PROVIDER_CONNECT_TIMEOUT")
+    provider_read_timeout: float = Field(default=10.0, env="PROVIDER_READ_TIMEOUT")
+    provider_max_per_host: int = Field(default=20, env="PROVIDER_MAX_PER_HOST")
+    provider_keepalive_expiry: float = Field(default=30.0, env="PROVIDER_KEEPALIVE_EXPIRY")
+
+    # Provider circuit breakers (shared across workers through Redis; seconds)
+    provider_breaker_enabled: bool = Field(default=True, env="PROVIDER_BREAKER_ENABLED")
+    provider_breaker_failure_threshold: int = Field(default=5, env="PROVIDER_BREAKER_FAILURE_THRESHOLD")
+    provider_breaker_failure_window: int = Field(default=60, env="PROVIDER_BREAKER_FAILURE_WINDOW")
+    provider_breaker_cooldown: int = Field(default=30, env="PROVIDER_BREAKER_COOLDOWN")
+
+    # Adaptive provider timeouts: p95 of recent latencies times the multiplier,
+    # clamped between the minimum and the provider's timeout (provider_read_timeout unless declared)
+    provider_latency_window: int = Field(default=200, env="PROVIDER_LATENCY_WINDOW")
+    provider_latency_min_samples: int = Field(default=20, env="PROVIDER_LATENCY_MIN_SAMPLES")
+    provider_timeout_p95_multiplier: float = Field(default=2.0, env="PROVIDER_TIMEOUT_P95_MULTIPLIER")
+    provider_timeout_min: float = Field(default=1.0, env="PROVIDER_TIMEOUT_MIN")
+
+    # Report generation continues with whatever providers answered by then (seconds)
+    aggregation_deadline: float = Field(default=12.0, env="AGGREGATION_DEADLINE")
+
+    # NHTSA batch decoding (window in seconds)
+    nhtsa_batch_enabled: bool = Field(default=True, env="NHTSA_BATCH_ENABLED")
+    nhtsa_batch_window: float = Field(default=0.02, env="NHTSA_BATCH_WINDOW")
+    nhtsa_batch_max_size: int = Field(default=50, env="NHTSA_BATCH_MAX_SIZE")
+
+    # Provider response cache (TTLs in seconds, 0 disables caching for that provider).
+    # Each provider declares its own TTL; PROVIDER_CACHE_TTLS overrides it
+    provider_cache_enabled: bool = Field(default=True, env="PROVIDER_CACHE_ENABLED")
+    provider_cache_ttls: Dict[str, int] = Field(default={}, env="PROVIDER_CACHE_TTLS")
+    provider_cache_default_ttl: int = Field(default=3600, env="PROVIDER_CACHE_DEFAULT_TTL")
+    provider_cache_negative_ttl: int = Field(default=60, env="PROVIDER_CACHE_NEGATIVE_TTL")
+    provider_cache_local_size: int = Field(default=1024, env="PROVIDER_CACHE_LOCAL_SIZE")
 
     # AI Model settings
     ai_model: str = Field(default="deepseek-chat", env="AI_MODEL")
     ai_base_url: str = Field(default="https://api.deepseek.com", env="AI_BASE_URL")
     ai_max_tokens: int = Field(default=2000, env="AI_MAX_TOKENS")
     ai_mock_response: bool = Field(default=False, env="AI_MOCK_RESPONSE")
+    ai_stream: bool = Field(default=True, env="AI_STREAM")
+    # Ask for response_format json_object; turned off automatically if the backend rejects it
+    ai_json_mode: bool = Field(default=True, env="AI_JSON_MODE")
+    ai_narrative_max_tokens: int = Field(default=500, env="AI_NARRATIVE_MAX_TOKENS")
+    # Follow-up requests for report sections that came back missing, cut off or invalid
+    ai_section_retries: int = Field(default=1, env="AI_SECTION_RETRIES")
+    ai_prompt_token_budget: int = Field(default=1500, env="AI_PROMPT_TOKEN_BUDGET")
+    # Client-side limits shared by all workers through Redis. Calls wait for
+    # capacity (up to ai_rate_limit_max_wait seconds) instead of failing.
+    ai_rate_limit_enabled: bool = Field(default=True, env="AI_RATE_LIMIT_ENABLED")
+    ai_requests_per_minute: int = Field(default=60, env="AI_REQUESTS_PER_MINUTE")
+    ai_tokens_per_minute: int = Field(default=100000, env="AI_TOKENS_PER_MINUTE")
+    ai_rate_limit_max_wait: float = Field(default=120.0, env="AI_RATE_LIMIT_MAX_WAIT")
+    # Retries on 429, 5xx and connection errors, with jittered exponential backoff (seconds)
+    ai_max_retries: int = Field(default=4, env="AI_MAX_RETRIES")
+    ai_retry_base_delay: float = Field(default=1.0, env="AI_RETRY_BASE_DELAY")
+    ai_retry_max_delay: float = Field(default=30.0, env="AI_RETRY_MAX_DELAY")
+
+    # Model routing (services/llm_router.py). AI_BACKENDS is a JSON list of
+    # {"name", "base_url", "model", "api_key", "tier": "fast"|"strong",
+    #  "input_cost_per_mtok", "cached_input_cost_per_mtok", "output_cost_per_mtok"};
+    # empty means the single AI_BASE_URL/AI_MODEL backend.
+    ai_backends: List[Dict[str, Any]] = Field(default=[], env="AI_BACKENDS")
+    # Send clean-history reports to "fast" backends and the rest to "strong" ones
+    ai_routing_enabled: bool = Field(default=True, env="AI_ROUTING_ENABLED")
+    # Hedge a request on the next backend if the first has not started answering
+    # within its recent p95 time to first token (clamped to min/max; seconds).
+    # AI_HEDGE_DELAY sets a fixed delay instead.
+    ai_hedge_enabled: bool = Field(default=True, env="AI_HEDGE_ENABLED")
+    ai_hedge_delay: float = Field(default=0.0, env="AI_HEDGE_DELAY")
+    ai_hedge_min_delay: float = Field(default=1.0, env="AI_HEDGE_MIN_DELAY")
+    ai_hedge_max_delay: float = Field(default=10.0, env="AI_HEDGE_MAX_DELAY")
+    # Seconds a backend that failed is tried only after the others
+    ai_backend_cooldown: float = Field(default=30.0, env="AI_BACKEND_COOLDOWN")
+    # Seconds of median latency that one cent of average request cost is worth when ranking backends
+    ai_router_cost_weight: float = Field(default=1.0, env="AI_ROUTER_COST_WEIGHT")
+
+    # Report mode: "llm" (model writes the whole report) or "hybrid" (structured
+    # sections built from provider data, model writes only the assessment)
+    report_mode: str = Field(default="llm", env="REPORT_MODE")
+
+    # Report cache (max age in seconds)
+    report_cache_enabled: bool = Field(default=True, env="REPORT_CACHE_ENABLED")
+    report_cache_max_age: int = Field(default=7 * 24 * 3600, env="REPORT_CACHE_MAX_AGE")
+    report_cache_max_entries: int = Field(default=50000, env="REPORT_CACHE_MAX_ENTRIES")
+
+    # In-flight report deduplication (lease in seconds)
+    report_inflight_lease: int = Field(default=600, env="REPORT_INFLIGHT_LEASE")
+
+    # Streaming of report sections to clients (seconds)
+    report_events_ttl: int = Field(default=3600, env="REPORT_EVENTS_TTL")
+    report_stream_timeout: int = Field(default=300, env="REPORT_STREAM_TIMEOUT")
+    # Retry-After hint (seconds) for clients polling unfinished tasks
+    report_poll_interval: int = Field(default=2, env="REPORT_POLL_INTERVAL")
+
+    # Batch reports
+    report_batch_max_vins: int = Field(default=1000, env="REPORT_BATCH_MAX_VINS")
+    report_batch_concurrency: int = Field(default=8, env="REPORT_BATCH_CONCURRENCY")
+    report_batch_ttl: int = Field(default=7 * 24 * 3600, env="REPORT_BATCH_TTL")
+
+    # VIN validation. Check digit policy: "strict" (every VIN), "regional"
+    # (North America and China, where it is mandatory) or "off"
+    vin_check_digit_policy: str = Field(default="regional", env="VIN_CHECK_DIGIT_POLICY")
+    vin_validate_max_vins: int = Field(default=10000, env="VIN_VALIDATE_MAX_VINS")
 
     # Logging
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    # Share of routine per-report log events that are written (errors always are)
+    log_sample_rate: float = Field(default=0.1, env="LOG_SAMPLE_RATE")
+
+    # Prometheus: the API serves /metrics, each Celery worker its own exporter
+    metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    worker_metrics_port: int = Field(default=9808, env="WORKER_METRICS_PORT")
 
     # Database settings
     database_url: str = Field(default="sqlite:///./windetective.db", env="DATABASE_URL")
+    # Async driver URL; derived from database_url (aiosqlite / asyncpg) when unset
+    async_database_url: Optional[str] = Field(default=None, env="ASYNC_DATABASE_URL")
+    database_pool_size: int = Field(default=10, env="DATABASE_POOL_SIZE")
+    database_max_overflow: int = Field(default=20, env="DATABASE_MAX_OVERFLOW")
+    database_pool_timeout: float = Field(default=30.0, env="DATABASE_POOL_TIMEOUT")
+    database_pool_recycle: int = Field(default=1800, env="DATABASE_POOL_RECYCLE")
+    # Create missing tables when the API starts, so `uvicorn main:app` works out of
+    # the box. Deployments run `python bootstrap.py` once and turn this off
+    database_create_schema: bool = Field(default=True, env="DATABASE_CREATE_SCHEMA")
 
     # Celery settings
     celery_broker_url: str = Field(default="redis://localhost:6379/0", env="CELERY_BROKER_URL")
     celery_result_backend: str = Field(default="redis://localhost:6379/0", env="CELERY_RESULT_BACKEND")
+    # Single reports go to the interactive queue, batch work to the bulk queue;
+    # run separate workers per queue so bulk uploads never delay single reports
+    celery_interactive_queue: str = Field(default="reports.interactive", env="CELERY_INTERACTIVE_QUEUE")
+    celery_bulk_queue: str = Field(default="reports.bulk", env="CELERY_BULK_QUEUE")
+    # Staged report pipeline: provider I/O, prompt building and persisting run
+    # on the I/O queue (high-concurrency thread pool), the LLM call on the LLM
+    # queue (pool sized to the API rate limit)
+    report_pipeline_enabled: bool = Field(default=True, env="REPORT_PIPELINE_ENABLED")
+    celery_io_queue: str = Field(default="reports.io", env="CELERY_IO_QUEUE")
+    celery_llm_queue: str = Field(default="reports.llm", env="CELERY_LLM_QUEUE")
+    # How long intermediate stage payloads are kept in Redis (seconds)
+    report_pipeline_ttl: int = Field(default=3600, env="REPORT_PIPELINE_TTL")
+    # Queue wait samples kept per queue for /queues/stats
+    queue_wait_samples: int = Field(default=500, env="QUEUE_WAIT_SAMPLES")
+
+    # Per-user (or per-client IP) token buckets on enqueue. Interactive tokens
+    # are reports, bulk tokens are batch VINs; rates are per second.
+    rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
+    rate_limit_interactive_rate: float = Field(default=0.2, env="RATE_LIMIT_INTERACTIVE_RATE")
+    rate_limit_interactive_burst: int = Field(default=20, env="RATE_LIMIT_INTERACTIVE_BURST")
+    rate_limit_bulk_rate: float = Field(default=1.0, env="RATE_LIMIT_BULK_RATE")
+    rate_limit_bulk_burst: int = Field(default=5000, env="RATE_LIMIT_BULK_BURST")
+
+    # Redis for caches and coordination (defaults to the Celery broker)
+    redis_url: Optional[str] = Field(default=None, env="REDIS_URL")
+    redis_socket_timeout: float = Field(default=2.0, env="REDIS_SOCKET_TIMEOUT")
 
     # JWT
     jwt_secret_key : str = Field(default="your_secret_key", env="JWT_SECRET_KEY")
     access_token_expire_minutes : int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    # Verified access token -> claims cache (entries never outlive the token)
+    jwt_claims_cache_size: int = Field(default=10000, env="JWT_CLAIMS_CACHE_SIZE")
+    jwt_claims_cache_ttl: int = Field(default=300, env="JWT_CLAIMS_CACHE_TTL")
+    # Also embed the user's name in access tokens. Tokens are signed, not
+    # encrypted, so sensitive fields such as the phone number are never included
+    jwt_profile_claims: bool = Field(default=False, env="JWT_PROFILE_CLAIMS")
+
+    # User profile cache (per process; seconds)
+    user_profile_cache_size: int = Field(default=10000, env="USER_PROFILE_CACHE_SIZE")
+    user_profile_cache_ttl: int = Field(default=60, env="USER_PROFILE_CACHE_TTL")
+
+    # Threads dedicated to argon2 password hashing, apart from the request threadpool
+    password_hash_workers: int = Field(default=4, env="PASSWORD_HASH_WORKERS")
 
     # Cookie settings
     cookie_secure: bool = Field(default=False, env="COOKIE_SECURE")  # Set to True in production with HTTPS
@@ -1,11 +1,20 @@
+import time
+
 from celery import Celery
+from celery.signals import before_task_publish
+from kombu import Queue
+
 from settings import settings
 
+# Message header stamped when a task is published, read when it starts
+ENQUEUED_AT_HEADER = "enqueued_at"
+
 celeryapp = Celery(
     "windetective",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
-    include=["workers.tasks"]
+    # workers.signals holds the worker-side signal handlers
+    include=["workers.tasks", "workers.pipeline", "workers.signals"]
 )
 
 celeryapp.conf.update(
@@ -14,4 +23,38 @@ celeryapp.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-)
\ No newline at end of file
+    # Single reports someone is waiting on vs. batch work that drains in the
+    # background. Single reports run as a staged pipeline over the I/O and LLM
+    # queues (or on the interactive queue when the pipeline is disabled).
+    # Start workers per queue, e.g.
+    #   celery -A workers.celeryapp worker -Q reports.interactive,reports.io -P threads -c 32
+    #   celery -A workers.celeryapp worker -Q reports.llm -c 4
+    #   celery -A workers.celeryapp worker -Q reports.bulk
+    task_queues=(
+        Queue(settings.celery_interactive_queue),
+        Queue(settings.celery_bulk_queue),
+        Queue(settings.celery_io_queue),
+        Queue(settings.celery_llm_queue),
+    ),
+    task_default_queue=settings.celery_interactive_queue,
+    task_routes={
+        "workers.tasks.generate_car_report_task": {"queue": settings.celery_interactive_queue},
+        "workers.tasks.generate_batch_item_task": {"queue": settings.celery_bulk_queue},
+        "workers.tasks.prefetch_nhtsa_task": {"queue": settings.celery_bulk_queue},
+        "workers.tasks.finish_batch_task": {"queue": settings.celery_bulk_queue},
+        # Staged pipeline for single reports (workers/pipeline.py)
+        "workers.pipeline.aggregate_stage_task": {"queue": settings.celery_io_queue},
+        "workers.pipeline.prompt_stage_task": {"queue": settings.celery_io_queue},
+        "workers.pipeline.generate_stage_task": {"queue": settings.celery_llm_queue},
+        "workers.pipeline.persist_stage_task": {"queue": settings.celery_io_queue},
+    },
+    # Reports take seconds each; a worker reserving several would hold them
+    # back from idle workers
+    worker_prefetch_multiplier=1,
+)
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
@@ -0,0 +1,147 @@
+"""
+The API's side of the workers: enqueue tasks and read their results.
+
+Tasks are addressed by name, so importing this module loads Celery but none
+of the task code (report generation, providers, the OpenAI client). Where the
+task modules are loaded (workers, eager runs) the same signatures resolve to
+the registered tasks.
+"""
+import logging
+import time
+from typing import Optional
+
+from celery import chain, chord
+from celery.result import AsyncResult
+
+from workers.celeryapp import celeryapp
+from settings import settings
+from models import ReportTaskResult, ReportResponse
+from enums import TaskStatus
+from exceptions import CeleryTaskNotFound
+from services.report_store import get_report
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+REPORT_TASK = "workers.tasks.generate_car_report_task"
+BATCH_ITEM_TASK = "workers.tasks.generate_batch_item_task"
+PREFETCH_NHTSA_TASK = "workers.tasks.prefetch_nhtsa_task"
+FINISH_BATCH_TASK = "workers.tasks.finish_batch_task"
+PIPELINE_STAGES = (
+    "workers.pipeline.aggregate_stage_task",
+    "workers.pipeline.prompt_stage_task",
+    "workers.pipeline.generate_stage_task",
+    "workers.pipeline.persist_stage_task",
+)
+
+
+def enqueue_report(task_id: str, vin: str, force_refresh: bool = False, user_id: Optional[int] = None):
+    """Enqueue a single report as one task on the interactive queue."""
+    celeryapp.signature(REPORT_TASK, args=[vin, force_refresh, user_id]).apply_async(task_id=task_id)
+
+
+def start_report_pipeline(task_id: str, vin: str, force_refresh: bool = False, user_id: Optional[int] = None):
+    """
+    Enqueue the staged pipeline (workers/pipeline.py) for one report. The last
+    stage runs under `task_id`, so /result and the events stream follow it
+    like a single task.
+    """
+    context = {
+        "task_id": task_id,
+        "vin": vin,
+        "force_refresh": force_refresh,
+        "user_id": user_id,
+        "published": [],
+        "enqueued_at": time.time(),
+    }
+    first, *rest = PIPELINE_STAGES
+    chain(
+        celeryapp.signature(first, args=[context]),
+        *(celeryapp.signature(name) for name in rest),
+    ).apply_async(task_id=task_id)
+
+
+def dispatch_batch(batch_id: str, vins: list, force_refresh: bool = False, user_id: Optional[int] = None):
+    """
+    Fan a batch out as a chord of `report_batch_concurrency` lanes. Each lane is a
+    chain that runs its VINs one after another, which bounds how many reports a
+    single batch can have in flight at once. NHTSA data for the whole batch is
+    bulk-decoded into the provider cache first. Reports go to `user_id`'s history.
+    """
+    lanes = min(settings.report_batch_concurrency, len(vins))
+    header = [
+        chain(*(
+            celeryapp.signature(BATCH_ITEM_TASK, args=[batch_id, vin, force_refresh, user_id], immutable=True)
+            for vin in vins[lane::lanes]
+        ))
+        for lane in range(lanes)
+    ]
+    workflow = chord(header, celeryapp.signature(FINISH_BATCH_TASK, args=[batch_id], immutable=True))
+    if settings.nhtsa_batch_enabled:
+        workflow = chain(celeryapp.signature(PREFETCH_NHTSA_TASK, args=[vins], immutable=True), workflow)
+    workflow.apply_async()
+
+
+def get_celery_task_result(task_id: str):
+    """
+    Retrieve the result of a Celery task by its ID.
+
+    Args:
+        task_id: The ID of the Celery task
+
+    Returns:
+        ReportTaskResult: The task result
+    """
+    result = AsyncResult(task_id, app=celeryapp)
+    logger.debug(f"Task {task_id} state: {result.state}")
+
+    # Check if the task exists in the backend
+    # Note: Newly created tasks will be in PENDING state with no info
+    # This is normal and should not be treated as "not found"
+    # Only raise CeleryTaskNotFound if the task result is None or invalid
+    if result.result is None and not result.state:
+        # This indicates a truly invalid task ID
+        raise CeleryTaskNotFound(f"Task ID '{task_id}' not found")
+
+    if result.state == "PENDING":
+        return ReportTaskResult(
+            message=f"Task '{task_id}' is pending in the queue",
+            status=TaskStatus.PENDING
+        )
+
+    elif result.state == "SUCCESS":
+        raw_result = result.get()
+        if "report_id" in raw_result:
+            # The report itself lives in the reports table
+            report = load_stored_report(raw_result["report_id"])
+            if report is None:
+                raise CeleryTaskNotFound(f"Report for task '{task_id}' no longer exists")
+        else:
+            # Error reports (and results from before the reports table) are stored whole
+            report = ReportResponse.model_validate(raw_result)
+        return ReportTaskResult(
+            message=f"Task '{task_id}' completed successfully",
+            status=TaskStatus.COMPLETED,
+            result=report
+        )
+
+    elif result.state == "FAILURE":
+        exc_info = result.result if result.result else "No info"
+        return ReportTaskResult(
+            message=f"Task '{task_id}' failed: {exc_info}",
+            status=TaskStatus.FAILED
+        )
+
+    else:
+        return ReportTaskResult(
+            message=f"Task '{task_id}' is in progress (state: {result.state})",
+            status=TaskStatus.IN_PROGRESS
+        )
+
+def load_stored_report(report_id: int) -> Optional[ReportResponse]:
+    db = SessionLocal()
+    try:
+        row = get_report(db, report_id)
+        return ReportResponse.model_validate_json(row.report) if row else None
+    finally:
+        db.close()
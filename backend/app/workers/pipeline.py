@@ -0,0 +1,131 @@
+"""
+Single reports as a chain of stages, each on the queue that suits it:
+
+    aggregate (validate VIN, call providers)  -> I/O queue
+    prompt    (build the LLM request)         -> I/O queue
+    generate  (LLM call)                      -> LLM queue
+    persist   (assemble, store, announce)     -> I/O queue
+
+Stages hand each other a small context dict; provider data, prompts and
+LLM output stay in Redis (services/pipeline_store) and only their keys go
+through the broker. A cached or mock report found in the first stage is
+carried through the remaining stages untouched.
+
+The API enqueues the chain by task name (workers/dispatch.start_report_pipeline).
+"""
+import json
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from workers.celeryapp import celeryapp
+from workers.tasks import finish_report, observe_report_time
+from enums import ReportStage
+from models import AggregatedData, ReportPrompt, ReportResponse
+from resources.mocks import generate_mock_report
+from services.data_aggregator import aggregate_car_data
+from services.pipeline_store import discard, load, stash
+from services.report_generator import assemble_report, build_report_prompt, complete_report_data, find_cached_report
+from services.task_coalescer import extend_lease, release_lease
+from services.task_events import FAILED, publish_event, publish_section, publish_status
+from services.vin_validator import check_vin
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+PAYLOADS = ("aggregated", "prompt", "report_data", "report")
+
+PipelineContext = Dict[str, Any]
+
+
+@contextmanager
+def _stage(context: PipelineContext):
+    """On failure, tell subscribers, free the VIN and drop stored payloads."""
+    try:
+        yield
+    except Exception as e:
+        logger.error(f"Report pipeline for task {context['task_id']} failed: {e}")
+        publish_event(context["task_id"], FAILED, {"message": str(e)})
+        observe_report_time("pipeline", "failed", context.get("enqueued_at"))
+        release_lease(context["vin"], context["task_id"])
+        discard(*(context.get(name) for name in PAYLOADS))
+        raise
+
+
+@celeryapp.task
+def aggregate_stage_task(context: PipelineContext) -> PipelineContext:
+    task_id, vin = context["task_id"], context["vin"]
+    with _stage(context):
+        # Renew the in-flight lease taken at enqueue time; the queue wait counted against it
+        extend_lease(vin, task_id)
+        check = check_vin(vin)
+        if not check.valid:
+            raise ValueError(f"Invalid VIN {vin}: {'; '.join(check.errors)}")
+
+        if settings.ai_mock_response:
+            context["report"] = stash(task_id, "report", generate_mock_report(vin).model_dump_json())
+            return context
+
+        publish_status(task_id, ReportStage.AGGREGATING)
+        aggregated_data = aggregate_car_data(vin)
+        fingerprint, cached_report = find_cached_report(vin, aggregated_data, context["force_refresh"])
+        context["fingerprint"] = fingerprint
+        if cached_report is not None:
+            context["report"] = stash(task_id, "report", cached_report.model_dump_json())
+        else:
+            context["aggregated"] = stash(task_id, "aggregated", aggregated_data.model_dump_json())
+    return context
+
+
+@celeryapp.task
+def prompt_stage_task(context: PipelineContext) -> PipelineContext:
+    if "report" in context:
+        return context
+    task_id, vin = context["task_id"], context["vin"]
+    with _stage(context):
+        aggregated_data = AggregatedData.model_validate_json(load(context["aggregated"]))
+        report_prompt = build_report_prompt(vin, aggregated_data)
+        # Sections filled from provider data can be streamed before the LLM runs
+        for name, content in report_prompt.sections.items():
+            publish_section(task_id, name, content)
+            context["published"].append(name)
+        context["prompt"] = stash(task_id, "prompt", report_prompt.model_dump_json())
+    return context
+
+
+@celeryapp.task
+def generate_stage_task(context: PipelineContext) -> PipelineContext:
+    if "report" in context:
+        return context
+    task_id, vin = context["task_id"], context["vin"]
+    with _stage(context):
+        extend_lease(vin, task_id)
+        publish_status(task_id, ReportStage.GENERATING)
+
+        def on_section(name, content):
+            context["published"].append(name)
+            publish_section(task_id, name, content)
+
+        report_prompt = ReportPrompt.model_validate_json(load(context["prompt"]))
+        report_data = complete_report_data(report_prompt, on_section)
+        context["report_data"] = stash(task_id, "report_data", json.dumps(report_data))
+    return context
+
+
+@celeryapp.task
+def persist_stage_task(context: PipelineContext):
+    task_id, vin = context["task_id"], context["vin"]
+    with _stage(context):
+        if "report" in context:
+            report = ReportResponse.model_validate_json(load(context["report"]))
+        else:
+            aggregated_data = AggregatedData.model_validate_json(load(context["aggregated"]))
+            report_data = json.loads(load(context["report_data"]))
+            report = assemble_report(vin, aggregated_data, context["fingerprint"], report_data)
+        attached_user_ids = release_lease(vin, task_id)
+        result = finish_report(
+            task_id, report, set(context["published"]), context["user_id"],
+            path="pipeline", enqueued_at=context.get("enqueued_at"), attached_user_ids=attached_user_ids,
+        )
+    discard(*(context.get(name) for name in PAYLOADS))
+    return result
@@ -0,0 +1,44 @@
+"""
+Worker-side Celery signal handlers: queue wait metrics, the metrics exporter
+and shutting down the provider pool.
+
+Loaded through the Celery app's `include`, so only workers import it (and
+the metrics and provider code it needs); the API only publishes tasks.
+"""
+from celery.signals import task_prerun, worker_process_shutdown, worker_ready, worker_shutdown
+
+from workers.celeryapp import ENQUEUED_AT_HEADER
+from providers.http_client import shutdown_provider_loop
+from services.queue_metrics import record_queue_wait
+from services.metrics import mark_process_dead, start_worker_exporter
+from settings import settings
+
+
+@task_prerun.connect
+def record_task_queue_wait(task=None, **kwargs):
+    enqueued_at = task.request.get(ENQUEUED_AT_HEADER)
+    delivery_info = task.request.delivery_info or {}
+    queue = delivery_info.get("routing_key")
+    # Eager (in-process) runs never sat in a queue
+    if enqueued_at is not None and queue and not task.request.is_eager:
+        record_queue_wait(queue, float(enqueued_at))
+
+
+@worker_ready.connect
+def start_metrics_exporter(**kwargs):
+    # One exporter per worker; pool processes report through PROMETHEUS_MULTIPROC_DIR
+    if settings.metrics_enabled:
+        start_worker_exporter(settings.worker_metrics_port)
+
+
+@worker_process_shutdown.connect
+def forget_pool_process_metrics(pid=None, **kwargs):
+    if pid is not None:
+        mark_process_dead(pid)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def close_provider_pool(**kwargs):
+    # Pool processes (prefork) and the worker itself (threads/solo pools) each own a provider loop
+    shutdown_provider_loop()
@@ -1,75 +1,175 @@
-from celery.result import AsyncResult
-from workers.celeryapp import celeryapp
+from workers.celeryapp import ENQUEUED_AT_HEADER, celeryapp
 from services.report_generator import generate_report
+from services.data_aggregator import prefetch_nhtsa
 from resources.mocks import generate_mock_report
 from settings import settings
-from models import ReportTaskResult, ReportResponse
+from models import ReportResponse
 from enums import TaskStatus
-from exceptions import CeleryTaskNotFound
+from services.task_coalescer import extend_lease, release_lease
+from services.task_events import publish_section, publish_event, publish_status, DONE, FAILED
+from services.batch_service import update_batch_item, mark_batch_finished
+from services.report_store import save_report
+from services.event_log import log_event
+from services import metrics
+from database import SessionLocal
+from typing import Optional, Sequence
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
-def get_celery_task_result(task_id: str):
+def persist_report(report: ReportResponse, task_id: Optional[str] = None, user_id: Optional[int] = None) -> Optional[int]:
     """
-    Retrieve the result of a Celery task by its ID.
-     
-    Args:
-        task_id: The ID of the Celery task
-           
-    Returns:
-        ReportTaskResult: The task result
+    Write a finished report to the reports table. Returns the row id, or None
+    if the database write failed (the caller then keeps the report in the
+    result backend instead).
     """
-    logger.info(f"Checking status for task ID: {task_id}")
-    result = AsyncResult(task_id, app=celeryapp)
-    logger.info(f"Task state: {result.state}, result: {result.result}")
-
-    # Check if the task exists in the backend
-    # Note: Newly created tasks will be in PENDING state with no info
-    # This is normal and should not be treated as "not found"
-    # Only raise CeleryTaskNotFound if the task result is None or invalid
-    if result.result is None and not result.state:
-        # This indicates a truly invalid task ID
-        raise CeleryTaskNotFound(f"Task ID '{task_id}' not found")
-
-    if result.state == "PENDING":
-        return ReportTaskResult(
-            message=f"Task '{task_id}' is pending in the queue",
-            status=TaskStatus.PENDING
-        )
-
-    elif result.state == "SUCCESS":
-        # Get the raw result dict and reconstruct the Pydantic model
-        raw_result = result.get()
-        report = ReportResponse.model_validate(raw_result)
-        return ReportTaskResult(
-            message=f"Task '{task_id}' completed successfully",
-            status=TaskStatus.COMPLETED,
-            result=report
-        )
-      
-    elif result.state == "FAILURE":
-        exc_info = result.result if result.result else "No info"
-        return ReportTaskResult(
-            message=f"Task '{task_id}' failed: {exc_info}",
-            status=TaskStatus.FAILED
-        )
-      
+    db = SessionLocal()
+    try:
+        return save_report(db, report, task_id=task_id, user_id=user_id).id
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to store report for VIN {report.vin}: {e}")
+        return None
+    finally:
+        db.close()
+
+
+@celeryapp.task(bind=True)
+def generate_car_report_task(self, vin: str, force_refresh: bool = False, user_id: Optional[int] = None):
+    task_id = self.request.id
+    enqueued_at = self.request.get(ENQUEUED_AT_HEADER)
+    published_sections = set()
+
+    def on_section(name, content):
+        published_sections.add(name)
+        publish_section(task_id, name, content)
+
+    # Renew the in-flight lease taken at enqueue time; the queue wait counted against it
+    extend_lease(vin, task_id)
+    try:
+        if settings.ai_mock_response:
+            report = generate_mock_report(vin)
+        else:
+            report = generate_report(
+                vin,
+                force_refresh=force_refresh,
+                on_section=on_section,
+                on_stage=lambda stage: publish_status(task_id, stage)
+            )
+    except Exception as e:
+        publish_event(task_id, FAILED, {"message": str(e)})
+        observe_report_time("task", "failed", enqueued_at)
+        raise
+    finally:
+        attached_user_ids = release_lease(vin, task_id)
+
+    return finish_report(
+        task_id, report, published_sections, user_id, path="task", enqueued_at=enqueued_at,
+        attached_user_ids=attached_user_ids,
+    )
+
+
+def observe_report_time(path: str, outcome: str, enqueued_at: Optional[float]):
+    """Record the end-to-end time of a report, from enqueue until it finished."""
+    if enqueued_at is not None:
+        metrics.REPORT_SECONDS.labels(path=path, outcome=outcome).observe(max(0.0, time.time() - float(enqueued_at)))
+
+
+def finish_report(
+    task_id: str,
+    report: ReportResponse,
+    published_sections: set,
+    user_id: Optional[int] = None,
+    path: str = "task",
+    enqueued_at: Optional[float] = None,
+    attached_user_ids: Sequence[int] = (),
+):
+    """
+    Stream any sections not sent yet, store the report and announce the
+    outcome. Users whose requests attached to this task (see
+    services.task_coalescer) get their own copy in their history.
+    Returns the task result.
+    """
+    if "error" in report.report_data:
+        publish_event(task_id, FAILED, {"message": report.report_data["error"]})
+        observe_report_time(path, "error", enqueued_at)
+        log_event(logger, "report_failed", logging.WARNING, task_id=task_id, vin=report.vin,
+                  error=report.report_data["error"])
+        return report.model_dump(mode="json")
+
+    # Cached and mock reports arrive whole; stream whatever was not sent yet
+    for name, content in report.report_data.items():
+        if name not in published_sections:
+            publish_section(task_id, name, content)
+
+    report_id = persist_report(report, task_id=task_id, user_id=user_id)
+    for attached_user_id in set(attached_user_ids) - {user_id}:
+        persist_report(report, user_id=attached_user_id)
+    publish_event(task_id, DONE, {"confidence_score": report.confidence_score, "report_id": report_id})
+
+    observe_report_time(path, "success", enqueued_at)
+    log_event(
+        logger, "report_finished",
+        task_id=task_id,
+        vin=report.vin,
+        report_id=report_id,
+        confidence_score=report.confidence_score,
+        providers_used=report.providers_used,
+        providers_skipped=report.providers_skipped,
+        sections=list(report.report_data),
+    )
+
+    # Only a reference goes to the result backend once the report is in the database
+    if report_id is not None:
+        return {"report_id": report_id}
+    return report.model_dump(mode="json")
+
+
+@celeryapp.task(bind=True)
+def generate_batch_item_task(self, batch_id: str, vin: str, force_refresh: bool = False, user_id: Optional[int] = None):
+    """
+    Generate one report of a batch and store it in `user_id`'s history. Never
+    raises, so one bad VIN cannot stop the rest of its lane or fail the batch.
+    """
+    enqueued_at = self.request.get(ENQUEUED_AT_HEADER)
+    update_batch_item(batch_id, vin, TaskStatus.IN_PROGRESS)
+    try:
+        if settings.ai_mock_response:
+            report = generate_mock_report(vin)
+        else:
+            report = generate_report(vin, force_refresh=force_refresh)
+    except Exception as e:
+        logger.error(f"Batch {batch_id}: report for VIN {vin} failed: {e}")
+        update_batch_item(batch_id, vin, TaskStatus.FAILED, message=str(e))
+        observe_report_time("batch", "failed", enqueued_at)
+        return
+
+    if "error" in report.report_data:
+        observe_report_time("batch", "error", enqueued_at)
+        update_batch_item(batch_id, vin, TaskStatus.FAILED, message=report.report_data["error"])
     else:
-        return ReportTaskResult(
-            message=f"Task '{task_id}' is in progress (state: {result.state})",
-            status=TaskStatus.IN_PROGRESS
-        )
+        report_id = persist_report(report, user_id=user_id)
+        # Only a reference goes to Redis once the report is in the database
+        if report_id is not None:
+            update_batch_item(batch_id, vin, TaskStatus.COMPLETED, report_id=report_id)
+        else:
+            update_batch_item(batch_id, vin, TaskStatus.COMPLETED, result=report.model_dump(mode="json"))
+        observe_report_time("batch", "success", enqueued_at)
+
 
 @celeryapp.task
-def generate_car_report_task(vin: str):
-    if settings.ai_mock_response:
-        report = generate_mock_report(vin)
-    else:
-        report = generate_report(vin)
-        
-    logger.info(f"Report content: {report}")
-    
-    # Serialize the Pydantic model to a JSON-compatible dict
-    return report.model_dump(mode="json")
\ No newline at end of file
+def prefetch_nhtsa_task(vins: list):
+    """Warm the NHTSA cache for a batch with bulk decodes; failures are not fatal."""
+    try:
+        decoded = prefetch_nhtsa(vins)
+        logger.info(f"Prefetched NHTSA data for {decoded}/{len(vins)} VINs")
+    except Exception as e:
+        logger.warning(f"NHTSA prefetch failed: {e}")
+
+
+@celeryapp.task
+def finish_batch_task(batch_id: str):
+    mark_batch_finished(batch_id)
+    logger.info(f"Batch {batch_id} finished")
@@ -0,0 +1,183 @@
+"""
+Compare provider aggregation throughput: legacy thread-pool + requests.get path
+versus the asyncio path backed by the shared keep-alive pool.
+
+Starts a local stub HTTP server that answers the Carfax, ClearWin and NHTSA
+endpoints with a fixed delay, then runs the same number of reports through
+both paths with a number of concurrent "workers".
+
+With --tls the stubs serve HTTPS using a throwaway self-signed certificate
+(requires the openssl CLI), which is where connection reuse pays off most.
+
+Usage (from backend/):
+    python benchmarks/bench_aggregator.py --reports 300 --workers 8 --delay-ms 20 --tls
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+VIN = "1HGBH41JXMN109186"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        if "decodevinvaluesextended" in self.path:
+            body = {"Count": 1, "Results": [{"VIN": VIN, "Make": "HONDA", "Model": "Accord", "ModelYear": "2021"}]}
+        else:
+            body = {"vin": VIN, "title_status": "Clean"}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+# One loopback address per provider so the per-host limit applies as it would upstream
+STUB_HOSTS = {"carfax": "127.0.0.1", "clearwin": "127.0.0.2", "nhtsa": "127.0.0.3"}
+
+
+def make_certificate(directory: str):
+    """Create a self-signed certificate valid for the stub addresses."""
+    cert, key = os.path.join(directory, "stub.pem"), os.path.join(directory, "stub.key")
+    san = ",".join(f"IP:{host}" for host in STUB_HOSTS.values())
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=stub", "-addext", f"subjectAltName={san}", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _serve(delay: float, certificate, url_queue):
+    StubHandler.delay = delay
+    ThreadingHTTPServer.request_queue_size = 256
+    context = None
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+    urls = {}
+    for name, host in STUB_HOSTS.items():
+        server = ThreadingHTTPServer((host, 0), StubHandler)
+        server.daemon_threads = True
+        if context:
+            server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        scheme = "https" if context else "http"
+        urls[name] = f"{scheme}://{host}:{server.server_address[1]}"
+    url_queue.put(urls)
+    threading.Event().wait()
+
+
+def start_stub_server(delay: float, certificate=None):
+    """Run the stubs in their own process so they do not share the client's GIL."""
+    url_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(delay, certificate, url_queue), daemon=True)
+    process.start()
+    return process, url_queue.get(timeout=10)
+
+
+def configure_env(urls: dict, max_per_host: int):
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    os.environ["CARFAX_API_KEY"] = "benchmark"
+    os.environ["CLEARWIN_API_KEY"] = "benchmark"
+    os.environ["CARFAX_API_URL"] = urls["carfax"]
+    os.environ["CLEARWIN_API_URL"] = urls["clearwin"]
+    os.environ["NHTSA_API_URL"] = urls["nhtsa"]
+    os.environ["PROVIDER_MAX_PER_HOST"] = str(max_per_host)
+    # Measure the per-VIN fetch path itself, not the response cache, NHTSA batching or breakers
+    os.environ["PROVIDER_CACHE_ENABLED"] = "false"
+    os.environ["NHTSA_BATCH_ENABLED"] = "false"
+    os.environ["PROVIDER_BREAKER_ENABLED"] = "false"
+
+
+def legacy_aggregate(vin: str, urls: dict):
+    """The pre-async path: a fresh ThreadPoolExecutor and a new connection per call."""
+    import requests
+
+    urls = [
+        (f"{urls['carfax']}/vehicle/history", {"vin": vin}),
+        (f"{urls['clearwin']}/vehicle/report", {"vin": vin}),
+        (f"{urls['nhtsa']}/decodevinvaluesextended/{vin}", {"format": "json"}),
+    ]
+
+    def fetch(url, params):
+        response = requests.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    with ThreadPoolExecutor() as executor:
+        futures = [executor.submit(fetch, url, params) for url, params in urls]
+        return [future.result() for future in as_completed(futures)]
+
+
+def run(label: str, func, reports: int, workers: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(func) for _ in range(reports)]):
+            future.result()
+    elapsed = time.perf_counter() - started
+    rate = reports / elapsed
+    print(f"{label:<10} {reports} reports in {elapsed:6.2f}s -> {rate:8.1f} reports/sec")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent report tasks")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Stub server latency per request")
+    parser.add_argument("--max-per-host", type=int, default=20, help="PROVIDER_MAX_PER_HOST for the asyncio path")
+    parser.add_argument("--tls", action="store_true", help="Serve the stubs over HTTPS")
+    args = parser.parse_args()
+
+    certificate = None
+    if args.tls:
+        certificate = make_certificate(tempfile.mkdtemp())
+        # Picked up by both requests and httpx
+        os.environ["REQUESTS_CA_BUNDLE"] = certificate[0]
+        os.environ["SSL_CERT_FILE"] = certificate[0]
+
+    server, urls = start_stub_server(args.delay_ms / 1000, certificate)
+    configure_env(urls, args.max_per_host)
+
+    import logging
+    logging.disable(logging.WARNING)
+    from services.data_aggregator import aggregate_car_data
+    from providers.http_client import shutdown_provider_loop
+
+    # Warm both paths once so imports and the pool are not measured
+    legacy_aggregate(VIN, urls)
+    aggregate_car_data(VIN)
+
+    legacy = run("thread-pool", lambda: legacy_aggregate(VIN, urls), args.reports, args.workers)
+    pooled = run("asyncio", lambda: aggregate_car_data(VIN), args.reports, args.workers)
+    print(f"speedup    {pooled / legacy:.2f}x")
+
+    shutdown_provider_loop()
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
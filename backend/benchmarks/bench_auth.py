@@ -0,0 +1,122 @@
+"""
+Micro-benchmark of the auth fast path.
+
+1. The get_current_user dependency: verifying the JWT on every call versus
+   the verified-claims cache, with requests spread over a number of distinct
+   tokens (one per active client).
+2. GET /api/v1/users/me in-process (ASGI, no network): a token without
+   profile claims, with the profile cache cleared before every request
+   (database lookup) and warm, versus a token carrying profile claims.
+
+Usage (from backend/):
+    python benchmarks/bench_auth.py --calls 20000 --tokens 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+
+def make_tokens(count: int):
+    from auth import create_access_token
+    return [
+        create_access_token({"sub": f"user{i}@example.com", "uid": i + 1, "name": f"User {i}", "phone": "0"})
+        for i in range(count)
+    ]
+
+
+async def bench_dependency(calls: int, tokens):
+    from auth import decode_access_token, get_current_user
+
+    started = time.perf_counter()
+    for i in range(calls):
+        decode_access_token(tokens[i % len(tokens)])
+    uncached = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(calls):
+        await get_current_user(tokens[i % len(tokens)])
+    cached = time.perf_counter() - started
+    return uncached, cached
+
+
+async def bench_me(calls: int, claims_token: str, plain_token: str):
+    import httpx
+    from main import app
+    from database import async_engine
+    from services import user_service
+
+    variants = (
+        ("database lookup", plain_token, True),
+        ("profile cache", plain_token, False),
+        ("profile claims", claims_token, False),
+    )
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, token, clear_profiles in variants:
+            headers = {"Authorization": f"Bearer {token}"}
+            (await client.get("/api/v1/users/me", headers=headers)).raise_for_status()
+            started = time.perf_counter()
+            for _ in range(calls):
+                if clear_profiles:
+                    user_service._profile_cache.clear()
+                await client.get("/api/v1/users/me", headers=headers)
+            results[label] = time.perf_counter() - started
+    await async_engine.dispose()
+    return results
+
+
+def seed_user(email: str):
+    from database import SessionLocal, engine
+    from models import Base
+    from services.user_service import create_user
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        return create_user(db, email=email, password="not-used", name="Bench", phone="0")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000, help="Dependency calls per variant")
+    parser.add_argument("--tokens", type=int, default=500, help="Distinct tokens in rotation")
+    parser.add_argument("--me-calls", type=int, default=2000, help="/me requests per variant")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-auth-")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    tokens = make_tokens(args.tokens)
+    uncached, cached = asyncio.run(bench_dependency(args.calls, tokens))
+    print(f"get_current_user, {args.calls} calls over {args.tokens} tokens")
+    print(f"  verify every call  {args.calls / uncached:10.0f} calls/s  {uncached / args.calls * 1e6:7.1f} us/call")
+    print(f"  claims cache       {args.calls / cached:10.0f} calls/s  {cached / args.calls * 1e6:7.1f} us/call")
+    print(f"  speedup            {uncached / cached:.1f}x")
+
+    from auth import create_access_token
+    from services.user_service import user_profile
+    user = seed_user("bench@example.com")
+    profile = user_profile(user)
+    plain_token = create_access_token({"sub": profile["email"]})
+    claims_token = create_access_token({"sub": profile["email"], "uid": profile["id"],
+                                        "name": profile["name"], "phone": profile["phone"]})
+    results = asyncio.run(bench_me(args.me_calls, claims_token, plain_token))
+    print(f"GET /me, {args.me_calls} requests")
+    for label, elapsed in results.items():
+        print(f"  {label:<17} {args.me_calls / elapsed:10.0f} req/s    {elapsed / args.me_calls * 1e6:7.1f} us/req")
+
+
+if __name__ == "__main__":
+    main()
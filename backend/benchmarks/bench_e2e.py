@@ -0,0 +1,408 @@
+"""
+End-to-end report throughput and latency: HTTP API -> Celery -> providers ->
+LLM -> database, with every external service replaced by a local stub.
+
+Carfax, ClearWin, NHTSA and the OpenAI-compatible endpoint run in a separate
+process (so they do not share the app's GIL), each with a configurable latency
+distribution and error rate (see stubs.Latency). The FastAPI app is served by
+uvicorn in this process, and reports run either
+
+    --celery worker   on an in-process Celery worker over the memory broker, or
+    --celery eager    inline in the API request (task_always_eager), as the
+                      single report task rather than the staged pipeline.
+
+Closed-loop clients POST /generate for distinct, valid VINs and poll /result
+until the report finishes (in eager mode the POST returns once it has). The run is summarised as JSON: reports/sec,
+p50/p95/p99 end-to-end and submit latency, and a per-stage breakdown taken from
+the app's Prometheus histograms (provider fetches, aggregation, queue waits,
+LLM requests and rate-limit waits). Pass --baseline to compare against an
+earlier run; the exit status is 1 if a metric regressed beyond --tolerance.
+
+Redis features (coalescing, events, pipeline payloads) use --redis-url when it
+is reachable and fail open otherwise. Caches and rate limits are off so every
+report reaches the stubs; override any setting with --env NAME=VALUE.
+
+Usage (from backend/):
+    python benchmarks/bench_e2e.py --reports 200 --concurrency 16 --output base.json
+    python benchmarks/bench_e2e.py --reports 200 --concurrency 16 \\
+        --provider-latency lognormal:40,400 --provider-error-rate 0.02 --baseline base.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import (
+    CarfaxStubHandler,
+    ClearWinStubHandler,
+    FaultInjection,
+    Latency,
+    NHTSAStubHandler,
+    OpenAIStubHandler,
+    server_url,
+    start_server,
+)
+
+# Prometheus histograms that make up the per-stage breakdown
+STAGE_METRICS = (
+    "celery_queue_wait_seconds",
+    "provider_fetch_seconds",
+    "aggregation_seconds",
+    "llm_rate_limit_wait_seconds",
+    "llm_request_seconds",
+    "report_seconds",
+)
+# Compared against --baseline: (path in the summary, True if higher is better)
+COMPARED = (
+    (("reports_per_sec",), True),
+    (("latency_s", "p50"), False),
+    (("latency_s", "p95"), False),
+    (("latency_s", "p99"), False),
+)
+FINISHED = ("COMPLETED", "FAILED")
+
+
+def _serve_stubs(config: dict, url_queue):
+    FaultInjection.rng.seed(config["seed"])
+    for handler in (CarfaxStubHandler, ClearWinStubHandler, NHTSAStubHandler):
+        handler.latency = Latency.parse(config["provider_latency"])
+        handler.error_rate = config["provider_error_rate"]
+    OpenAIStubHandler.latency = Latency.parse(config["llm_latency"])
+    OpenAIStubHandler.error_rate = config["llm_error_rate"]
+    OpenAIStubHandler.fence_rate = config["llm_fence_rate"]
+    OpenAIStubHandler.time_to_first_token = config["llm_ttft_ms"] / 1000
+    OpenAIStubHandler.seconds_per_token = config["llm_ms_per_token"] / 1000
+    OpenAIStubHandler.seconds_per_prompt_token = config["llm_ms_per_prompt_token"] / 1000
+    handlers = {
+        "carfax": CarfaxStubHandler,
+        "clearwin": ClearWinStubHandler,
+        "nhtsa": NHTSAStubHandler,
+        "llm": OpenAIStubHandler,
+    }
+    url_queue.put({name: server_url(start_server(handler)) for name, handler in handlers.items()})
+    threading.Event().wait()
+
+
+def start_stubs(config: dict):
+    url_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_stubs, args=(config, url_queue), daemon=True)
+    process.start()
+    return process, url_queue.get(timeout=10)
+
+
+def configure_env(urls: dict, args):
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "benchmark",
+        "AI_BASE_URL": urls["llm"],
+        "CARFAX_API_KEY": "benchmark",
+        "CARFAX_API_URL": urls["carfax"],
+        "CLEARWIN_API_KEY": "benchmark",
+        "CLEARWIN_API_URL": urls["clearwin"],
+        "NHTSA_API_URL": urls["nhtsa"],
+        "AI_MOCK_RESPONSE": "false",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "REDIS_URL": args.redis_url,
+        "DATABASE_URL": args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+        "DATABASE_CREATE_SCHEMA": "true",
+        "REPORT_CACHE_ENABLED": "false",
+        "PROVIDER_CACHE_ENABLED": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "AI_RATE_LIMIT_ENABLED": "false",
+        "METRICS_ENABLED": "true",
+    })
+    if args.celery == "eager":
+        # An eager chain runs every stage under the same task id, so the stages
+        # overwrite each other's stored results; eager runs use the single task
+        os.environ["REPORT_PIPELINE_ENABLED"] = "false"
+    for override in args.env:
+        name, _, value = override.partition("=")
+        os.environ[name] = value
+
+
+def make_vins(count: int):
+    """Distinct VINs with valid check digits, so reports are neither rejected nor coalesced."""
+    from services.vin_validator import compute_check_digit
+    vins = []
+    for serial in range(count):
+        vin = f"1HGCM8260MA{serial:06d}"
+        vins.append(vin[:8] + compute_check_digit(vin) + vin[9:])
+    return vins
+
+
+def start_api(keep_alive: float):
+    """Serve the app with uvicorn on a free port in a background thread."""
+    import uvicorn
+    from main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", timeout_keep_alive=int(keep_alive)
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def eager_status(task_id: str) -> str:
+    """
+    Status of a report that ran inline in its request. Celery refuses
+    result.get(), and so /result, while any eager task runs in the process,
+    so the stored state is read directly.
+    """
+    from celery.result import AsyncResult
+    from workers.celeryapp import celeryapp
+
+    state = AsyncResult(task_id, app=celeryapp).state
+    return {"SUCCESS": "COMPLETED", "FAILURE": "FAILED"}.get(state, state)
+
+
+def run_report(client, vin: str, poll_interval: float, timeout: float, eager: bool = False) -> dict:
+    import httpx
+
+    started = time.perf_counter()
+    try:
+        response = client.post("/api/v1/reports/generate", json={"vin": vin})
+    except httpx.TransportError:
+        return {"status": "transport_error", "submit_s": time.perf_counter() - started}
+    submitted = time.perf_counter()
+    if response.status_code != 200:
+        return {"status": f"http_{response.status_code}", "submit_s": submitted - started}
+    task_id = response.json()["id"]
+    if eager:
+        return {"status": eager_status(task_id), "submit_s": submitted - started, "latency_s": submitted - started}
+    deadline = started + timeout
+    status = "TIMEOUT"
+    while time.perf_counter() < deadline:
+        try:
+            result = client.get(f"/api/v1/reports/result/{task_id}")
+        except httpx.TransportError:
+            result = None
+        if result is not None and result.status_code == 200 and result.json()["status"] in FINISHED:
+            status = result.json()["status"]
+            break
+        time.sleep(poll_interval)
+    return {"status": status, "submit_s": submitted - started, "latency_s": time.perf_counter() - started}
+
+
+def percentile(values, q: float) -> float:
+    """Linear-interpolated percentile of `values`, q in [0, 100]."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def distribution(values) -> dict:
+    if not values:
+        return {}
+    return {
+        "mean": statistics.mean(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def histogram_snapshot() -> dict:
+    """
+    Cumulative bucket counts and sums of the stage histograms, keyed by
+    metric{labels}, so two snapshots can be subtracted.
+    """
+    from prometheus_client import REGISTRY
+
+    snapshot = {}
+    for family in REGISTRY.collect():
+        if family.name not in STAGE_METRICS:
+            continue
+        for sample in family.samples:
+            labels = {k: v for k, v in sample.labels.items() if k != "le"}
+            key = family.name
+            if labels:
+                key += "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+            series = snapshot.setdefault(key, {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if sample.name.endswith("_bucket"):
+                series["buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_sum"):
+                series["sum"] = sample.value
+            elif sample.name.endswith("_count"):
+                series["count"] = sample.value
+    return snapshot
+
+
+def histogram_quantile(buckets: dict, count: float, q: float) -> float:
+    """Estimate a quantile from cumulative buckets, interpolating within a bucket like Prometheus does."""
+    target = count * q
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, cumulative in sorted(buckets.items()):
+        if cumulative >= target:
+            if bound == float("inf"):
+                return lower_bound
+            span = cumulative - lower_count
+            return lower_bound + (bound - lower_bound) * ((target - lower_count) / span if span else 1)
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    stages = {}
+    for key, series in sorted(after.items()):
+        previous = before.get(key, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        count = series["count"] - previous["count"]
+        if count <= 0:
+            continue
+        buckets = {b: c - previous["buckets"].get(b, 0.0) for b, c in series["buckets"].items()}
+        stages[key] = {
+            "count": int(count),
+            "mean": (series["sum"] - previous["sum"]) / count,
+            "p50": histogram_quantile(buckets, count, 0.50),
+            "p95": histogram_quantile(buckets, count, 0.95),
+            "p99": histogram_quantile(buckets, count, 0.99),
+        }
+    return stages
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """Returns: descriptions of metrics that regressed by more than `tolerance`"""
+    if summary["config"] != baseline.get("config"):
+        print("warning: baseline was recorded with a different configuration", file=sys.stderr)
+    regressions = []
+    for path, higher_is_better in COMPARED:
+        current, previous = summary, baseline
+        for part in path:
+            current, previous = current.get(part, {}), previous.get(part, {})
+        if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)) or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{'.'.join(path)}: {previous:.3f} -> {current:.3f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=2, help="Reports run (and not measured) first")
+    parser.add_argument("--celery", choices=("worker", "eager"), default="worker")
+    parser.add_argument("--worker-concurrency", type=int, default=32, help="Threads of the in-process worker")
+    parser.add_argument("--provider-latency", default="lognormal:40,200", help="Carfax/ClearWin/NHTSA latency")
+    parser.add_argument("--provider-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", default="fixed:0", help="Extra LLM network latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-fence-rate", type=float, default=0.0, help="Share of completions in markdown fences")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0, help="Stub LLM time to first token")
+    parser.add_argument("--llm-ms-per-token", type=float, default=2.0, help="Stub LLM output speed")
+    parser.add_argument("--llm-ms-per-prompt-token", type=float, default=0.0, help="Stub LLM prefill time per uncached prompt token")
+    parser.add_argument("--poll-ms", type=float, default=50.0, help="Result polling interval")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-report timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for stub latencies and errors")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--database-url", help="Defaults to a fresh SQLite file")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Override a setting")
+    parser.add_argument("--output", help="Write the JSON summary here as well as to stdout")
+    parser.add_argument("--baseline", help="JSON summary of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    config = {
+        "reports": args.reports,
+        "concurrency": args.concurrency,
+        "celery": args.celery,
+        "worker_concurrency": args.worker_concurrency,
+        "provider_latency": str(Latency.parse(args.provider_latency)),
+        "provider_error_rate": args.provider_error_rate,
+        "llm_latency": str(Latency.parse(args.llm_latency)),
+        "llm_error_rate": args.llm_error_rate,
+        "llm_fence_rate": args.llm_fence_rate,
+        "llm_ttft_ms": args.llm_ttft_ms,
+        "llm_ms_per_token": args.llm_ms_per_token,
+        "llm_ms_per_prompt_token": args.llm_ms_per_prompt_token,
+        "seed": args.seed,
+        "env": sorted(args.env),
+    }
+    stubs, urls = start_stubs(config)
+    configure_env(urls, args)
+
+    logging.disable(logging.CRITICAL)
+    import httpx
+    from workers.celeryapp import celeryapp
+
+    worker = None
+    if args.celery == "eager":
+        celeryapp.conf.update(task_always_eager=True, task_store_eager_result=True)
+        # The API enqueues by task name; with the task modules loaded those run inline
+        celeryapp.loader.import_default_modules()
+    else:
+        from celery.contrib.testing.worker import start_worker
+        # The memory transport polls every second by default, which would dominate queue waits
+        celeryapp.conf.broker_transport_options = {"polling_interval": 0.01}
+        worker = start_worker(
+            celeryapp, pool="threads", concurrency=args.worker_concurrency, perform_ping_check=False,
+            queues=[queue.name for queue in celeryapp.conf.task_queues],
+        )
+        worker.__enter__()
+    api, api_url = start_api(args.timeout)
+
+    vins = make_vins(args.warmup + args.reports)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with httpx.Client(base_url=api_url, limits=limits, timeout=args.timeout) as client, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        report = lambda vin: run_report(client, vin, args.poll_ms / 1000, args.timeout, args.celery == "eager")
+        list(pool.map(report, vins[:args.warmup]))
+
+        before = histogram_snapshot()
+        started = time.perf_counter()
+        results = list(pool.map(report, vins[args.warmup:]))
+        elapsed = time.perf_counter() - started
+        after = histogram_snapshot()
+
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    completed = [r["latency_s"] for r in results if r["status"] == "COMPLETED"]
+    summary = {
+        "config": config,
+        "duration_s": elapsed,
+        "reports_per_sec": len(completed) / elapsed,
+        "statuses": statuses,
+        "latency_s": distribution(completed),
+        "submit_latency_s": distribution([r["submit_s"] for r in results]),
+        "stages": stage_breakdown(before, after),
+    }
+
+    document = json.dumps(summary, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+
+    api.should_exit = True
+    if worker is not None:
+        worker.__exit__(None, None, None)
+    stubs.terminate()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
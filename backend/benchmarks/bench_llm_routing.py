@@ -0,0 +1,103 @@
+"""
+Tail latency and cost of report generation across two LLM backends, with and
+without hedging (services/llm_router.py).
+
+Two OpenAI-compatible stubs serve as a cheap "fast" tier and an expensive
+"strong" tier; both get a long-tailed network latency, so a share of requests
+stall before the first token. Each round runs the same number of clean
+(fast tier) and complex (strong tier) hybrid-mode reports and reports
+p50/p95/p99 latency, hedged requests and spend per backend.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_routing.py --reports 40 --latency lognormal:100,3000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from stubs import Latency, OpenAIStubHandler, server_url, start_server
+
+BACKENDS = (
+    # name, tier, USD per million input / output tokens
+    ("fast", "fast", 0.1, 0.4),
+    ("strong", "strong", 1.0, 4.0),
+)
+
+
+def percentile(samples, quantile):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=40, help="Reports per round, half clean and half complex")
+    parser.add_argument("--latency", default="lognormal:100,3000", help="Extra per-request latency of each stub")
+    parser.add_argument("--hedge-delay", type=float, default=0.0, help="Fixed hedge delay (0: adaptive)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    OpenAIStubHandler.time_to_first_token = 0.1
+    OpenAIStubHandler.seconds_per_token = 0.002
+    OpenAIStubHandler.latency = Latency.parse(args.latency)
+    OpenAIStubHandler.rng.seed(args.seed)
+    backends = []
+    for name, tier, input_cost, output_cost in BACKENDS:
+        server = start_server(OpenAIStubHandler)
+        backends.append({
+            "name": name, "base_url": server_url(server), "model": f"{name}-model", "tier": tier,
+            "input_cost_per_mtok": input_cost, "output_cost_per_mtok": output_cost,
+        })
+
+    os.environ["DEEPSEEK_API_KEY"] = "benchmark"
+    os.environ["AI_BACKENDS"] = json.dumps(backends)
+    os.environ["AI_RATE_LIMIT_ENABLED"] = "false"
+    os.environ["AI_HEDGE_MIN_DELAY"] = "0.2"
+    os.environ["AI_HEDGE_DELAY"] = str(args.hedge_delay)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from models import ReportPrompt
+    from resources.mocks import AI_RESPONSE_MOCK
+    from settings import settings
+    from services import report_generator
+
+    sections = {name: content for name, content in json.loads(AI_RESPONSE_MOCK).items() if name != "overall_assessment"}
+    prompts = [
+        ReportPrompt(
+            system=report_generator.NARRATIVE_SYSTEM_PROMPT,
+            prompt=f"Write the overall assessment for the used-vehicle history report of VIN {i}.",
+            max_tokens=settings.ai_narrative_max_tokens,
+            sections=sections,
+            tier="fast" if i % 2 else "strong",
+        )
+        for i in range(args.reports)
+    ]
+
+    print(f"{'hedging':<8} {'p50':>7} {'p95':>7} {'p99':>7} {'requests':>9}  spend per backend (USD)")
+    for hedging in (False, True):
+        settings.ai_hedge_enabled = hedging
+        OpenAIStubHandler.calls.clear()
+        latencies = []
+        for report_prompt in prompts:
+            started = time.perf_counter()
+            report_data = report_generator.complete_report_data(report_prompt)
+            latencies.append(time.perf_counter() - started)
+            assert "error" not in report_data, report_data
+
+        spend = {}
+        for call in OpenAIStubHandler.calls:
+            name, _, input_cost, output_cost = next(b for b in BACKENDS if f"{b[0]}-model" == call["model"])
+            usage = call["usage"]
+            cost = (usage["prompt_tokens"] * input_cost + usage["completion_tokens"] * output_cost) / 1_000_000
+            spend[name] = spend.get(name, 0.0) + cost
+        print(f"{'on' if hedging else 'off':<8} {statistics.median(latencies):6.2f}s "
+              f"{percentile(latencies, 0.95):6.2f}s {percentile(latencies, 0.99):6.2f}s "
+              f"{len(OpenAIStubHandler.calls):9}  "
+              + ", ".join(f"{name} {dollars:.4f}" for name, dollars in sorted(spend.items())))
+
+
+if __name__ == "__main__":
+    main()
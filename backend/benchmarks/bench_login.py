@@ -0,0 +1,180 @@
+"""
+Login load test: the legacy sync handler (threadpool + sync session, argon2
+on the request thread) versus the async handler (async session, argon2 on
+the dedicated password-hash executor).
+
+Each variant is served by uvicorn in its own process against a throwaway
+SQLite database. The driver fires logins at a fixed concurrency while
+probing the sync /health endpoint, which shares Starlette's threadpool with
+the legacy login, and reports p50/p99 for both.
+
+Usage (from backend/):
+    python benchmarks/bench_login.py --logins 400 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+EMAIL = "loadtest@example.com"
+PASSWORD = "Loadtest1!"
+
+
+def build_app(variant: str):
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.orm import Session
+
+    from auth import LoginRequest, verify_password
+    from database import get_db
+    from routers.user_router import router as user_router
+    from services.user_service import get_user_by_email
+
+    app = FastAPI()
+
+    @app.get("/health")
+    def health_check():
+        return {"status": "healthy"}
+
+    if variant == "legacy":
+        # The handler as it was: sync def, sync session, hashing on the request thread
+        @app.post("/api/v1/users/login")
+        def login(login_request: LoginRequest, db: Session = Depends(get_db)):
+            user = get_user_by_email(db, login_request.email)
+            if not user or not verify_password(login_request.password, user.password):
+                raise HTTPException(status_code=401, detail="Incorrect email or password")
+            return {"ok": True}
+    else:
+        app.include_router(user_router, prefix="/api/v1/users")
+
+    return app
+
+
+def serve(variant: str, port: int):
+    import logging
+    import uvicorn
+    logging.disable(logging.CRITICAL)
+    uvicorn.run(build_app(variant), host="127.0.0.1", port=port, log_level="error")
+
+
+def seed_user():
+    from auth import get_password_hash
+    from database import SessionLocal, engine
+    from models import Base
+    from services.user_service import create_user
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        create_user(db, email=EMAIL, password=get_password_hash(PASSWORD), name="Load Test", phone="0")
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def wait_until_up(client, url: str):
+    for _ in range(100):
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def drive(base_url: str, logins: int, concurrency: int):
+    import httpx
+
+    login_times, health_times = [], []
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await wait_until_up(client, "/health")
+        semaphore = asyncio.Semaphore(concurrency)
+        finished = asyncio.Event()
+
+        async def login():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/users/login", json={"email": EMAIL, "password": PASSWORD})
+                response.raise_for_status()
+                login_times.append(time.perf_counter() - started)
+
+        async def probe_health():
+            while not finished.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                health_times.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.create_task(probe_health())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        finished.set()
+        await prober
+
+    return elapsed, login_times, health_times
+
+
+def run_variant(variant: str, args) -> None:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", variant, "--port", str(port)],
+        env=os.environ.copy(),
+    )
+    try:
+        elapsed, login_times, health_times = asyncio.run(
+            drive(f"http://127.0.0.1:{port}", args.logins, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(
+        f"{variant:<8} {args.logins / elapsed:8.1f}/s "
+        f"{statistics.median(login_times) * 1000:9.0f} {percentile(login_times, 99) * 1000:9.0f} "
+        f"{statistics.median(health_times) * 1000:10.1f} {percentile(health_times, 99) * 1000:10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--serve", choices=["legacy", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench-login-")
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    seed_user()
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent, {os.cpu_count()} CPUs")
+    print(f"{'':<8} {'logins':>10} {'p50 ms':>9} {'p99 ms':>9} {'health p50':>10} {'health p99':>10}")
+    for variant in ("legacy", "async"):
+        run_variant(variant, args)
+
+
+if __name__ == "__main__":
+    main()
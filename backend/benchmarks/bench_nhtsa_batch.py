@@ -0,0 +1,63 @@
+"""
+Upstream NHTSA calls and wall time for many concurrent VIN decodes, with and
+without the batching client, against the local NHTSA stub.
+
+Usage (from backend/):
+    python benchmarks/bench_nhtsa_batch.py --vins 200 --delay-ms 150
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from stubs import NHTSAStubHandler, server_url, start_server
+
+
+def make_vins(count: int):
+    return [f"1HGBH41J{i:09d}" for i in range(count)]
+
+
+async def decode_all(vins, concurrency: int):
+    from providers.nhtsa import fetch_nhtsa_data
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def decode(vin):
+        async with semaphore:
+            return await fetch_nhtsa_data(vin)
+
+    return await asyncio.gather(*(decode(vin) for vin in vins))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent decodes in flight")
+    parser.add_argument("--delay-ms", type=float, default=150.0, help="Stub latency per request")
+    args = parser.parse_args()
+
+    NHTSAStubHandler.delay = args.delay_ms / 1000
+    nhtsa = start_server(NHTSAStubHandler)
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    os.environ["NHTSA_API_URL"] = server_url(nhtsa)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from settings import settings
+    from providers.http_client import run_in_provider_loop, shutdown_provider_loop
+
+    vins = make_vins(args.vins)
+    print(f"{'mode':<10} {'upstream calls':>15} {'wall time':>10}")
+    for enabled in (False, True):
+        settings.nhtsa_batch_enabled = enabled
+        NHTSAStubHandler.requests.update(single=0, batch=0)
+        started = time.perf_counter()
+        records = run_in_provider_loop(decode_all(vins, args.concurrency))
+        elapsed = time.perf_counter() - started
+        assert [r["VIN"] for r in records] == vins
+        calls = NHTSAStubHandler.requests["single"] + NHTSAStubHandler.requests["batch"]
+        print(f"{'batched' if enabled else 'per-VIN':<10} {calls:15} {elapsed:9.2f}s")
+    shutdown_provider_loop()
+
+
+if __name__ == "__main__":
+    main()
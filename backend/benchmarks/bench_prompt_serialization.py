@@ -0,0 +1,101 @@
+"""
+Prompt size and LLM latency before and after compact provider-data serialization.
+
+"Before" is the original prompt, which embedded the Python repr of every
+provider payload. "Compact" is the JSON from services.prompt_serializer without
+a budget; "after" rows apply the configured budget and a tight budget to
+exercise priority-ordered truncation.
+Input is the recorded fixtures in benchmarks/fixtures. Latency is measured
+against the local OpenAI-compatible stub with a per-prompt-token prefill cost.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_serialization.py --prefill-ms-per-token 0.5
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+from stubs import OpenAIStubHandler, load_fixture, server_url, start_server
+
+VIN = "1HGBH41JXMN109186"
+
+
+def fixture_data():
+    from models import AggregatedData, ProviderData
+    now = datetime.utcnow()
+    payloads = {
+        "Carfax": load_fixture("carfax_history.json"),
+        "ClearWin": load_fixture("clearwin_report.json"),
+        "NHTSA": load_fixture("nhtsa_decodevinvaluesextended.json")["Results"][0],
+    }
+    return AggregatedData(
+        vin=VIN,
+        aggregated_at=now,
+        providers=[
+            ProviderData(provider_name=name, data=data, retrieved_at=now, status="success")
+            for name, data in payloads.items()
+        ],
+    )
+
+
+def legacy_summary(aggregated_data) -> str:
+    return "\n".join(f"{p.provider_name}: {p.data}" for p in aggregated_data.providers)
+
+
+def time_completion(client, model: str, prompt: str) -> float:
+    started = time.perf_counter()
+    client.chat.completions.create(
+        model=model, messages=[{"role": "user", "content": prompt}], max_tokens=2000, stream=False
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--tight-budget", type=int, default=400)
+    args = parser.parse_args()
+
+    OpenAIStubHandler.time_to_first_token = 0.1
+    OpenAIStubHandler.seconds_per_prompt_token = args.prefill_ms_per_token / 1000
+    OpenAIStubHandler.seconds_per_token = 0.0
+    llm = start_server(OpenAIStubHandler)
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from openai import OpenAI
+    from settings import settings
+    from services.prompt_serializer import estimate_tokens, serialize_provider_data
+    from services.report_generator import build_full_prompt
+
+    client = OpenAI(api_key="benchmark", base_url=server_url(llm))
+    aggregated_data = fixture_data()
+
+    rows = []
+    budgets = (
+        ("compact", 10 ** 9),
+        ("after", settings.ai_prompt_token_budget),
+        ("after-tight", args.tight_budget),
+    )
+    for label, budget in budgets:
+        settings.ai_prompt_token_budget = budget
+        started = time.perf_counter()
+        summary, _ = serialize_provider_data(aggregated_data, budget)
+        serialize_ms = (time.perf_counter() - started) * 1000
+        prompt = build_full_prompt(VIN, aggregated_data)
+        rows.append((label if budget == 10 ** 9 else f"{label} ({budget})", summary, prompt, serialize_ms))
+    before_summary = legacy_summary(aggregated_data)
+    before_prompt = rows[0][2].replace(rows[0][1], before_summary)
+    rows.insert(0, ("before", before_summary, before_prompt, 0.0))
+
+    print(f"{'prompt':<20} {'data chars':>11} {'data tok':>9} {'prompt tok':>11} {'serialize':>10} {'LLM latency':>12}")
+    for label, summary, prompt, serialize_ms in rows:
+        latency = time_completion(client, settings.ai_model, prompt)
+        print(f"{label:<20} {len(summary):11} {estimate_tokens(summary):9} {estimate_tokens(prompt):11} "
+              f"{serialize_ms:8.2f}ms {latency:11.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the all-LLM report mode with the hybrid mode (structured sections built
+from provider data, LLM writes only the overall assessment).
+
+Runs generate_report against a local OpenAI-compatible stub whose latency is a
+fixed time-to-first-token plus a per-output-token delay, and a local NHTSA stub
+serving a recorded payload. Reports prompt/completion tokens and latency per mode.
+
+Usage (from backend/):
+    python benchmarks/bench_report_modes.py --reports 5 --ms-per-token 10
+"""
+import argparse
+import os
+import statistics
+import time
+
+from stubs import NHTSAStubHandler, OpenAIStubHandler, server_url, start_server
+
+VIN = "1HGBH41JXMN109186"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=5)
+    parser.add_argument("--ms-per-token", type=float, default=10.0, help="Stub LLM output speed")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Stub LLM time to first token")
+    parser.add_argument("--stream", action="store_true", help="Use streaming completions")
+    args = parser.parse_args()
+
+    OpenAIStubHandler.seconds_per_token = args.ms_per_token / 1000
+    OpenAIStubHandler.time_to_first_token = args.ttft_ms / 1000
+    llm = start_server(OpenAIStubHandler)
+    nhtsa = start_server(NHTSAStubHandler)
+
+    os.environ["DEEPSEEK_API_KEY"] = "benchmark"
+    os.environ["AI_BASE_URL"] = server_url(llm)
+    os.environ["NHTSA_API_URL"] = server_url(nhtsa)
+    os.environ["AI_STREAM"] = "true" if args.stream else "false"
+    os.environ["REPORT_CACHE_ENABLED"] = "false"
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from settings import settings
+    from services.report_generator import generate_report
+
+    results = {}
+    for mode in ("llm", "hybrid"):
+        settings.report_mode = mode
+        OpenAIStubHandler.calls.clear()
+        latencies = []
+        for _ in range(args.reports):
+            started = time.perf_counter()
+            report = generate_report(VIN)
+            latencies.append(time.perf_counter() - started)
+            assert "error" not in report.report_data, report.report_data
+        calls = list(OpenAIStubHandler.calls)
+        results[mode] = {
+            "latency_s": statistics.mean(latencies),
+            "prompt_tokens": statistics.mean(c["usage"]["prompt_tokens"] for c in calls),
+            "completion_tokens": statistics.mean(c["usage"]["completion_tokens"] for c in calls),
+            "cached_tokens": statistics.mean(c["usage"]["prompt_tokens_details"]["cached_tokens"] for c in calls),
+            "max_tokens": calls[0]["max_tokens"],
+        }
+
+    print(f"{'mode':<8} {'latency':>9} {'prompt tok':>11} {'cached tok':>11} {'output tok':>11} {'max_tokens':>11}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['latency_s']:8.2f}s {r['prompt_tokens']:11.0f} {r['cached_tokens']:11.0f} "
+              f"{r['completion_tokens']:11.0f} {r['max_tokens']:11}")
+    llm_result, hybrid = results["llm"], results["hybrid"]
+    total = lambda r: r["prompt_tokens"] + r["completion_tokens"]
+    print(f"hybrid: {llm_result['latency_s'] / hybrid['latency_s']:.1f}x faster, "
+          f"{total(llm_result) / total(hybrid):.1f}x fewer tokens")
+
+
+if __name__ == "__main__":
+    main()
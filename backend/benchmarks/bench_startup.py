@@ -0,0 +1,85 @@
+"""
+Cold-start cost of the two process types: import time and peak RSS of a fresh
+interpreter loading
+
+    api      main.py (what uvicorn imports)
+    worker   the Celery app plus its task modules (what a worker imports
+             before forking its pool)
+
+and which heavy packages each ended up importing. Every sample is a new
+subprocess, so nothing is cached between runs. Point --app-dir at another
+checkout (e.g. a git worktree of an older commit) to compare.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Imported in the child; prints one JSON line with its own measurements
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - started
+heavy = {heavy!r}
+print(json.dumps({{
+    "import_s": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "heavy": [name for name in heavy if name in sys.modules],
+}}))
+"""
+
+PROCESSES = {
+    "api": "import main",
+    "worker": "from workers.celeryapp import celeryapp\nceleryapp.loader.import_default_modules()",
+}
+HEAVY = ("openai", "celery", "httpx", "sqlalchemy", "prometheus_client", "workers.tasks", "services.report_generator")
+
+
+def sample(app_dir: str, imports: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=app_dir, DEEPSEEK_API_KEY=os.environ.get("DEEPSEEK_API_KEY", "benchmark"))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(imports=imports, heavy=HEAVY)],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per process type")
+    parser.add_argument("--app-dir", default=APP_DIR, help="backend/app of the checkout to measure")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    # The first run warms the OS page cache and .pyc files; it is not counted
+    summary = {}
+    for name, imports in PROCESSES.items():
+        sample(app_dir, imports)
+        runs = [sample(app_dir, imports) for _ in range(args.runs)]
+        summary[name] = {
+            "import_s": statistics.median(r["import_s"] for r in runs),
+            "max_rss_mb": statistics.median(r["max_rss_mb"] for r in runs),
+            "modules": runs[-1]["modules"],
+            "heavy": runs[-1]["heavy"],
+        }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{'process':<8} {'import':>8} {'max RSS':>9} {'modules':>8}  heavy packages loaded")
+    for name, r in summary.items():
+        print(f"{name:<8} {r['import_s']:7.2f}s {r['max_rss_mb']:7.1f}MB {r['modules']:8}  {', '.join(r['heavy'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+VIN validation throughput: validate_vin called per VIN versus the
+column-at-a-time validate_vins, on a mix of valid and invalid VINs.
+
+Usage (from backend/):
+    python benchmarks/bench_vin_validation.py --vins 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+ALPHABET = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+WMIS = ("1HG", "5YJ", "2T1", "JTD", "LSV", "WVW", "VF1", "KMH")
+
+
+def make_vins(count: int, seed: int = 42):
+    from services.vin_validator import compute_check_digit
+
+    rng = random.Random(seed)
+    vins = []
+    for i in range(count):
+        vin = rng.choice(WMIS) + "".join(rng.choice(ALPHABET) for _ in range(14))
+        if i % 2 == 0:
+            # Half get a correct check digit
+            vin = vin[:8] + compute_check_digit(vin) + vin[9:]
+        if i % 50 == 0:
+            vin = vin[:16]
+        vins.append(vin)
+    return vins
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vins", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DEEPSEEK_API_KEY", "benchmark")
+    from services.vin_validator import validate_vin, validate_vins
+
+    vins = make_vins(args.vins)
+    per_vin = min(_timed(lambda: [validate_vin(vin) for vin in vins]) for _ in range(args.repeat))
+    batch = min(_timed(lambda: validate_vins(vins)) for _ in range(args.repeat))
+    assert [validate_vin(vin) for vin in vins] == validate_vins(vins)
+
+    print(f"{args.vins} VINs, {sum(validate_vins(vins))} valid")
+    print(f"  validate_vin per VIN  {args.vins / per_vin:12.0f} VINs/s")
+    print(f"  validate_vins         {args.vins / batch:12.0f} VINs/s")
+    print(f"  speedup               {per_vin / batch:.1f}x")
+
+
+def _timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Local stand-ins for external services used by the benchmarks.
+
+Every handler takes a `latency` (a Latency distribution, sampled per request)
+and an `error_rate` (fraction of requests answered with a 5xx).
+
+OpenAIStubHandler speaks enough of the OpenAI-compatible chat completions API
+(streaming and non-streaming) for the openai client. Its latency is modelled as
+a fixed time-to-first-token, a per-prompt-token prefill delay and a
+per-output-token delay, and token counts are estimated at 4 characters per token. Every request is recorded in
+OpenAIStubHandler.calls. Like DeepSeek's context cache it remembers message
+prefixes it has seen: the cached part of a prompt (in 64-token units) skips the
+prefill delay and is reported as cached tokens in the usage.
+"""
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CHARS_PER_TOKEN = 4
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def full_report_json() -> str:
+    from resources.mocks import AI_RESPONSE_MOCK
+    return json.dumps(json.loads(AI_RESPONSE_MOCK), indent=2)
+
+
+def narrative_json() -> str:
+    from resources.mocks import AI_RESPONSE_MOCK
+    return json.dumps({"overall_assessment": json.loads(AI_RESPONSE_MOCK)["overall_assessment"]}, indent=2)
+
+
+class Latency:
+    """
+    A per-request delay distribution, parsed from a spec in milliseconds:
+
+        fixed:20            always 20 ms
+        uniform:10,50       uniformly between 10 and 50 ms
+        lognormal:40,400    median 40 ms, p99 400 ms (long-tailed, like real upstreams)
+    """
+    # z-score of the 99th percentile of a standard normal distribution
+    _Z99 = 2.3263
+
+    def __init__(self, kind: str = "fixed", *params_ms: float):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+        expected = 1 if kind == "fixed" else 2
+        if len(params_ms) != expected:
+            raise ValueError(f"'{kind}' latency takes {expected} parameter(s)")
+        self.kind = kind
+        self.params = tuple(p / 1000 for p in params_ms)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        return cls(kind, *(float(p) for p in params.split(",") if p))
+
+    def sample(self, rng: random.Random = random) -> float:
+        """Returns: delay in seconds"""
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        median, p99 = self.params
+        if median <= 0:
+            return 0.0
+        sigma = math.log(max(p99, median) / median) / self._Z99
+        return rng.lognormvariate(math.log(median), sigma)
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{p * 1000:g}' for p in self.params)}"
+
+
+class FaultInjection:
+    """Mixin for stub handlers: sampled latency and a random share of 503s."""
+    latency = None
+    error_rate = 0.0
+    # Seed with rng.seed() for reproducible latency and error sequences
+    rng = random.Random()
+    _rng_lock = threading.Lock()
+
+    def _delay(self) -> float:
+        if self.latency is None:
+            return 0.0
+        with self._rng_lock:
+            return self.latency.sample(self.rng)
+
+    def _fails(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._rng_lock:
+            return self.rng.random() < self.error_rate
+
+    def _send_unavailable(self):
+        body = json.dumps({"error": {"message": "Service unavailable (injected)", "type": "server_error"}}).encode()
+        self.send_response(503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, document):
+        body = json.dumps(document).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OpenAIStubHandler(FaultInjection, BaseHTTPRequestHandler):
+    """
+    `latency`, when set, is extra network delay before the modelled
+    generation time; `error_rate` answers that share of requests with a 503.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    time_to_first_token = 0.2
+    seconds_per_prompt_token = 0.0
+    seconds_per_token = 0.01
+    # Share of completions wrapped in a markdown fence, as chat models often do
+    fence_rate = 0.0
+    # Answer this many requests with 429 (Retry-After: retry_after) first
+    throttle_next = 0
+    retry_after = 0
+    throttled = 0
+    calls = []
+    _calls_lock = threading.Lock()
+    cache_unit_tokens = 64
+    _seen_prefixes = set()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        messages = request.get("messages", [])
+        prompt = "".join(m.get("content", "") for m in messages)
+
+        with self._calls_lock:
+            throttle = OpenAIStubHandler.throttle_next > 0
+            if throttle:
+                OpenAIStubHandler.throttle_next -= 1
+                OpenAIStubHandler.throttled += 1
+        if throttle:
+            self._send_throttled()
+            return
+        time.sleep(self._delay())
+        if self._fails():
+            self._send_unavailable()
+            return
+
+        content = self.completion_for(messages)
+        if self.fence_rate:
+            with self._rng_lock:
+                fenced = self.rng.random() < self.fence_rate
+            if fenced:
+                content = f"```json\n{content}\n```"
+        max_chars = request.get("max_tokens", 4096) * CHARS_PER_TOKEN
+        content = content[:max_chars]
+        cached_tokens = self._cached_prefix_tokens(messages)
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._calls_lock:
+            self.calls.append({"usage": usage, "max_tokens": request.get("max_tokens"), "model": request.get("model")})
+
+        try:
+            if request.get("stream"):
+                self._send_stream(request, content, usage)
+            else:
+                self._send_completion(request, content, usage)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the request, e.g. a hedged request that lost
+            self.close_connection = True
+
+    def completion_for(self, messages) -> str:
+        # The hybrid-mode request only asks for the overall assessment
+        instructions = messages[0].get("content", "") if messages else ""
+        if "overall assessment" in instructions and '"vehicle_identification"' not in instructions:
+            return narrative_json()
+        return full_report_json()
+
+    def _cached_prefix_tokens(self, messages) -> int:
+        """Tokens of the longest message prefix seen before, rounded down to whole cache units."""
+        prefixes = []
+        text = ""
+        for message in messages:
+            text += f"{message.get('role')}:{message.get('content', '')}"
+            prefixes.append(text)
+        with self._calls_lock:
+            cached = max((p for p in prefixes if p in self._seen_prefixes), key=len, default="")
+            self._seen_prefixes.update(prefixes)
+        tokens = estimate_tokens(cached) if cached else 0
+        return tokens - tokens % self.cache_unit_tokens
+
+    def _prefill_delay(self, usage) -> float:
+        uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+        return self.time_to_first_token + uncached * self.seconds_per_prompt_token
+
+    def _send_throttled(self):
+        body = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}).encode()
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", str(self.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_completion(self, request, content, usage):
+        time.sleep(self._prefill_delay(usage) + usage["completion_tokens"] * self.seconds_per_token)
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self._prefill_delay(usage))
+        step = CHARS_PER_TOKEN * 4
+        for i in range(0, len(content), step):
+            time.sleep(self.seconds_per_token * 4)
+            self._write_event({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}],
+            })
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._write_event({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [],
+                "usage": usage,
+            })
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class NHTSAStubHandler(FaultInjection, BaseHTTPRequestHandler):
+    """
+    Serves the recorded decodevinvaluesextended fixture for any VIN, both for
+    single decodes (GET) and DecodeVINValuesBatch (POST). Request counts are
+    kept in NHTSAStubHandler.requests. `delay` is a fixed delay added to the
+    sampled `latency`.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    delay = 0.0
+    requests = {"single": 0, "batch": 0}
+    _requests_lock = threading.Lock()
+
+    def _record(self, vin: str):
+        record = dict(load_fixture("nhtsa_decodevinvaluesextended.json")["Results"][0])
+        record["VIN"] = vin
+        return record
+
+    def _count(self, kind: str):
+        with self._requests_lock:
+            self.requests[kind] += 1
+
+    def do_GET(self):
+        time.sleep(self.delay + self._delay())
+        if "/decodevinvaluesextended/" not in self.path:
+            self.send_error(404)
+            return
+        if self._fails():
+            self._send_unavailable()
+            return
+        self._count("single")
+        vin = self.path.split("/decodevinvaluesextended/")[1].split("?")[0]
+        self._send_json({"Count": 1, "SearchCriteria": f"VIN:{vin}", "Results": [self._record(vin)]})
+
+    def do_POST(self):
+        time.sleep(self.delay + self._delay())
+        if "/DecodeVINValuesBatch" not in self.path:
+            self.send_error(404)
+            return
+        if self._fails():
+            self._send_unavailable()
+            return
+        self._count("batch")
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        vins = [v.split(",")[0] for v in form.get("data", [""])[0].split(";") if v]
+        results = [self._record(vin) for vin in vins]
+        self._send_json({"Count": len(results), "SearchCriteria": "", "Results": results})
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureStubHandler(FaultInjection, BaseHTTPRequestHandler):
+    """Answers GET `path` with a recorded fixture, its "vin" set to the requested VIN."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    path_prefix = ""
+    fixture = ""
+
+    def do_GET(self):
+        time.sleep(self._delay())
+        path, _, query = self.path.partition("?")
+        if path != self.path_prefix:
+            self.send_error(404)
+            return
+        if self._fails():
+            self._send_unavailable()
+            return
+        document = dict(load_fixture(self.fixture))
+        document["vin"] = parse_qs(query).get("vin", [document.get("vin")])[0]
+        self._send_json(document)
+
+    def log_message(self, *args):
+        pass
+
+
+class CarfaxStubHandler(FixtureStubHandler):
+    path_prefix = "/vehicle/history"
+    fixture = "carfax_history.json"
+
+
+class ClearWinStubHandler(FixtureStubHandler):
+    path_prefix = "/vehicle/report"
+    fixture = "clearwin_report.json"
+
+
+def start_server(handler, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `handler` on a free port in a background thread."""
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer((host, 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"